@@ -0,0 +1,99 @@
+"""Compare the vectorized FIFO PnL engine against a straightforward
+per-trade Decimal loop on synthetic trades:
+
+    python -m benchmarks.pnl_engine --trades 100000
+"""
+import argparse
+import time
+from collections import deque
+from decimal import Decimal
+
+import numpy as np
+
+from coin_tracker.constants import CostBasisMethod
+from coin_tracker.pnl import TransactionArrays, compute_pnl
+
+ASSETS = np.array(["BTC", "ETH", "BNB", "ADA", "SOL"])
+
+
+def generate(trades: int, seed: int = 0) -> TransactionArrays:
+    rng = np.random.default_rng(seed)
+    asset = ASSETS[rng.integers(len(ASSETS), size=trades)]
+    is_buy = rng.random(trades) < 0.6
+    quantity = rng.uniform(0.01, 1, size=trades).round(8)
+    value = (quantity * rng.uniform(100, 50000, size=trades)).round(2)
+    empty = np.full(trades, "")
+
+    return TransactionArrays(
+        dates=np.arange(trades).astype("datetime64[s]"),
+        buy_asset=np.where(is_buy, asset, "USDT"),
+        buy_amount=np.where(is_buy, quantity, value),
+        sell_asset=np.where(is_buy, "USDT", asset),
+        sell_amount=np.where(is_buy, value, quantity),
+        fee_asset=empty,
+        fee_amount=np.zeros(trades),
+    )
+
+
+def decimal_fifo(transactions: TransactionArrays, quote: str) -> Decimal:
+    t = transactions
+    lots = {}
+    realized = Decimal(0)
+    for buy_asset, buy_amount, sell_asset, sell_amount in zip(
+        t.buy_asset.tolist(),
+        t.buy_amount.tolist(),
+        t.sell_asset.tolist(),
+        t.sell_amount.tolist(),
+    ):
+        if sell_asset == quote:
+            lots.setdefault(buy_asset, deque()).append(
+                [Decimal(str(buy_amount)), Decimal(str(sell_amount))]
+            )
+            continue
+
+        left = Decimal(str(sell_amount))
+        proceeds = Decimal(str(buy_amount))
+        queue = lots.setdefault(sell_asset, deque())
+        cost = Decimal(0)
+        while left > 0 and queue:
+            lot = queue[0]
+            take = min(lot[0], left)
+            lot_cost = lot[1] * take / lot[0]
+            cost += lot_cost
+            lot[0] -= take
+            lot[1] -= lot_cost
+            left -= take
+            if lot[0] <= 0:
+                queue.popleft()
+        realized += proceeds - cost
+
+    return realized
+
+
+def measure(func, *args) -> tuple:
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trades", type=int, default=100_000)
+    args = parser.parse_args()
+
+    transactions = generate(args.trades)
+
+    pnl, vectorized = measure(
+        compute_pnl, transactions, CostBasisMethod.FIFO, "USDT"
+    )
+    realized, loop = measure(decimal_fifo, transactions, "USDT")
+
+    print(f"trades:     {args.trades}")
+    print(f"numpy fifo: {vectorized * 1000:.1f} ms")
+    print(f"loop fifo:  {loop * 1000:.1f} ms")
+    print(f"speedup:    {loop / vectorized:.1f}x")
+    print(f"realized:   {pnl['realized_pnl']:.2f} vs {realized:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Compare query plans of hot transaction lookups without and with the
+lookup indexes from migration 75adf436b15c.
+
+Runs against an empty scratch PostgreSQL database, which it fills with
+synthetic rows:
+
+    python -m benchmarks.transaction_indexes postgresql://localhost/bench
+"""
+import argparse
+import time
+
+from sqlalchemy import create_engine, text
+
+from coin_tracker.models import SQLModel
+
+LOOKUP_INDEXES = [
+    "DROP INDEX IF EXISTS ix_user_username",
+    "DROP INDEX IF EXISTS ix_portfolio_user_id",
+    "DROP INDEX IF EXISTS ix_transaction_portfolio_id_transaction_date_id",
+    "ALTER TABLE transaction "
+    "DROP CONSTRAINT IF EXISTS uq_transaction_portfolio_id_external_id",
+]
+
+QUERIES = {
+    "current user": """
+        SELECT * FROM "user" WHERE username = 'user_' || :user_id
+    """,
+    "user portfolios": """
+        SELECT * FROM portfolio WHERE user_id = :user_id
+    """,
+    "transactions page": """
+        SELECT * FROM transaction
+        WHERE portfolio_id = :portfolio_id
+        ORDER BY transaction_date DESC, id DESC
+        LIMIT 101
+    """,
+    "transactions next page": """
+        SELECT * FROM transaction
+        WHERE portfolio_id = :portfolio_id
+          AND (transaction_date, id) < (now() - interval '365 days', 0)
+        ORDER BY transaction_date DESC, id DESC
+        LIMIT 101
+    """,
+    "imported transaction": """
+        SELECT id FROM transaction
+        WHERE portfolio_id = :portfolio_id
+          AND external_id = 'my_trades__' || :portfolio_id
+    """,
+}
+
+
+def populate(connection, transactions: int, portfolios: int):
+    users = max(portfolios // 2, 1)
+    connection.execute(
+        text(
+            """
+            INSERT INTO "user" (username, password)
+            SELECT 'user_' || i, 'x' FROM generate_series(1, :users) i
+            """
+        ),
+        {"users": users},
+    )
+    connection.execute(
+        text(
+            """
+            INSERT INTO portfolio (user_id, name)
+            SELECT 1 + i % :users, 'portfolio ' || i
+            FROM generate_series(1, :portfolios) i
+            """
+        ),
+        {"users": users, "portfolios": portfolios},
+    )
+    connection.execute(
+        text(
+            """
+            INSERT INTO transaction (
+                portfolio_id, transaction_type, transaction_date,
+                buy_asset, buy_amount, sell_asset, sell_amount,
+                fee_asset, fee_amount, external_id
+            )
+            SELECT
+                1 + i % :portfolios, 'trade',
+                now() - (i % 1825) * interval '1 day',
+                'BTC', 1, 'USDT', 40000, 'BNB', 0.001,
+                'my_trades__' || i
+            FROM generate_series(1, :transactions) i
+            """
+        ),
+        {"portfolios": portfolios, "transactions": transactions},
+    )
+    connection.execute(text("ANALYZE"))
+
+
+def explain(connection, params: dict):
+    for name, query in QUERIES.items():
+        plan = connection.execute(
+            text(f"EXPLAIN (ANALYZE, BUFFERS) {query}"), params
+        ).scalars()
+        print(f"--- {name}")
+        print("\n".join(plan))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("database_url")
+    parser.add_argument("--transactions", type=int, default=10_000_000)
+    parser.add_argument("--portfolios", type=int, default=10_000)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    params = {"user_id": 1, "portfolio_id": 2}
+
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        for statement in LOOKUP_INDEXES:
+            connection.execute(text(statement))
+
+        started = time.perf_counter()
+        populate(connection, args.transactions, args.portfolios)
+        print(f"populated in {time.perf_counter() - started:.1f}s")
+
+    print("=== BEFORE: primary keys only")
+    with engine.connect() as connection:
+        explain(connection, params)
+
+    with engine.begin() as connection:
+        started = time.perf_counter()
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(connection)
+        connection.execute(
+            text(
+                "ALTER TABLE transaction "
+                "ADD CONSTRAINT uq_transaction_portfolio_id_external_id "
+                "UNIQUE (portfolio_id, external_id)"
+            )
+        )
+        connection.execute(text("ANALYZE"))
+        print(f"indexed in {time.perf_counter() - started:.1f}s")
+
+    print("=== AFTER: lookup indexes")
+    with engine.connect() as connection:
+        explain(connection, params)
+
+
+if __name__ == "__main__":
+    main()
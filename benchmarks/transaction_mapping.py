@@ -0,0 +1,119 @@
+"""Compare the importer's row mapping and core inserts against building
+Transaction models and adding them to the session, on synthetic trades:
+
+    python -m benchmarks.transaction_mapping --trades 100000
+
+Writes go to an in-memory SQLite database unless --database-url is given.
+"""
+import argparse
+import random
+import time
+
+from sqlalchemy import create_engine
+from sqlmodel import Session
+
+from coin_tracker.bulk import insert_transactions
+from coin_tracker.importer.binance import TransactionMapper
+from coin_tracker.models import SQLModel, Transaction
+
+SYMBOL = {"symbol": "BTCUSDT", "baseAsset": "BTC", "quoteAsset": "USDT"}
+
+
+def generate(trades: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "time": 1640995200000 + i * 1000,
+            "isBuyer": rng.random() < 0.5,
+            "qty": f"{rng.uniform(0.001, 1):.8f}",
+            "quoteQty": f"{rng.uniform(10, 40000):.8f}",
+            "commission": f"{rng.uniform(0, 0.001):.8f}",
+            "commissionAsset": "BNB",
+        }
+        for i in range(trades)
+    ]
+
+
+def orm_transaction(portfolio_id: int, data: dict) -> Transaction:
+    # model based mapping, with validation coercing the float epoch
+    if data["isBuyer"]:
+        buy_asset, buy_amount = SYMBOL["baseAsset"], data["qty"]
+        sell_asset, sell_amount = SYMBOL["quoteAsset"], data["quoteQty"]
+    else:
+        buy_asset, buy_amount = SYMBOL["quoteAsset"], data["quoteQty"]
+        sell_asset, sell_amount = SYMBOL["baseAsset"], data["qty"]
+
+    return Transaction(
+        portfolio_id=portfolio_id,
+        transaction_type="trade",
+        transaction_date=data["time"] / 1000,
+        buy_asset=buy_asset,
+        buy_amount=buy_amount,
+        sell_asset=sell_asset,
+        sell_amount=sell_amount,
+        fee_asset=data["commissionAsset"],
+        fee_amount=data["commission"],
+        external_id=f"my_trades__{data['id']}",
+    )
+
+
+def orm_path(engine, items: list[dict]):
+    with Session(engine) as session:
+        session.add_all(orm_transaction(1, item) for item in items)
+        session.flush()
+        session.rollback()
+
+
+def row_path(engine, items: list[dict]):
+    mapper = TransactionMapper(1)
+    with Session(engine) as session:
+        insert_transactions(
+            session,
+            (mapper.from_my_trades(SYMBOL, item) for item in items),
+            ignore_conflicts=True,
+        )
+        session.rollback()
+
+
+def measure(func, *args) -> float:
+    started = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trades", type=int, default=100_000)
+    parser.add_argument("--database-url", default="sqlite://")
+    args = parser.parse_args()
+
+    items = generate(args.trades)
+    engine = create_engine(args.database_url)
+    SQLModel.metadata.create_all(engine)
+
+    mapper = TransactionMapper(1)
+    results = {
+        "map models": measure(
+            lambda: [orm_transaction(1, item) for item in items]
+        ),
+        "map rows": measure(
+            lambda: [mapper.from_my_trades(SYMBOL, item) for item in items]
+        ),
+        "models + session": measure(orm_path, engine, items),
+        "rows + core insert": measure(row_path, engine, items),
+    }
+
+    print(f"trades: {args.trades}")
+    for name, seconds in results.items():
+        print(f"{name:<20} {args.trades / seconds:>12,.0f} rows/s")
+    print(
+        "speedup: "
+        f"{results['map models'] / results['map rows']:.1f}x mapping, "
+        f"{results['models + session'] / results['rows + core insert']:.1f}x"
+        " mapping and writing"
+    )
+
+
+if __name__ == "__main__":
+    main()
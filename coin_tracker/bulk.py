@@ -0,0 +1,63 @@
+from itertools import islice
+from typing import Iterable, Iterator
+
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session
+
+from .config import settings
+from .models import Transaction
+
+DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def insert_transactions(
+    session: Session,
+    rows: Iterable[dict],
+    ignore_conflicts: bool = False,
+) -> list[int]:
+    """Insert transaction rows in batches and return ids of inserted rows.
+
+    Each batch is a single multi-row INSERT ... RETURNING id on databases that
+    support it, otherwise rows are inserted one by one. With ignore_conflicts
+    rows whose (portfolio_id, external_id) already exists are skipped by the
+    database. Nothing is committed.
+    """
+    table = Transaction.__table__
+    dialect = session.get_bind().dialect
+
+    if ignore_conflicts and not dialect.full_returning:
+        # the row by row path below needs a statement that is compiled only
+        # once, which SQLAlchemy does not do for SQLite ON CONFLICT clauses
+        statement = insert(table).prefix_with("OR IGNORE")
+    elif ignore_conflicts:
+        dialect_insert = DIALECT_INSERTS[dialect.name]
+        statement = dialect_insert(table).on_conflict_do_nothing(
+            index_elements=["portfolio_id", "external_id"]
+        )
+    else:
+        statement = insert(table)
+
+    ids = []
+    for batch in chunked(rows, settings.bulk_insert_batch_size):
+        if dialect.full_returning:
+            result = session.execute(
+                statement.values(batch).returning(table.c.id)
+            )
+            ids += result.scalars().all()
+        else:
+            for row in batch:
+                result = session.execute(statement, row)
+                if result.rowcount:
+                    ids += result.inserted_primary_key
+
+    return ids
@@ -1,3 +1,7 @@
+import os
+import tempfile
+from datetime import datetime
+
 from pydantic import BaseSettings
 
 
@@ -6,6 +10,52 @@ class Settings(BaseSettings):
     secret_key: str
     fernet_key: str
 
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: int = 30  # seconds
+    db_pool_recycle: int = 1800  # seconds
+    db_pool_pre_ping: bool = True
+    db_statement_timeout: int = 30000  # milliseconds
+
+    user_cache_size: int = 1024
+    user_cache_ttl: int = 60  # seconds
+
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 4
+
+    bulk_insert_batch_size: int = 1000
+    bulk_max_items: int = 10000
+
+    pnl_quote_asset: str = "USDT"
+    pnl_cache_size: int = 256
+    pnl_cache_ttl: int = 300  # seconds
+
+    price_cache_ttl: int = 10  # seconds
+
+    snapshot_quote_asset: str = "USDT"
+    # seconds between downloads of daily klines by the import worker
+    price_history_interval: int = 3600
+
+    exchange_info_cache_ttl: int = 3600  # seconds
+    # shared by the processes of a node, an empty value keeps it in memory
+    http_cache_dir: str = os.path.join(
+        tempfile.gettempdir(), "coin_tracker_http_cache"
+    )
+    http_cache_size: int = 64  # responses kept in memory
+
+    binance_rate_limit_margin: float = 0.9  # share of the limit to use
+    binance_max_retries: int = 5
+
+    import_concurrency: int = 10  # exchange accounts imported at once
+    import_interval: int = 900  # seconds between imports of an account
+    import_backoff_base: int = 60  # seconds, doubled on every failure
+    import_backoff_max: int = 21600  # seconds
+    import_jitter: float = 0.1  # share by which delays vary randomly
+    import_poll_interval: int = 5  # seconds
+    import_lease_duration: int = 300  # seconds, renewed while importing
+    # history imported by the first successful run of an account
+    import_backfill_start: datetime = datetime(2017, 7, 14)
+
     class Config:
         env_file = ".env"
 
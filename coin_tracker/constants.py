@@ -9,3 +9,27 @@ class TransactionType(str, Enum):
 
 class ExchangeType(str, Enum):
     BINANCE = "binance"
+
+
+class CostBasisMethod(str, Enum):
+    FIFO = "fifo"
+    LIFO = "lifo"
+    AVERAGE = "average"
+
+
+class KlineInterval(str, Enum):
+    MINUTE = "1m"
+    HOUR = "1h"
+    DAY = "1d"
+    WEEK = "1w"
+
+
+class HistoryInterval(str, Enum):
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+class ExportFormat(str, Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
@@ -1,6 +1,108 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
 from sqlmodel import create_engine
 
 from coin_tracker.config import settings
 
 
-engine = create_engine(settings.database_url)
+class PoolMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.waits = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record_wait(self, wait_time: float):
+        with self._lock:
+            self.waits += 1
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+
+    def increment(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "wait_time_total": self.wait_time_total,
+                "wait_time_avg": (
+                    self.wait_time_total / self.waits if self.waits else 0.0
+                ),
+                "wait_time_max": self.wait_time_max,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - started)
+
+
+def _engine_options(database_url: str) -> dict:
+    if make_url(database_url).get_backend_name() != "postgresql":
+        return {}
+
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "connect_args": {
+            "options": f"-c statement_timeout={settings.db_statement_timeout}"
+        },
+    }
+
+
+def create_db_engine(database_url: str = settings.database_url) -> Engine:
+    db_engine = create_engine(database_url, **_engine_options(database_url))
+
+    for event_name, counter in [
+        ("connect", "connects"),
+        ("checkout", "checkouts"),
+        ("checkin", "checkins"),
+    ]:
+        event.listen(
+            db_engine.pool,
+            event_name,
+            lambda *args, counter=counter: pool_metrics.increment(counter),
+        )
+
+    return db_engine
+
+
+engine = create_db_engine()
+
+
+def get_pool_stats() -> dict:
+    stats = {"status": engine.pool.status(), **pool_metrics.as_dict()}
+
+    if isinstance(engine.pool, QueuePool):
+        stats.update(
+            size=engine.pool.size(),
+            checked_in=engine.pool.checkedin(),
+            checked_out=engine.pool.checkedout(),
+            overflow=engine.pool.overflow(),
+        )
+
+    return stats
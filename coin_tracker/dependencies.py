@@ -1,21 +1,38 @@
 from typing import Optional
 
-from fastapi import Depends
+from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlmodel import Session, select, create_engine
+from jose import JWTError
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlmodel import Session, select
 from sqlalchemy.engine import Engine
 
 
-from .security import decode_token
+from .cache import TTLCache
 from .config import settings
+from .security import decode_token
+from .database import engine
 from .models import User
+from .prices import PriceCache, price_cache
 
 
 http_bearer = HTTPBearer(auto_error=False)
 
+# token subject (username) -> {"id": ..., "username": ...}
+user_cache = TTLCache(settings.user_cache_size, settings.user_cache_ttl)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_cached_user(mapper, connection, target: User):
+    history = inspect(target).attrs.username.history
+    for username in [target.username, *history.deleted]:
+        user_cache.pop(username)
+
 
 def get_db_engine() -> Engine:
-    return create_engine(settings.database_url)
+    return engine
 
 
 def get_db_session(engine: Engine = Depends(get_db_engine)) -> Session:
@@ -23,6 +40,10 @@ def get_db_session(engine: Engine = Depends(get_db_engine)) -> Session:
         yield session
 
 
+def get_price_cache() -> PriceCache:
+    return price_cache
+
+
 def get_access_token(
     token: HTTPAuthorizationCredentials = Depends(http_bearer),
 ) -> str:
@@ -35,5 +56,32 @@ def get_current_user(
     session: Session = Depends(get_db_session),
 ) -> Optional[User]:
     username = decode_token(access_token)["sub"]
+
+    if identity := user_cache.get(username):
+        # attach the cached identity to the session without a round trip
+        user = User(**identity)
+        make_transient_to_detached(user)
+        return session.merge(user, load=False)
+
     result = session.exec(select(User).where(User.username == username))
-    return result.one_or_none()
+    user = result.one_or_none()
+
+    if user:
+        user_cache.set(username, {"id": user.id, "username": user.username})
+
+    return user
+
+
+def get_authenticated_user(
+    access_token: Optional[str] = Depends(get_access_token),
+    session: Session = Depends(get_db_session),
+) -> User:
+    try:
+        user = access_token and get_current_user(access_token, session)
+    except JWTError:
+        user = None
+
+    if not user:
+        raise HTTPException(status.HTTP_401_UNAUTHORIZED)
+
+    return user
@@ -1,21 +1,167 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from operator import itemgetter
+from typing import Callable, Iterable, Iterator, Optional
+import asyncio
 import hmac
 import hashlib
-import time
 import httpx
-from retrying import retry
 from urllib.parse import urlencode
 
+from ..config import settings
+from .http_cache import CacheEntry, http_cache
+from .rate_limit import RateLimiter
 
-def retry_on_too_many_requests(exc: Exception):
-    if isinstance(exc, httpx.HTTPStatusError):
-        print(exc.response.status_code)
-        print(exc.response.json())
-        return exc.response.status_code in [418, 429]
-    return False
+# request weight of endpoints per the Binance API docs, anything else
+# counts as 1; used weight headers correct whatever drifts from these
+ENDPOINT_WEIGHTS = {
+    "/api/v3/account": 20,
+    "/api/v3/exchangeInfo": 20,
+    "/api/v3/klines": 2,
+    "/api/v3/myTrades": 20,
+    "/api/v3/ticker/price": 4,
+    "/sapi/v1/asset/assetDividend": 10,
+    "/sapi/v1/capital/deposit/hisrec": 1,
+    "/sapi/v1/capital/withdraw/history": 10,
+    "/sapi/v1/convert/tradeFlow": 100,
+}
+
+# the dribblet history does not go back any further
+DRIBBLETS_START = datetime(2020, 12, 1)
+
+# /api and /sapi endpoints are limited separately, per IP and per minute
+rate_limiters = {
+    "api": RateLimiter(1200, 60, settings.binance_rate_limit_margin),
+    "sapi": RateLimiter(12000, 60, settings.binance_rate_limit_margin),
+}
+USED_WEIGHT_HEADERS = {
+    "api": "X-MBX-USED-WEIGHT-1M",
+    "sapi": "X-SAPI-USED-IP-WEIGHT-1M",
+}
+
+# seconds for which responses of unsigned requests to these endpoints are
+# reused, they are revalidated after that
+CACHE_TTLS = {
+    "/api/v3/exchangeInfo": settings.exchange_info_cache_ttl,
+}
+
+
+def to_milliseconds(dt: datetime) -> int:
+    """Milliseconds since epoch of a naive UTC datetime."""
+    return int(dt.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def from_milliseconds(ms: int) -> datetime:
+    """Naive UTC datetime of milliseconds since epoch, computed exactly."""
+    return EPOCH + timedelta(milliseconds=ms)
+
+
+def time_windows(start: int, end: int, size: timedelta) -> list[dict]:
+    """startTime/endTime params covering [start, end] (ms) in windows of at
+    most `size`, for endpoints limiting the time span of a query."""
+    step = int(size.total_seconds() * 1000)
+    return [
+        {"startTime": window_start, "endTime": min(window_start + step, end)}
+        for window_start in range(start, end + 1, step + 1)
+    ]
+
+
+# next_page functions: given the params of a page and its items, return the
+# params of the next page, or None when the page was the last one
+
+NextPage = Callable[[dict, list], Optional[dict]]
+
+
+def next_offset(params: dict, items: list) -> Optional[dict]:
+    if len(items) == params["limit"]:
+        return {**params, "offset": params.get("offset", 0) + len(items)}
+    return None
+
+
+def next_from_id(params: dict, items: list) -> Optional[dict]:
+    if len(items) == params["limit"]:
+        return {**params, "fromId": max(item["id"] for item in items) + 1}
+    return None
+
+
+def next_page_number(params: dict, items: list) -> Optional[dict]:
+    if len(items) == params["rows"]:
+        return {**params, "page": params["page"] + 1}
+    return None
+
+
+def no_next_page(params: dict, items: list) -> Optional[dict]:
+    """For endpoints answering a window in a single response."""
+    return None
+
+
+def next_end_time(time_key: str) -> NextPage:
+    """Page backwards through a window, for endpoints returning the latest
+    items first."""
+
+    def next_page(params: dict, items: list) -> Optional[dict]:
+        if len(items) == params["limit"]:
+            oldest = min(item[time_key] for item in items)
+            return {**params, "endTime": oldest - 1}
+        return None
+
+    return next_page
+
+
+def split_window(params: dict, items: list) -> list[dict]:
+    """Halves of a window whose page came back full, for endpoints that
+    cannot page within a window. Windows of a single millisecond are not
+    split."""
+    full = len(items) == params["limit"]
+    if not full or params["startTime"] >= params["endTime"]:
+        return []
+    middle = (params["startTime"] + params["endTime"]) // 2
+    return [
+        {**params, "endTime": middle},
+        {**params, "startTime": middle + 1},
+    ]
+
+
+def history_windows(
+    start_time: Optional[int], end_time: Optional[int], size: timedelta
+) -> list[dict]:
+    """Windows from `start_time` to `end_time` (now by default). Without a
+    start time only the latest window is queried, as the endpoints do."""
+    if end_time is None:
+        end_time = to_milliseconds(datetime.utcnow())
+    if start_time is None:
+        start_time = end_time - int(size.total_seconds() * 1000)
+    return time_windows(start_time, end_time, size)
+
+
+def fiat_windows(
+    transaction_type: int, begin_time: Optional[int], end_time: Optional[int]
+) -> Iterator[dict]:
+    """First pages of the fiat history windows, which take beginTime rather
+    than startTime."""
+    for window in history_windows(begin_time, end_time, timedelta(days=90)):
+        yield {
+            "transactionType": transaction_type,
+            "beginTime": window["startTime"],
+            "endTime": window["endTime"],
+            "page": 1,
+            "rows": 500,
+        }
+
+
+def flatten_dribblets(response: dict) -> list[dict]:
+    return [
+        item
+        for data in response["userAssetDribblets"]
+        for item in data["userAssetDribbletDetails"]
+    ]
 
 
 class BinanceAPI:
+    client_class = httpx.Client
+
     def __init__(
         self,
         api_key: str = None,
@@ -24,7 +170,7 @@ class BinanceAPI:
     ):
         self.api_key = api_key
         self.secret_key = secret_key
-        self.session = httpx.Client(
+        self.session = self.client_class(
             base_url=base_url,
             headers={
                 "Content-Type": "application/json;charset=utf-8",
@@ -61,7 +207,69 @@ class BinanceAPI:
 
         return urlencode(payload, True).replace("%40", "@")
 
-    @retry(wait_fixed=60, retry_on_exception=retry_on_too_many_requests)
+    @staticmethod
+    def observe_limits(response: httpx.Response):
+        """Feed rate limit information of a response to its limiter."""
+        limit = "sapi" if response.url.path.startswith("/sapi/") else "api"
+
+        if used_weight := response.headers.get(USED_WEIGHT_HEADERS[limit]):
+            rate_limiters[limit].update(int(used_weight))
+
+        # 429: limit exceeded, 418: IP banned for repeatedly exceeding it
+        if response.status_code in [418, 429]:
+            retry_after = response.headers.get("Retry-After")
+            rate_limiters[limit].block(
+                int(retry_after) if retry_after else 60
+            )
+
+    @staticmethod
+    def rate_limiter(url: str) -> RateLimiter:
+        return rate_limiters["sapi" if url.startswith("/sapi/") else "api"]
+
+    def prepare_payload(self, params: dict, sign_request: bool):
+        params = {
+            key: value for key, value in params.items() if value is not None
+        }
+        return self.sign_payload(params) if sign_request else params
+
+    def cache_key(
+        self, method, url, params: dict, sign_request: bool
+    ) -> Optional[str]:
+        """Key of the response in `http_cache`, None when it is not cached.
+        Signed requests are never cached, they are specific to an account."""
+        if sign_request or method != "GET" or url not in CACHE_TTLS:
+            return None
+        query = urlencode(sorted(self.prepare_payload(params, False).items()))
+        return f"{self.session.base_url}{url}?{query}"
+
+    @staticmethod
+    def read_response(
+        response: httpx.Response,
+        url,
+        cache_key: str = None,
+        cached: CacheEntry = None,
+    ):
+        """Data of a response, taken from the cached entry when the exchange
+        answers that it has not changed. Stores cacheable responses."""
+        if cached and response.status_code == 304:
+            data = cached.data
+            etag = response.headers.get("ETag", cached.etag)
+            last_modified = response.headers.get(
+                "Last-Modified", cached.last_modified
+            )
+        else:
+            response.raise_for_status()
+            data = response.json()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+
+        if cache_key:
+            http_cache.set(
+                cache_key, data, CACHE_TTLS[url], etag, last_modified
+            )
+
+        return data
+
     def send_request(
         self,
         method,
@@ -69,16 +277,73 @@ class BinanceAPI:
         params: dict = None,
         sign_request: bool = True,
     ):
-        params = params.copy() if params else {}
-        if sign_request:
-            payload = self.sign_payload(params)
-        else:
-            payload = params
+        cache_key = self.cache_key(method, url, params or {}, sign_request)
+        cached = http_cache.get(cache_key) if cache_key else None
+        if cached and cached.fresh:
+            return cached.data
+
+        limiter = self.rate_limiter(url)
+
+        for attempt in range(settings.binance_max_retries + 1):
+            limiter.acquire(ENDPOINT_WEIGHTS.get(url, 1))
+
+            # sign after waiting, the timestamp must be fresh
+            payload = self.prepare_payload(params or {}, sign_request)
+            response = self.session.request(
+                method,
+                url,
+                params=payload,
+                headers=cached.validators() if cached else None,
+            )
+            self.observe_limits(response)
+
+            if response.status_code not in [418, 429]:
+                break
+
+        return self.read_response(response, url, cache_key, cached)
+
+    def request(
+        self,
+        method,
+        url,
+        params: dict = None,
+        sign_request: bool = True,
+        extract=None,
+    ):
+        """Send a request and return its data, picked out of the response
+        by `extract` for endpoints that wrap it."""
+        response = self.send_request(method, url, params, sign_request)
+        return extract(response) if extract else response
 
-        response = self.session.request(method, url, params=payload)
-        response.raise_for_status()
+    def paginate(
+        self,
+        url,
+        pages: Iterable[dict],
+        next_page: NextPage,
+        extract=None,
+    ):
+        """Yield the items of signed GET requests to `url`, starting from
+        each of the `pages` params and following `next_page` from there.
+        Pages are only requested as the items are consumed."""
+        for params in pages:
+            while params is not None:
+                items = self.request("GET", url, params, extract=extract)
+                yield from items
+                params = next_page(params, items)
 
-        return response.json()
+    def split_windows(self, url, windows: Iterable[dict], extract=None):
+        """Yield the items of signed GET requests to `url` over `windows`,
+        in order. A window coming back full is queried again in halves, so
+        requests grow with the number of items rather than with the length
+        of the range."""
+        pending = list(windows)[::-1]
+        while pending:
+            params = pending.pop()
+            items = self.request("GET", url, params, extract=extract)
+            if halves := split_window(params, items):
+                pending += halves[::-1]
+            else:
+                yield from items
 
     def exchange_info(self):
         return self.send_request(
@@ -90,19 +355,31 @@ class BinanceAPI:
     def account(self):
         return self.send_request("GET", "/api/v3/account")
 
-    def asset_dribblets(self):
-        response = self.send_request("GET", "/sapi/v1/asset/dribblet")
-
-        return [
-            item
-            for data in response["userAssetDribblets"]
-            for item in data["userAssetDribbletDetails"]
-        ]
-
-    def asset_dividends(self):
-        response = self.send_request("GET", "/sapi/v1/asset/assetDividend")
+    def asset_dribblets(self, start_time: int = None, end_time: int = None):
+        """Dust conversions. A query returns the latest 100 conversions and
+        one can be made every 6 hours, so windows of 25 days come back
+        whole."""
+        if start_time is not None:
+            start_time = max(start_time, to_milliseconds(DRIBBLETS_START))
+        return self.paginate(
+            "/sapi/v1/asset/dribblet",
+            history_windows(start_time, end_time, timedelta(days=25)),
+            no_next_page,
+            extract=flatten_dribblets,
+        )
 
-        return response["rows"]
+    def asset_dividends(self, start_time: int = None, end_time: int = None):
+        return self.paginate(
+            "/sapi/v1/asset/assetDividend",
+            (
+                {**window, "limit": 500}
+                for window in history_windows(
+                    start_time, end_time, timedelta(days=180)
+                )
+            ),
+            next_end_time("divTime"),
+            extract=itemgetter("rows"),
+        )
 
     def convert_trade_flow(
         self,
@@ -116,53 +393,185 @@ class BinanceAPI:
         if start_dt is None:
             start_dt = end_dt - timedelta(days=30)
 
-        time.sleep(1)
-        response = self.send_request(
-            "GET",
+        return self.split_windows(
             "/sapi/v1/convert/tradeFlow",
-            {
-                "startTime": self._get_timestamp(start_dt),
-                "endTime": self._get_timestamp(end_dt),
-                "limit": limit,
-            },
+            (
+                {**window, "limit": limit}
+                for window in time_windows(
+                    to_milliseconds(start_dt),
+                    to_milliseconds(end_dt),
+                    timedelta(days=30),
+                )
+            ),
+            extract=itemgetter("list"),
         )
 
-        return response["list"]
-
-    def fiat_orders(self, transaction_type: int):
+    def fiat_orders(
+        self,
+        transaction_type: int,
+        begin_time: int = None,
+        end_time: int = None,
+    ):
         """Fiat Deposit/Withdraw History"""
-        response = self.send_request(
-            "GET",
+        return self.paginate(
             "/sapi/v1/fiat/orders",
-            {"transactionType": transaction_type},
+            fiat_windows(transaction_type, begin_time, end_time),
+            next_page_number,
+            extract=itemgetter("data"),
         )
 
-        return response["data"]
-
-    def fiat_payments(self, transaction_type: int):
+    def fiat_payments(
+        self,
+        transaction_type: int,
+        begin_time: int = None,
+        end_time: int = None,
+    ):
         """Fiat Payments History"""
-        response = self.send_request(
-            "GET",
+        return self.paginate(
             "/sapi/v1/fiat/payments",
-            {"transactionType": transaction_type},
+            fiat_windows(transaction_type, begin_time, end_time),
+            next_page_number,
+            extract=itemgetter("data"),
         )
 
-        return response["data"]
+    def my_trades(self, symbol: str, from_id: int = None):
+        """Trades history, from the first trade unless `from_id` is given"""
+        return self.paginate(
+            "/api/v3/myTrades",
+            [{"symbol": symbol, "fromId": from_id or 0, "limit": 1000}],
+            next_from_id,
+        )
 
-    def my_trades(self, symbol: str):
-        """Trades history"""
-        time.sleep(1)
+    def ticker_price(self):
         return self.send_request(
             "GET",
-            "/api/v3/myTrades",
-            {"symbol": symbol},
+            "/api/v3/ticker/price",
+            sign_request=False,
         )
 
-    def ticker_price(self):
-        return self.send_request("GET", "/api/v3/ticker/price")
+    def klines(
+        self,
+        symbol: str,
+        interval: str,
+        start_time: int = None,
+        end_time: int = None,
+        limit: int = 1000,
+    ):
+        """Candlesticks of a symbol, open and close times in ms since epoch"""
+        return self.send_request(
+            "GET",
+            "/api/v3/klines",
+            {
+                "symbol": symbol,
+                "interval": interval,
+                "startTime": start_time,
+                "endTime": end_time,
+                "limit": limit,
+            },
+            sign_request=False,
+        )
+
+    def deposit_history(self, start_time: int = None, end_time: int = None):
+        return self.paginate(
+            "/sapi/v1/capital/deposit/hisrec",
+            (
+                {**window, "limit": 1000}
+                for window in history_windows(
+                    start_time, end_time, timedelta(days=90)
+                )
+            ),
+            next_offset,
+        )
+
+    def withdraw_history(self, start_time: int = None, end_time: int = None):
+        return self.paginate(
+            "/sapi/v1/capital/withdraw/history",
+            (
+                {**window, "limit": 1000}
+                for window in history_windows(
+                    start_time, end_time, timedelta(days=90)
+                )
+            ),
+            next_offset,
+        )
+
+
+class AsyncBinanceAPI(BinanceAPI):
+    """BinanceAPI on an asyncio client: endpoint methods return awaitables
+    and wait for the shared rate limits without blocking the event loop."""
+
+    client_class = httpx.AsyncClient
+
+    async def send_request(
+        self,
+        method,
+        url,
+        params: dict = None,
+        sign_request: bool = True,
+    ):
+        cache_key = self.cache_key(method, url, params or {}, sign_request)
+        cached = http_cache.get(cache_key) if cache_key else None
+        if cached and cached.fresh:
+            return cached.data
 
-    def deposit_history(self):
-        return self.send_request("GET", "/sapi/v1/capital/deposit/hisrec")
+        limiter = self.rate_limiter(url)
 
-    def withdraw_history(self):
-        return self.send_request("GET", "/sapi/v1/capital/withdraw/history")
+        for attempt in range(settings.binance_max_retries + 1):
+            delay = limiter.reserve(ENDPOINT_WEIGHTS.get(url, 1))
+            while delay:
+                await asyncio.sleep(delay)
+                delay = limiter.blocked_for()
+
+            payload = self.prepare_payload(params or {}, sign_request)
+            response = await self.session.request(
+                method,
+                url,
+                params=payload,
+                headers=cached.validators() if cached else None,
+            )
+            self.observe_limits(response)
+
+            if response.status_code not in [418, 429]:
+                break
+
+        return self.read_response(response, url, cache_key, cached)
+
+    async def request(
+        self,
+        method,
+        url,
+        params: dict = None,
+        sign_request: bool = True,
+        extract=None,
+    ):
+        response = await self.send_request(method, url, params, sign_request)
+        return extract(response) if extract else response
+
+    async def paginate(
+        self,
+        url,
+        pages: Iterable[dict],
+        next_page: NextPage,
+        extract=None,
+    ):
+        for params in pages:
+            while params is not None:
+                items = await self.request(
+                    "GET", url, params, extract=extract
+                )
+                for item in items:
+                    yield item
+                params = next_page(params, items)
+
+    async def split_windows(
+        self, url, windows: Iterable[dict], extract=None
+    ):
+        pending = list(windows)[::-1]
+        while pending:
+            params = pending.pop()
+            items = await self.request("GET", url, params, extract=extract)
+            if halves := split_window(params, items):
+                pending += halves[::-1]
+            else:
+                for item in items:
+                    yield item
@@ -0,0 +1,108 @@
+"""Two-tier cache of exchange responses and data derived from them.
+
+The memory tier keeps parsed data for the accounts imported by a process,
+the disk tier shares it with the other processes on the node. Entries
+outlive their freshness: a stale entry is revalidated with a conditional
+request, and its data is reused when the exchange answers 304 Not Modified.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Optional
+
+from ..cache import TTLCache
+from ..config import settings
+
+
+@dataclass
+class CacheEntry:
+    data: Any
+    expires_at: float  # seconds since epoch, comparable across processes
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires_at > time.time()
+
+    def validators(self) -> dict:
+        """Headers of a conditional request revalidating the entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HTTPCache:
+    def __init__(self, directory: Optional[str], memory_size: int):
+        """Keep `memory_size` entries in memory and all of them as files in
+        `directory`, if one is given."""
+        self.directory = directory
+        # entries are kept until evicted, freshness is up to the callers
+        self._memory = TTLCache(memory_size, float("inf"))
+
+    def _path(self, key: str) -> str:
+        name = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
+
+    def _load(self, key: str) -> Optional[CacheEntry]:
+        try:
+            with open(self._path(key)) as file:
+                return CacheEntry(**json.load(file))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _store(self, key: str, entry: CacheEntry):
+        # written aside and renamed, readers never see a partial file
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.directory, suffix=".tmp", delete=False
+            ) as file:
+                json.dump(asdict(entry), file)
+            os.replace(file.name, self._path(key))
+        except OSError:
+            pass
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Entry of `key`, fresh or not. A stale entry in memory is checked
+        against the disk, where another process may have refreshed it."""
+        entry = self._memory.get(key)
+        if self.directory and (entry is None or not entry.fresh):
+            stored = self._load(key)
+            if stored and (
+                entry is None or stored.expires_at > entry.expires_at
+            ):
+                entry = stored
+                self._memory.set(key, entry)
+        return entry
+
+    def get_fresh(self, key: str) -> Any:
+        """Data of a fresh entry of `key`, None otherwise."""
+        entry = self.get(key)
+        return entry.data if entry and entry.fresh else None
+
+    def set(
+        self,
+        key: str,
+        data: Any,
+        ttl: float,
+        etag: str = None,
+        last_modified: str = None,
+    ) -> CacheEntry:
+        entry = CacheEntry(data, time.time() + ttl, etag, last_modified)
+        self._memory.set(key, entry)
+        if self.directory:
+            self._store(key, entry)
+        return entry
+
+    def clear(self):
+        self._memory.clear()
+
+
+http_cache = HTTPCache(settings.http_cache_dir, settings.http_cache_size)
@@ -0,0 +1,66 @@
+"""Token bucket rate limiting of exchange requests.
+
+Limiters are shared by every client in the process, as exchanges limit
+request weight per IP address. Requests reserve their weight up front and
+get back how long to wait before sending, so that the same limiter serves
+both blocking and asyncio clients. The exchange reports the weight it has
+counted in response headers; limiters take it into account to stay in step
+with other processes on the same IP.
+"""
+import threading
+import time
+
+
+class RateLimiter:
+    def __init__(self, limit: int, period: float, margin: float = 1.0):
+        """Allow `limit` weight per `period` seconds, of which only the
+        `margin` share is used."""
+        self.capacity = limit * margin
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def reserve(self, weight: int) -> float:
+        """Take `weight` from the bucket and return the number of seconds to
+        wait before the request may be sent."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # the bucket goes into debt, later reservations queue behind
+            self.tokens -= weight
+            return max(-self.tokens / self.rate, self.blocked_until - now, 0)
+
+    def acquire(self, weight: int):
+        delay = self.reserve(weight)
+        while delay:
+            time.sleep(delay)
+            delay = self.blocked_for()
+
+    def blocked_for(self) -> float:
+        """Seconds left of a block. Requests that reserved their weight
+        before the block began check it again once they are done waiting,
+        so that none goes out while the exchange is refusing requests."""
+        with self._lock:
+            return max(self.blocked_until - time.monotonic(), 0)
+
+    def update(self, used_weight: int):
+        """Align with the weight the exchange counted in its window."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, self.capacity - used_weight)
+
+    def block(self, seconds: float):
+        """Hold back all requests for `seconds`, as told by the exchange."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self.tokens = min(self.tokens, 0)
@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterator
+
+from sqlalchemy.engine import Result
+from sqlmodel import Session, select
+
+from .constants import ExportFormat
+from .models import Transaction
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    Transaction.id,
+    Transaction.transaction_type,
+    Transaction.transaction_date,
+    Transaction.buy_asset,
+    Transaction.buy_amount,
+    Transaction.sell_asset,
+    Transaction.sell_amount,
+    Transaction.fee_asset,
+    Transaction.fee_amount,
+    Transaction.external_id,
+    Transaction.note,
+]
+
+MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.NDJSON: "application/x-ndjson",
+}
+
+
+def stream_transactions(session: Session, portfolio_id: int) -> Result:
+    """Fetch rows through a server-side cursor, EXPORT_BATCH_SIZE at a time."""
+    statement = (
+        select(*EXPORT_COLUMNS)
+        .where(Transaction.portfolio_id == portfolio_id)
+        .order_by(Transaction.transaction_date, Transaction.id)
+        .execution_options(stream_results=True)
+    )
+    return session.execute(statement).yield_per(EXPORT_BATCH_SIZE)
+
+
+def iter_csv(result: Result) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(result.keys())
+    for rows in result.partitions():
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def iter_ndjson(result: Result) -> Iterator[str]:
+    keys = list(result.keys())
+    for rows in result.partitions():
+        yield "".join(
+            json.dumps(dict(zip(keys, row)), default=_json_default) + "\n"
+            for row in rows
+        )
+
+
+def export_transactions(
+    session: Session,
+    portfolio_id: int,
+    export_format: ExportFormat,
+) -> Iterator[str]:
+    result = stream_transactions(session, portfolio_id)
+
+    if export_format == ExportFormat.NDJSON:
+        return iter_ndjson(result)
+
+    return iter_csv(result)
@@ -0,0 +1,56 @@
+"""Exchange import worker, run with `python -m coin_tracker.importer`.
+
+Workers lease the jobs they run, so any number of them can run side by
+side, on one node or many, without importing an account twice. Each worker
+also keeps the daily klines that value portfolio snapshots up to date.
+"""
+import argparse
+import asyncio
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from coin_tracker.config import settings
+from coin_tracker.exchanges.binance_api import BinanceAPI
+from coin_tracker.importer.scheduler import ImportScheduler
+from coin_tracker.price_history import fill_traded_prices
+
+
+def fill_prices_once(engine: Engine, api: BinanceAPI) -> int:
+    with Session(engine) as session:
+        return fill_traded_prices(session, api)
+
+
+async def fill_prices(engine: Engine):
+    """Download new daily klines of traded assets every
+    `price_history_interval` seconds, in a thread so that imports go on."""
+    api = BinanceAPI()
+    while True:
+        try:
+            stored = await asyncio.to_thread(fill_prices_once, engine, api)
+            print(f"PRICE HISTORY: {stored} KLINES STORED")
+        except Exception as exc:
+            print(f"PRICE HISTORY: FAILED: {exc!r}")
+        await asyncio.sleep(settings.price_history_interval)
+
+
+async def run(engine: Engine, concurrency: int):
+    await asyncio.gather(
+        ImportScheduler(engine, concurrency).run(), fill_prices(engine)
+    )
+
+
+def main():
+    from coin_tracker.database import engine
+
+    parser = argparse.ArgumentParser(description="Run exchange imports")
+    parser.add_argument(
+        "--concurrency", type=int, default=settings.import_concurrency
+    )
+    args = parser.parse_args()
+
+    asyncio.run(run(engine, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,90 +1,163 @@
-from datetime import datetime, timedelta
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional
 
-from dateutil.rrule import rrule, DAILY
 from sqlmodel import Session, select
 
-from coin_tracker.models import Transaction
-from coin_tracker.exchanges.binance_api import BinanceAPI
+from coin_tracker.bulk import insert_transactions
+from coin_tracker.config import settings
+from coin_tracker.constants import TransactionType
+from coin_tracker.ledger import apply_transactions
+from coin_tracker.models import (
+    ExchangeSymbol,
+    Holding,
+    ImportCheckpoint,
+)
+from coin_tracker.exchanges.binance_api import (
+    BinanceAPI,
+    from_milliseconds,
+    to_milliseconds,
+)
+from coin_tracker.exchanges.http_cache import http_cache
+
+# symbols are the same for every account, they are shared through the cache
+# with the other importers and processes
+EXCHANGE_SYMBOLS_KEY = "binance:exchange_symbols"
+
+
+def cache_exchange_symbols(exchange_info: dict) -> list[dict]:
+    """Keep the part of exchange info the importer uses, a fraction of its
+    size and parse time."""
+    symbols = [
+        {
+            "symbol": symbol["symbol"],
+            "baseAsset": symbol["baseAsset"],
+            "quoteAsset": symbol["quoteAsset"],
+        }
+        for symbol in exchange_info["symbols"]
+    ]
+    http_cache.set(
+        EXCHANGE_SYMBOLS_KEY, symbols, settings.exchange_info_cache_ttl
+    )
+    return symbols
+
+
+def decimal(value) -> Decimal:
+    """Exact Decimal of an amount, which the API sends as a string."""
+    return Decimal(value if isinstance(value, str) else str(value))
+
+
+def transaction_row(
+    portfolio_id: int,
+    transaction_type: TransactionType,
+    transaction_date: datetime,
+    buy_asset: str = None,
+    buy_amount: Decimal = Decimal(0),
+    sell_asset: str = None,
+    sell_amount: Decimal = Decimal(0),
+    fee_asset: str = None,
+    fee_amount: Decimal = Decimal(0),
+    external_id: str = None,
+) -> dict:
+    """Transaction table row, as written by `insert_transactions`."""
+    return {
+        "portfolio_id": portfolio_id,
+        "transaction_type": transaction_type,
+        "transaction_date": transaction_date,
+        "buy_asset": buy_asset,
+        "buy_amount": buy_amount,
+        "sell_asset": sell_asset,
+        "sell_amount": sell_amount,
+        "fee_asset": fee_asset,
+        "fee_amount": fee_amount,
+        "external_id": external_id,
+        "note": None,
+    }
 
 
 class TransactionMapper:
+    """Maps API items straight to transaction rows.
+
+    Rows skip model validation: amounts are parsed into exact Decimals and
+    millisecond timestamps converted with integer arithmetic, which is all
+    the validation would do for well-formed API data, at a fraction of the
+    cost.
+    """
+
     def __init__(self, portfolio_id: int):
         self.portfolio_id = portfolio_id
 
-    def from_deposit_history(self, data: dict) -> Transaction:
-        return Transaction(
-            portfolio_id=self.portfolio_id,
-            transaction_type="deposit",
-            transaction_date=data["insertTime"] / 1000,
+    def from_deposit_history(self, data: dict) -> dict:
+        return transaction_row(
+            self.portfolio_id,
+            TransactionType.DEPOSIT,
+            from_milliseconds(data["insertTime"]),
             buy_asset=data["coin"],
-            buy_amount=data["amount"],
+            buy_amount=decimal(data["amount"]),
             external_id=f"deposit_history__{data['id']}",
         )
 
-    def from_withdraw_history(self, data: dict) -> Transaction:
-        return Transaction(
-            portfolio_id=self.portfolio_id,
-            transaction_type="withdraw",
-            transaction_date=datetime.fromisoformat(data["applyTime"]),
+    def from_withdraw_history(self, data: dict) -> dict:
+        return transaction_row(
+            self.portfolio_id,
+            TransactionType.WITHDRAW,
+            datetime.fromisoformat(data["applyTime"]),
             sell_asset=data["coin"],
-            sell_amount=data["amount"],
+            sell_amount=decimal(data["amount"]),
             fee_asset=data["coin"],
-            fee_amount=data["transactionFee"],
+            fee_amount=decimal(data["transactionFee"]),
             external_id=f"withdraw_history__{data['id']}",
         )
 
-    def from_asset_dividend(self, data: dict) -> Transaction:
-        return Transaction(
-            portfolio_id=self.portfolio_id,
-            transaction_type="trade",
-            transaction_date=data["divTime"] / 1000,
+    def from_asset_dividend(self, data: dict) -> dict:
+        return transaction_row(
+            self.portfolio_id,
+            TransactionType.TRADE,
+            from_milliseconds(data["divTime"]),
             buy_asset=data["asset"],
-            buy_amount=data["amount"],
+            buy_amount=decimal(data["amount"]),
             external_id=f"asset_dividend__{data['id']}",
         )
 
-    def from_asset_dribblet(self, data: dict) -> Transaction:
-        return Transaction(
-            portfolio_id=self.portfolio_id,
-            transaction_type="trade",
-            transaction_date=data["operateTime"] / 1000,
+    def from_asset_dribblet(self, data: dict) -> dict:
+        return transaction_row(
+            self.portfolio_id,
+            TransactionType.TRADE,
+            from_milliseconds(data["operateTime"]),
             buy_asset="BNB",
-            buy_amount=data["transferedAmount"],
+            buy_amount=decimal(data["transferedAmount"]),
             sell_asset=data["fromAsset"],
-            sell_amount=data["amount"],
+            sell_amount=decimal(data["amount"]),
             fee_asset="BNB",
-            fee_amount=data["serviceChargeAmount"],
+            fee_amount=decimal(data["serviceChargeAmount"]),
             external_id=f"asset_dribblet__{data['transId']}",
         )
 
-    def from_fiat_orders(self, data: dict, tran_type: int):
+    def from_fiat_orders(self, data: dict, tran_type: int) -> dict:
+        amount = decimal(data["amount"])
         if tran_type == 0:  # deposit
-            transaction_type = "deposit"
-            buy_asset = data["fiatCurrency"]
-            buy_amount = data["amount"]
-            sell_asset = None
-            sell_amount = 0
+            transaction_type = TransactionType.DEPOSIT
+            buy_asset, buy_amount = data["fiatCurrency"], amount
+            sell_asset, sell_amount = None, Decimal(0)
         else:  # withdraw
-            transaction_type = "withdraw"
-            buy_asset = None
-            buy_amount = 0
-            sell_asset = data["fiatCurrency"]
-            sell_amount = data["amount"]
-
-        return Transaction(
-            portfolio_id=self.portfolio_id,
-            transaction_type=transaction_type,
-            transaction_date=data["updateTime"] / 1000,
+            transaction_type = TransactionType.WITHDRAW
+            buy_asset, buy_amount = None, Decimal(0)
+            sell_asset, sell_amount = data["fiatCurrency"], amount
+
+        return transaction_row(
+            self.portfolio_id,
+            transaction_type,
+            from_milliseconds(data["updateTime"]),
             buy_asset=buy_asset,
             buy_amount=buy_amount,
             sell_asset=sell_asset,
             sell_amount=sell_amount,
             fee_asset=data["fiatCurrency"],
-            fee_amount=data["totalFee"],
+            fee_amount=decimal(data["totalFee"]),
             external_id=f"fiat_orders__{data['orderNo']}",
         )
 
-    def from_fiat_payments(self, data: dict, tran_type: int):
+    def from_fiat_payments(self, data: dict, tran_type: int) -> dict:
         if tran_type == 0:  # buy
             buy_asset = data["cryptoCurrency"]
             sell_asset = data["fiatCurrency"]
@@ -92,58 +165,57 @@ class TransactionMapper:
             buy_asset = data["fiatCurrency"]
             sell_asset = data["cryptoCurrency"]
 
-        return Transaction(
-            portfolio_id=self.portfolio_id,
-            transaction_type="trade",
-            transaction_date=data["updateTime"] / 1000,
+        return transaction_row(
+            self.portfolio_id,
+            TransactionType.TRADE,
+            from_milliseconds(data["updateTime"]),
             buy_asset=buy_asset,
-            buy_amount=data["obtainAmount"],
+            buy_amount=decimal(data["obtainAmount"]),
             sell_asset=sell_asset,
-            sell_amount=data["sourceAmount"],
+            sell_amount=decimal(data["sourceAmount"]),
             fee_asset=data["fiatCurrency"],
-            fee_amount=data["totalFee"],
+            fee_amount=decimal(data["totalFee"]),
             external_id=f"fiat_payments__{data['orderNo']}",
         )
 
-    def from_trade_flow(self, data: dict) -> Transaction:
-        return Transaction(
-            portfolio_id=self.portfolio_id,
-            transaction_type="trade",
-            transaction_date=data["createTime"] / 1000,
+    def from_trade_flow(self, data: dict) -> dict:
+        return transaction_row(
+            self.portfolio_id,
+            TransactionType.TRADE,
+            from_milliseconds(data["createTime"]),
             buy_asset=data["toAsset"],
-            buy_amount=data["toAmount"],
+            buy_amount=decimal(data["toAmount"]),
             sell_asset=data["fromAsset"],
-            sell_amount=data["fromAmount"],
+            sell_amount=decimal(data["fromAmount"]),
             external_id=f"trade_flow__{data['orderId']}",
         )
 
-    def from_my_trades(self, symbol: dict, data: dict) -> Transaction:
+    def from_my_trades(self, symbol: dict, data: dict) -> dict:
+        qty, quote_qty = decimal(data["qty"]), decimal(data["quoteQty"])
         if data["isBuyer"]:
-            buy_currency = symbol["baseAsset"]
-            buy_amount = data["qty"]
-            sell_currency = symbol["quoteAsset"]
-            sell_amount = data["quoteQty"]
+            buy_asset, buy_amount = symbol["baseAsset"], qty
+            sell_asset, sell_amount = symbol["quoteAsset"], quote_qty
         else:
-            buy_currency = symbol["quoteAsset"]
-            buy_amount = data["quoteQty"]
-            sell_currency = symbol["baseAsset"]
-            sell_amount = data["qty"]
-
-        return Transaction(
-            portfolio_id=self.portfolio_id,
-            transaction_type="trade",
-            transaction_date=data["time"] / 1000,
-            buy_asset=buy_currency,
+            buy_asset, buy_amount = symbol["quoteAsset"], quote_qty
+            sell_asset, sell_amount = symbol["baseAsset"], qty
+
+        return transaction_row(
+            self.portfolio_id,
+            TransactionType.TRADE,
+            from_milliseconds(data["time"]),
+            buy_asset=buy_asset,
             buy_amount=buy_amount,
-            sell_asset=sell_currency,
+            sell_asset=sell_asset,
             sell_amount=sell_amount,
             fee_asset=data["commissionAsset"],
-            fee_amount=data["commission"],
+            fee_amount=decimal(data["commission"]),
             external_id=f"my_trades__{data['id']}",
         )
 
 
 class BinanceImporter:
+    api_class = BinanceAPI
+
     def __init__(
         self,
         session: Session,
@@ -152,135 +224,315 @@ class BinanceImporter:
         secret_key,
         start_date: datetime.date,
         end_date: datetime.date = datetime.utcnow(),
+        exchange_id: int = None,
     ):
         self.session = session
         self.portfolio_id = portfolio_id
-        self.api = BinanceAPI(api_key, secret_key)
+        self.api = self.api_class(api_key, secret_key)
         self.start_date = start_date
         self.end_date = end_date
+        self.exchange_id = exchange_id
 
-        self.existing_ids = self.session.exec(
-            select(Transaction.external_id).where(
-                Transaction.portfolio_id == portfolio_id,
-                Transaction.external_id.is_not(None),
-            )
-        ).all()
         self.mapper = TransactionMapper(portfolio_id)
+        self.pending = []
+        self.checkpoints = {}
+
+    def load_checkpoints(self):
+        if self.exchange_id is None:
+            return
+
+        self.checkpoints = {
+            checkpoint.endpoint: checkpoint
+            for checkpoint in self.session.exec(
+                select(ImportCheckpoint).where(
+                    ImportCheckpoint.exchange_id == self.exchange_id
+                )
+            )
+        }
+
+    def checkpoint(self, endpoint: str) -> ImportCheckpoint:
+        """Checkpoint of an endpoint, saved along with the imported data.
+
+        Time based endpoints are requested again from the checkpoint time on,
+        records sharing that time may not have been imported yet; records
+        imported already are skipped on insert. Without an exchange_id
+        checkpoints only last for this run.
+        """
+        if endpoint not in self.checkpoints:
+            checkpoint = ImportCheckpoint(
+                exchange_id=self.exchange_id, endpoint=endpoint
+            )
+            if self.exchange_id is not None:
+                self.session.add(checkpoint)
+            self.checkpoints[endpoint] = checkpoint
+
+        return self.checkpoints[endpoint]
 
-    def add_transaction(self, transaction: Transaction):
-        if transaction.external_id not in self.existing_ids:
-            print(f"NEW TRANSACTION: {transaction.external_id}")
-            self.session.add(transaction)
+    def history_start(self, endpoint: str) -> int:
+        """Time (ms) to request a time based endpoint from: the checkpoint,
+        or `start_date` on the first import."""
+        return self.checkpoint(endpoint).last_time or to_milliseconds(
+            self.start_date
+        )
+
+    def advance(
+        self,
+        checkpoint: ImportCheckpoint,
+        last_time: int = None,
+        last_id: int = None,
+    ):
+        if last_time is not None:
+            checkpoint.last_time = max(checkpoint.last_time or 0, last_time)
+        if last_id is not None:
+            checkpoint.last_id = max(checkpoint.last_id or 0, last_id)
+
+    def add_transaction(self, row: dict):
+        self.pending.append(row)
+
+        if len(self.pending) >= settings.bulk_insert_batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write pending transactions, skipping already imported ones, and
+        commit them along with the checkpoints advanced so far.
+
+        Committing every batch keeps the holding and portfolio rows locked
+        only briefly, and a failed import resumes from its last batch.
+        """
+        if self.pending:
+            ids = insert_transactions(
+                self.session, self.pending, ignore_conflicts=True
+            )
+            apply_transactions(self.session, ids)
+            print(f"NEW TRANSACTIONS: {len(ids)} of {len(self.pending)}")
+            self.pending = []
+        self.session.commit()
+
+    def add_deposit_history(self, items: list[dict]):
+        checkpoint = self.checkpoint("deposit_history")
+        for item in items:
+            row = self.mapper.from_deposit_history(item)
+            self.add_transaction(row)
+            self.advance(checkpoint, last_time=item["insertTime"])
 
     def import_deposit_history(self):
         print("DEPOSIT HISTORY: START")
 
-        deposit_history = self.api.deposit_history()
-
-        for item in deposit_history:
-            transaction = self.mapper.from_deposit_history(item)
-            self.add_transaction(transaction)
+        start_time = self.history_start("deposit_history")
+        self.add_deposit_history(self.api.deposit_history(start_time))
 
         print("DEPOSIT HISTORY: DONE")
 
+    def add_withdraw_history(self, items: list[dict]):
+        checkpoint = self.checkpoint("withdraw_history")
+        for item in items:
+            row = self.mapper.from_withdraw_history(item)
+            self.add_transaction(row)
+            self.advance(
+                checkpoint,
+                last_time=to_milliseconds(
+                    datetime.fromisoformat(item["applyTime"])
+                ),
+            )
+
     def import_withdraw_history(self):
         print("WITHDRAW HISTORY: START")
 
-        withdraw_history = self.api.withdraw_history()
-
-        for item in withdraw_history:
-            transaction = self.mapper.from_withdraw_history(item)
-            self.add_transaction(transaction)
+        start_time = self.history_start("withdraw_history")
+        self.add_withdraw_history(self.api.withdraw_history(start_time))
 
         print("WITHDRAW HISTORY: DONE")
 
+    def add_asset_dividends(self, items: list[dict]):
+        checkpoint = self.checkpoint("asset_dividends")
+        for item in items:
+            row = self.mapper.from_asset_dividend(item)
+            self.add_transaction(row)
+            self.advance(checkpoint, last_time=item["divTime"])
+
     def import_asset_dividends(self):
         print("ASSET DIVIDENDS: START")
-        asset_dividends = self.api.asset_dividends()
 
-        for item in asset_dividends:
-            transaction = self.mapper.from_asset_dividend(item)
-            self.add_transaction(transaction)
+        start_time = self.history_start("asset_dividends")
+        self.add_asset_dividends(self.api.asset_dividends(start_time))
 
         print("ASSET DIVIDENDS: DONE")
 
+    def add_asset_dribblets(self, items: list[dict]):
+        checkpoint = self.checkpoint("asset_dribblets")
+        for item in items:
+            row = self.mapper.from_asset_dribblet(item)
+            self.add_transaction(row)
+            self.advance(checkpoint, last_time=item["operateTime"])
+
     def import_asset_dribblets(self):
         print("ASSET DRIBBLETS: START")
-        asset_dribblets = self.api.asset_dribblets()
 
-        for item in asset_dribblets:
-            transaction = self.mapper.from_asset_dribblet(item)
-            self.add_transaction(transaction)
+        start_time = self.history_start("asset_dribblets")
+        self.add_asset_dribblets(self.api.asset_dribblets(start_time))
 
         print("ASSET DRIBBLETS: DONE")
 
+    def add_fiat_orders(self, tran_type: int, items: list[dict]):
+        checkpoint = self.checkpoint(f"fiat_orders__{tran_type}")
+        for item in items:
+            row = self.mapper.from_fiat_orders(item, tran_type)
+            self.add_transaction(row)
+            self.advance(checkpoint, last_time=item["createTime"])
+
     def import_fiat_orders(self):
         print("FIAT ORDERS: START")
 
-        fiat_orders_buy = self.api.fiat_orders(0)
-        fiat_orders_sell = self.api.fiat_orders(1)
-
-        for item in fiat_orders_buy:
-            transaction = self.mapper.from_fiat_orders(item, 0)
-            self.add_transaction(transaction)
-
-        for item in fiat_orders_sell:
-            transaction = self.mapper.from_fiat_orders(item, 1)
-            self.add_transaction(transaction)
+        for tran_type in [0, 1]:
+            begin_time = self.history_start(f"fiat_orders__{tran_type}")
+            fiat_orders = self.api.fiat_orders(tran_type, begin_time)
+            self.add_fiat_orders(tran_type, fiat_orders)
 
         print("FIAT ORDERS: DONE")
 
+    def add_fiat_payments(self, tran_type: int, items: list[dict]):
+        checkpoint = self.checkpoint(f"fiat_payments__{tran_type}")
+        for item in items:
+            row = self.mapper.from_fiat_payments(item, tran_type)
+            self.add_transaction(row)
+            self.advance(checkpoint, last_time=item["createTime"])
+
     def import_fiat_payments(self):
         print("FIAT PAYMENTS: START")
 
-        fiat_payments_buy = self.api.fiat_payments(0)
-        fiat_payments_sell = self.api.fiat_payments(1)
+        for tran_type in [0, 1]:
+            begin_time = self.history_start(f"fiat_payments__{tran_type}")
+            fiat_payments = self.api.fiat_payments(tran_type, begin_time)
+            self.add_fiat_payments(tran_type, fiat_payments)
 
-        for item in fiat_payments_buy:
-            transaction = self.mapper.from_fiat_payments(item, 0)
-            self.add_transaction(transaction)
+        print("FIAT PAYMENTS: DONE")
 
-        for item in fiat_payments_sell:
-            transaction = self.mapper.from_fiat_payments(item, 1)
-            self.add_transaction(transaction)
+    def trade_flow_range(self) -> tuple[datetime, datetime]:
+        """Range of trade flow to query, skipping what the checkpoint
+        covers already."""
+        start_dt = self.start_date
+        checkpoint = self.checkpoint("trade_flow")
+        if checkpoint.last_time:
+            start_dt = max(
+                start_dt, from_milliseconds(checkpoint.last_time + 1)
+            )
 
-        print("FIAT PAYMENTS: DONE")
+        return start_dt, min(self.end_date, datetime.utcnow())
 
-    def _import_trade_flow_single_day(self, dt: datetime):
-        print(f"TRADE FLOW: {dt.date().isoformat()}")
+    def add_trade_flow(self, items: list[dict]):
+        for item in items:
+            row = self.mapper.from_trade_flow(item)
+            self.add_transaction(row)
 
-        trade_flow = self.api.convert_trade_flow(
-            start_dt=dt,
-            end_dt=dt + timedelta(days=1, milliseconds=-1),
+    def trade_flow_seen(self, end_dt: datetime):
+        """Advance the checkpoint past a range whose trade flow has been
+        imported completely, unless the range has not ended yet."""
+        self.advance(
+            self.checkpoint("trade_flow"),
+            last_time=to_milliseconds(min(end_dt, datetime.utcnow())),
         )
 
-        for item in trade_flow:
-            transaction = self.mapper.from_trade_flow(item)
-            self.add_transaction(transaction)
-
     def import_trade_flow(self):
         print("TRADE FLOW: START")
 
-        for dt in rrule(DAILY, dtstart=self.start_date, until=self.end_date):
-            self._import_trade_flow_single_day(dt)
+        start_dt, end_dt = self.trade_flow_range()
+        if start_dt <= end_dt:
+            self.add_trade_flow(
+                self.api.convert_trade_flow(start_dt=start_dt, end_dt=end_dt)
+            )
+            self.trade_flow_seen(end_dt)
 
         print("TRADE FLOW: DONE")
 
-    def _import_symbol_trades(self, symbol: dict):
-        print(f"MY TRADES: {symbol['symbol']}")
+    def symbol_trades_from_id(self, symbol: dict) -> Optional[int]:
+        checkpoint = self.checkpoint(f"my_trades__{symbol['symbol']}")
+        return checkpoint.last_id + 1 if checkpoint.last_id else None
+
+    def add_symbol_trades(self, symbol: dict, items: list[dict]):
+        checkpoint = self.checkpoint(f"my_trades__{symbol['symbol']}")
+        for item in items:
+            row = self.mapper.from_my_trades(symbol, item)
+            self.add_transaction(row)
+            self.advance(checkpoint, last_id=item["id"])
+
+    def exchange_symbols(self) -> list[dict]:
+        symbols = http_cache.get_fresh(EXCHANGE_SYMBOLS_KEY)
+
+        if symbols is None:
+            symbols = cache_exchange_symbols(self.api.exchange_info())
+
+        return symbols
+
+    def held_assets(self, balances: list[dict]) -> set[str]:
+        """Assets the account holds now or has held at some point."""
+        assets = {
+            balance["asset"]
+            for balance in balances
+            if Decimal(balance["free"]) + Decimal(balance["locked"]) > 0
+        }
+
+        # holdings keep a row for every asset the portfolio ever moved,
+        # including the ones imported earlier in this run
+        self.flush()
+        assets.update(
+            self.session.exec(
+                select(Holding.asset).where(
+                    Holding.portfolio_id == self.portfolio_id
+                )
+            )
+        )
+
+        return assets
+
+    def discover_symbols(
+        self, balances: list[dict], exchange_symbols: list[dict]
+    ) -> list[dict]:
+        """Symbols the account may have traded: pairs with a base or quote
+        asset it has held, and pairs found for this exchange before."""
+        known = set()
+        if self.exchange_id is not None:
+            known.update(
+                self.session.exec(
+                    select(ExchangeSymbol.symbol).where(
+                        ExchangeSymbol.exchange_id == self.exchange_id
+                    )
+                )
+            )
+
+        assets = self.held_assets(balances)
+        symbols = [
+            symbol
+            for symbol in exchange_symbols
+            if symbol["symbol"] in known
+            or symbol["baseAsset"] in assets
+            or symbol["quoteAsset"] in assets
+        ]
+
+        if self.exchange_id is not None:
+            self.session.add_all(
+                ExchangeSymbol(
+                    exchange_id=self.exchange_id, symbol=symbol["symbol"]
+                )
+                for symbol in symbols
+                if symbol["symbol"] not in known
+            )
 
-        symbol_trades = self.api.my_trades(symbol["symbol"])
-        for item in symbol_trades:
-            transaction = self.mapper.from_my_trades(symbol, item)
-            self.add_transaction(transaction)
+        return symbols
 
     def import_my_trades(self):
         print("MY TRADES: START")
 
-        exchange_info = self.api.exchange_info()
+        symbols = self.discover_symbols(
+            self.api.account()["balances"], self.exchange_symbols()
+        )
+        print(f"MY TRADES: {len(symbols)} SYMBOLS")
 
-        for symbol in exchange_info["symbols"]:
-            self._import_symbol_trades(symbol)
+        for symbol in symbols:
+            print(f"MY TRADES: {symbol['symbol']}")
+            symbol_trades = self.api.my_trades(
+                symbol["symbol"], self.symbol_trades_from_id(symbol)
+            )
+            self.add_symbol_trades(symbol, symbol_trades)
 
         print("MY TRADES: DONE")
 
@@ -288,6 +540,8 @@ class BinanceImporter:
         print("EXCHANGE IMPORT: START")
 
         try:
+            self.load_checkpoints()
+            self.import_deposit_history()
             self.import_withdraw_history()
             self.import_asset_dividends()
             self.import_asset_dribblets()
@@ -295,7 +549,7 @@ class BinanceImporter:
             self.import_fiat_payments()
             self.import_trade_flow()
             self.import_my_trades()
-            self.session.commit()
+            self.flush()
         finally:
             self.session.close()
             self.api.session.close()
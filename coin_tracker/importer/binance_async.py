@@ -0,0 +1,172 @@
+"""Asyncio variant of the Binance importer.
+
+Independent endpoints of an account are fetched concurrently, and many
+accounts are imported from one event loop. Requests still go through the
+process-wide rate limiters, so concurrency only fills the budget that
+sequential requests leave idle. Database writes stay synchronous and happen
+between awaits, so an importer's session is never used by two tasks at once.
+While one of them waits on a row lock the whole loop waits, which is why
+accounts of the same portfolio must not be imported on one loop together.
+"""
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator
+
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from coin_tracker.config import settings
+from coin_tracker.exchanges.binance_api import AsyncBinanceAPI
+from coin_tracker.exchanges.http_cache import http_cache
+from coin_tracker.importer.binance import (
+    EXCHANGE_SYMBOLS_KEY,
+    BinanceImporter,
+    cache_exchange_symbols,
+)
+from coin_tracker.models import Exchange
+from coin_tracker.security import decrypt_data
+
+
+async def gather_all(*aws) -> list:
+    """Like asyncio.gather, but cancels the other awaitables as soon as one
+    of them fails."""
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+async def chunks(
+    items: AsyncIterator, size: int = None
+) -> AsyncIterator[list]:
+    """Group streamed items into lists for the batch handlers."""
+    size = size or settings.bulk_insert_batch_size
+    chunk = []
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class AsyncBinanceImporter(BinanceImporter):
+    api_class = AsyncBinanceAPI
+
+    async def import_deposit_history(self):
+        start_time = self.history_start("deposit_history")
+        async for items in chunks(self.api.deposit_history(start_time)):
+            self.add_deposit_history(items)
+
+    async def import_withdraw_history(self):
+        start_time = self.history_start("withdraw_history")
+        async for items in chunks(self.api.withdraw_history(start_time)):
+            self.add_withdraw_history(items)
+
+    async def import_asset_dividends(self):
+        start_time = self.history_start("asset_dividends")
+        async for items in chunks(self.api.asset_dividends(start_time)):
+            self.add_asset_dividends(items)
+
+    async def import_asset_dribblets(self):
+        start_time = self.history_start("asset_dribblets")
+        async for items in chunks(self.api.asset_dribblets(start_time)):
+            self.add_asset_dribblets(items)
+
+    async def _import_fiat_orders(self, tran_type: int):
+        begin_time = self.history_start(f"fiat_orders__{tran_type}")
+        fiat_orders = self.api.fiat_orders(tran_type, begin_time)
+        async for items in chunks(fiat_orders):
+            self.add_fiat_orders(tran_type, items)
+
+    async def import_fiat_orders(self):
+        await gather_all(*map(self._import_fiat_orders, [0, 1]))
+
+    async def _import_fiat_payments(self, tran_type: int):
+        begin_time = self.history_start(f"fiat_payments__{tran_type}")
+        fiat_payments = self.api.fiat_payments(tran_type, begin_time)
+        async for items in chunks(fiat_payments):
+            self.add_fiat_payments(tran_type, items)
+
+    async def import_fiat_payments(self):
+        await gather_all(*map(self._import_fiat_payments, [0, 1]))
+
+    async def import_trade_flow(self):
+        start_dt, end_dt = self.trade_flow_range()
+        if start_dt <= end_dt:
+            trade_flow = self.api.convert_trade_flow(
+                start_dt=start_dt, end_dt=end_dt
+            )
+            async for items in chunks(trade_flow):
+                self.add_trade_flow(items)
+            self.trade_flow_seen(end_dt)
+
+    async def _import_symbol_trades(self, symbol: dict):
+        symbol_trades = self.api.my_trades(
+            symbol["symbol"], self.symbol_trades_from_id(symbol)
+        )
+        async for items in chunks(symbol_trades):
+            self.add_symbol_trades(symbol, items)
+
+    async def exchange_symbols(self) -> list[dict]:
+        symbols = http_cache.get_fresh(EXCHANGE_SYMBOLS_KEY)
+
+        if symbols is None:
+            symbols = cache_exchange_symbols(await self.api.exchange_info())
+
+        return symbols
+
+    async def import_my_trades(self):
+        account, exchange_symbols = await gather_all(
+            self.api.account(), self.exchange_symbols()
+        )
+        symbols = self.discover_symbols(account["balances"], exchange_symbols)
+
+        await gather_all(*map(self._import_symbol_trades, symbols))
+
+    async def run(self):
+        print(f"EXCHANGE IMPORT: START {self.portfolio_id}")
+
+        try:
+            self.load_checkpoints()
+            await gather_all(
+                self.import_deposit_history(),
+                self.import_withdraw_history(),
+                self.import_asset_dividends(),
+                self.import_asset_dribblets(),
+                self.import_fiat_orders(),
+                self.import_fiat_payments(),
+                self.import_trade_flow(),
+            )
+            # symbols are discovered from the assets imported above
+            await self.import_my_trades()
+            self.flush()
+        finally:
+            self.session.close()
+            await self.api.session.aclose()
+
+        print(f"EXCHANGE IMPORT: DONE {self.portfolio_id}")
+
+
+async def import_exchange(
+    engine: Engine,
+    exchange: Exchange,
+    start_date: datetime,
+    end_date: datetime,
+):
+    importer = AsyncBinanceImporter(
+        session=Session(engine),
+        portfolio_id=exchange.portfolio_id,
+        api_key=decrypt_data(exchange.api_key),
+        secret_key=decrypt_data(exchange.secret_key),
+        start_date=start_date,
+        end_date=end_date,
+        exchange_id=exchange.id,
+    )
+    await importer.run()
+
@@ -0,0 +1,103 @@
+import codecs
+import csv
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import BinaryIO, Iterator
+
+from sqlmodel import Session
+
+from coin_tracker.bulk import chunked, insert_transactions
+from coin_tracker.config import settings
+from coin_tracker.constants import TransactionType
+from coin_tracker.ledger import apply_transactions
+
+REQUIRED_COLUMNS = {"transaction_type", "transaction_date"}
+ASSET_COLUMNS = ["buy_asset", "sell_asset", "fee_asset"]
+AMOUNT_COLUMNS = ["buy_amount", "sell_amount", "fee_amount"]
+TEXT_COLUMNS = ["external_id", "note"]
+
+MAX_REPORTED_ERRORS = 100
+
+
+class CSVImportError(Exception):
+    pass
+
+
+class CSVImporter:
+    """Import transactions from a CSV file with Transaction column headers.
+
+    The file is read lazily and written in fixed-size batches; invalid rows
+    are skipped and reported, rows with an already imported external_id are
+    skipped and counted as duplicates.
+    """
+
+    def __init__(self, session: Session, portfolio_id: int):
+        self.session = session
+        self.portfolio_id = portfolio_id
+
+        self.imported = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.errors = []
+
+    def parse_row(self, row: dict) -> dict:
+        transaction = {
+            "portfolio_id": self.portfolio_id,
+            "transaction_type": TransactionType(row["transaction_type"]),
+            "transaction_date": datetime.fromisoformat(
+                row["transaction_date"]
+            ),
+        }
+
+        for column in ASSET_COLUMNS + TEXT_COLUMNS:
+            transaction[column] = row.get(column) or None
+
+        for column in AMOUNT_COLUMNS:
+            try:
+                transaction[column] = Decimal(row.get(column) or 0)
+            except InvalidOperation:
+                raise ValueError(f"Invalid {column}: {row[column]!r}")
+
+        return transaction
+
+    def read_rows(self, file: BinaryIO) -> Iterator[dict]:
+        reader = csv.DictReader(codecs.iterdecode(file, "utf-8-sig"))
+
+        if missing := REQUIRED_COLUMNS - set(reader.fieldnames or []):
+            raise CSVImportError(
+                f"Missing columns: {', '.join(sorted(missing))}"
+            )
+
+        for row in reader:
+            try:
+                yield self.parse_row(row)
+            except (TypeError, ValueError) as exc:
+                self.add_error(reader.line_num, str(exc))
+
+    def add_error(self, line_num: int, error: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": line_num, "error": error})
+
+    def run(self, file: BinaryIO) -> dict:
+        rows = self.read_rows(file)
+
+        try:
+            for batch in chunked(rows, settings.bulk_insert_batch_size):
+                ids = insert_transactions(
+                    self.session, batch, ignore_conflicts=True
+                )
+                apply_transactions(self.session, ids)
+                self.imported += len(ids)
+                self.duplicates += len(batch) - len(ids)
+        except UnicodeDecodeError:
+            raise CSVImportError("The file is not UTF-8 encoded.")
+
+        self.session.commit()
+
+        return {
+            "imported": self.imported,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
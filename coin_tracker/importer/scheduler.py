@@ -0,0 +1,264 @@
+"""Scheduling of exchange imports.
+
+Every exchange account has an import job holding the time of its next run.
+Due jobs are run by a bounded pool of workers, most urgent first: by
+priority, then by how long they have been due. After a successful import a
+job runs again `interval` seconds later, after a failure it backs off
+exponentially. Both delays are jittered, so that accounts added together do
+not keep running in lockstep.
+
+Any number of workers, on any number of nodes, share the jobs. A worker
+leases the jobs it starts and renews the leases while importing; jobs of a
+worker that died become due again once their leases run out. Accounts of
+the same portfolio are never imported at once: their writes lock the same
+holding and portfolio rows, and a worker's imports share one event loop.
+"""
+import asyncio
+import os
+import random
+import socket
+from datetime import datetime, timedelta
+
+from sqlalchemy import literal, or_, update
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from coin_tracker.bulk import DIALECT_INSERTS
+from coin_tracker.config import settings
+from coin_tracker.constants import ExchangeType
+from coin_tracker.importer.binance_async import import_exchange
+from coin_tracker.models import Exchange, ImportJob
+
+
+def ensure_jobs(session: Session):
+    """Create jobs, due right away, for accounts that have none yet."""
+    dialect_insert = DIALECT_INSERTS[session.get_bind().dialect.name]
+    session.execute(
+        dialect_insert(ImportJob.__table__)
+        .from_select(
+            ["exchange_id", "priority", "interval", "next_run_at", "failures"],
+            select(
+                Exchange.id,
+                literal(0),
+                literal(settings.import_interval),
+                literal(datetime.utcnow()),
+                literal(0),
+            ).where(
+                Exchange.exchange_type == ExchangeType.BINANCE,
+                Exchange.id.not_in(select(ImportJob.exchange_id)),
+            ),
+        )
+        .on_conflict_do_nothing()
+    )
+    session.commit()
+
+
+def lease_end(now: datetime) -> datetime:
+    return now + timedelta(seconds=settings.import_lease_duration)
+
+
+def claim_jobs(
+    session: Session, worker_id: str, now: datetime, limit: int
+) -> list[int]:
+    """Lease up to `limit` due jobs to `worker_id` and return their exchange
+    ids.
+
+    On PostgreSQL the rows are selected FOR UPDATE SKIP LOCKED, so workers
+    polling at the same moment claim different jobs instead of queueing
+    behind each other's locks. Jobs of portfolios with a leased job are
+    skipped, as is all but the most urgent job of each portfolio.
+    """
+    busy_portfolios = (
+        select(Exchange.portfolio_id)
+        .join(ImportJob, ImportJob.exchange_id == Exchange.id)
+        .where(ImportJob.leased_until >= now)
+    )
+    jobs = session.exec(
+        select(ImportJob, Exchange.portfolio_id)
+        .join(Exchange, Exchange.id == ImportJob.exchange_id)
+        .where(
+            ImportJob.next_run_at <= now,
+            or_(
+                ImportJob.leased_until.is_(None),
+                ImportJob.leased_until < now,
+            ),
+            Exchange.portfolio_id.not_in(busy_portfolios),
+        )
+        .order_by(ImportJob.priority.desc(), ImportJob.next_run_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True, of=ImportJob)
+    ).all()
+
+    exchange_ids, portfolio_ids = [], set()
+    for job, portfolio_id in jobs:
+        if portfolio_id in portfolio_ids:
+            continue
+        portfolio_ids.add(portfolio_id)
+        job.leased_by = worker_id
+        job.leased_until = lease_end(now)
+        session.add(job)
+        exchange_ids.append(job.exchange_id)
+    session.commit()
+
+    return exchange_ids
+
+
+def renew_leases(
+    session: Session, worker_id: str, exchange_ids: list[int], now: datetime
+):
+    session.execute(
+        update(ImportJob)
+        .where(
+            ImportJob.exchange_id.in_(exchange_ids),
+            ImportJob.leased_by == worker_id,
+        )
+        .values(leased_until=lease_end(now))
+    )
+    session.commit()
+
+
+def jittered(seconds: float) -> timedelta:
+    jitter = settings.import_jitter
+    return timedelta(seconds=seconds * random.uniform(1 - jitter, 1 + jitter))
+
+
+def backoff(failures: int) -> float:
+    """Seconds to wait before retrying after `failures` failures in a row."""
+    return min(
+        settings.import_backoff_base * 2 ** (failures - 1),
+        settings.import_backoff_max,
+    )
+
+
+def release(job: ImportJob):
+    job.leased_by = None
+    job.leased_until = None
+
+
+def record_success(job: ImportJob, started_at: datetime):
+    release(job)
+    job.last_run_at = job.last_success_at = started_at
+    job.failures = 0
+    job.last_error = None
+    job.next_run_at = started_at + jittered(job.interval)
+
+
+def record_failure(job: ImportJob, started_at: datetime, error: str):
+    release(job)
+    job.last_run_at = started_at
+    job.failures += 1
+    job.last_error = error
+    job.next_run_at = datetime.utcnow() + jittered(backoff(job.failures))
+
+
+async def run_job(engine: Engine, exchange_id: int, worker_id: str):
+    # no session is held while importing, the importer opens its own
+    with Session(engine) as session:
+        job = session.get(ImportJob, exchange_id)
+        exchange = session.get(Exchange, exchange_id)
+        # checkpoints make up for anything older than the last success,
+        # until then the whole history is imported
+        start_date = job.last_success_at or settings.import_backfill_start
+    started_at = datetime.utcnow()
+
+    try:
+        await import_exchange(
+            engine, exchange, start_date=start_date, end_date=started_at
+        )
+    except Exception as exc:
+        print(f"EXCHANGE IMPORT: FAILED {exchange_id}: {exc!r}")
+        error = repr(exc)
+    else:
+        error = None
+
+    with Session(engine) as session:
+        job = session.get(ImportJob, exchange_id)
+        if job.leased_by != worker_id:
+            # the lease ran out and the job was claimed by another worker
+            return
+        if error is None:
+            record_success(job, started_at)
+        else:
+            record_failure(job, started_at, error)
+        session.add(job)
+        session.commit()
+
+
+class ImportScheduler:
+    def __init__(
+        self,
+        engine: Engine,
+        concurrency: int = None,
+        poll_interval: float = None,
+        worker_id: str = None,
+    ):
+        self.engine = engine
+        self.concurrency = concurrency or settings.import_concurrency
+        self.poll_interval = poll_interval or settings.import_poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.running: dict[int, asyncio.Task] = {}
+
+    def poll(self) -> list[int]:
+        """Renew leases of running jobs, then claim and start due jobs while
+        there are idle workers. Return exchange ids of the started jobs."""
+        idle = self.concurrency - len(self.running)
+
+        with Session(self.engine) as session:
+            if self.running:
+                renew_leases(
+                    session,
+                    self.worker_id,
+                    list(self.running),
+                    datetime.utcnow(),
+                )
+            if idle <= 0:
+                return []
+            ensure_jobs(session)
+            exchange_ids = claim_jobs(
+                session, self.worker_id, datetime.utcnow(), idle
+            )
+
+        for exchange_id in exchange_ids:
+            task = asyncio.create_task(
+                run_job(self.engine, exchange_id, self.worker_id)
+            )
+            task.add_done_callback(
+                lambda _, exchange_id=exchange_id: self.running.pop(
+                    exchange_id
+                )
+            )
+            self.running[exchange_id] = task
+
+        return exchange_ids
+
+    def poll_delay(self, failures: int) -> float:
+        """Seconds to wait before polling again after `failures` failed polls
+        in a row, short enough to renew the leases of running jobs."""
+        return min(
+            self.poll_interval * 2 ** failures,
+            settings.import_lease_duration / 2,
+        )
+
+    async def run(self):
+        failures = 0
+        while True:
+            try:
+                self.poll()
+            except Exception as exc:
+                # e.g. the database is unreachable, running jobs carry on
+                failures += 1
+                print(f"IMPORT SCHEDULER: POLL FAILED: {exc!r}")
+            else:
+                failures = 0
+
+            if failures:
+                await asyncio.sleep(self.poll_delay(failures))
+            # wake up early when a worker becomes idle
+            elif self.running:
+                await asyncio.wait(
+                    set(self.running.values()),
+                    timeout=self.poll_interval,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+            else:
+                await asyncio.sleep(self.poll_interval)
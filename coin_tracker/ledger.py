@@ -0,0 +1,106 @@
+import argparse
+
+from sqlalchemy import delete, func, true, union_all, update
+from sqlalchemy.sql import ColumnElement, Select
+from sqlmodel import Session, select
+
+from .bulk import DIALECT_INSERTS, chunked
+from .config import settings
+from .models import Holding, Portfolio, Transaction
+from .pnl import invalidate_pnl
+from .snapshots import invalidate_snapshots
+
+
+def holding_deltas(condition: ColumnElement, sign: int = 1) -> Select:
+    """Per (portfolio_id, asset) balance change of matching transactions."""
+    legs = union_all(
+        *[
+            select(
+                Transaction.portfolio_id,
+                asset.label("asset"),
+                (func.coalesce(amount, 0) * direction).label("amount"),
+            ).where(condition, asset.is_not(None))
+            for asset, amount, direction in [
+                (Transaction.buy_asset, Transaction.buy_amount, 1),
+                (Transaction.sell_asset, Transaction.sell_amount, -1),
+                (Transaction.fee_asset, Transaction.fee_amount, -1),
+            ]
+        ]
+    ).subquery()
+
+    return select(
+        legs.c.portfolio_id,
+        legs.c.asset,
+        func.sum(legs.c.amount) * sign,
+    ).group_by(legs.c.portfolio_id, legs.c.asset)
+
+
+def apply_transactions(
+    session: Session,
+    transaction_ids: list[int],
+    sign: int = 1,
+):
+    """Add (sign=1) or remove (sign=-1) transactions from portfolio holdings
+    and drop cached PnL and stale snapshots of the affected portfolios.
+    Their ledger version is bumped so that other processes drop cached PnL
+    as well.
+
+    Must be called while the transactions exist, in the same database
+    transaction that writes or deletes them.
+    """
+    table = Holding.__table__
+    dialect_insert = DIALECT_INSERTS[session.get_bind().dialect.name]
+
+    for batch in chunked(transaction_ids, settings.bulk_insert_batch_size):
+        deltas = holding_deltas(Transaction.id.in_(batch), sign)
+        statement = dialect_insert(table).from_select(
+            ["portfolio_id", "asset", "quantity"], deltas
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=["portfolio_id", "asset"],
+            set_={"quantity": table.c.quantity + statement.excluded.quantity},
+        )
+        session.execute(statement)
+
+        portfolio_ids = invalidate_snapshots(session, batch)
+        session.execute(
+            update(Portfolio)
+            .where(Portfolio.id.in_(portfolio_ids))
+            .values(ledger_version=Portfolio.ledger_version + 1)
+        )
+        invalidate_pnl(portfolio_ids)
+
+
+def rebuild_holdings(session: Session, portfolio_id: int = None):
+    """Recompute holdings from the full transaction history."""
+    if portfolio_id is None:
+        condition = true()
+        session.execute(delete(Holding))
+    else:
+        condition = Transaction.portfolio_id == portfolio_id
+        session.execute(
+            delete(Holding).where(Holding.portfolio_id == portfolio_id)
+        )
+
+    session.execute(
+        Holding.__table__.insert().from_select(
+            ["portfolio_id", "asset", "quantity"], holding_deltas(condition)
+        )
+    )
+
+
+def main():
+    from .database import engine
+
+    parser = argparse.ArgumentParser(description="Portfolio ledger tools")
+    parser.add_argument("command", choices=["rebuild-holdings"])
+    parser.add_argument("--portfolio-id", type=int)
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        rebuild_holdings(session, args.portfolio_id)
+        session.commit()
+
+
+if __name__ == "__main__":
+    main()
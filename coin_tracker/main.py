@@ -1,19 +1,10 @@
-import threading
-
 from fastapi import FastAPI
-from .routes import auth, portfolios, transactions, exchanges
-from .importer.daemon import start_importer_daemon
-
-
-def run_daemon():
-    task = threading.Thread(target=start_importer_daemon, daemon=True)
-    task.start()
+from .routes import auth, portfolios, transactions, exchanges, metrics
 
 
-app = FastAPI(
-    title="CoinSage - Portfolio Tracker", debug=True, on_startup=[run_daemon]
-)
+app = FastAPI(title="CoinSage - Portfolio Tracker", debug=True)
 app.include_router(auth.router)
 app.include_router(portfolios.router)
 app.include_router(transactions.router)
 app.include_router(exchanges.router)
+app.include_router(metrics.router)
@@ -1,14 +1,15 @@
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 from typing import List
 
+from sqlalchemy import JSON, BigInteger, Column, Index, UniqueConstraint
 from sqlmodel import SQLModel, Field, Relationship
-from .constants import TransactionType, ExchangeType
+from .constants import TransactionType, ExchangeType, KlineInterval
 
 
 class User(SQLModel, table=True):
     id: int = Field(default=None, primary_key=True, nullable=False)
-    username: str
+    username: str = Field(index=True, sa_column_kwargs={"unique": True})
     password: str
 
     portfolios: List["Portfolio"] = Relationship(back_populates="user")
@@ -16,8 +17,13 @@ class User(SQLModel, table=True):
 
 class Portfolio(SQLModel, table=True):
     id: int = Field(default=None, primary_key=True, nullable=False)
-    user_id: int = Field(foreign_key="user.id")
+    user_id: int = Field(foreign_key="user.id", index=True)
     name: str
+    # bumped whenever transactions are applied, so that processes caching
+    # derived data can tell that it went stale
+    ledger_version: int = Field(
+        default=0, nullable=False, sa_column_kwargs={"server_default": "0"}
+    )
 
     user: User = Relationship(back_populates="portfolios")
     transactions: List["Transaction"] = Relationship(
@@ -29,9 +35,36 @@ class Portfolio(SQLModel, table=True):
     )
 
     exchanges: List["Exchange"] = Relationship(back_populates="portfolio")
+    holdings: List["Holding"] = Relationship(
+        back_populates="portfolio",
+        sa_relationship_kwargs={
+            "cascade": "all, delete-orphan",
+            "single_parent": True,
+        },
+    )
+    snapshots: List["PortfolioSnapshot"] = Relationship(
+        sa_relationship_kwargs={
+            "cascade": "all, delete-orphan",
+            "single_parent": True,
+        },
+    )
 
 
 class Transaction(SQLModel, table=True):
+    __table_args__ = (
+        Index(
+            "ix_transaction_portfolio_id_transaction_date_id",
+            "portfolio_id",
+            "transaction_date",
+            "id",
+        ),
+        UniqueConstraint(
+            "portfolio_id",
+            "external_id",
+            name="uq_transaction_portfolio_id_external_id",
+        ),
+    )
+
     id: int = Field(default=None, primary_key=True, nullable=False)
     portfolio_id: int = Field(foreign_key="portfolio.id")
 
@@ -62,3 +95,67 @@ class Exchange(SQLModel, table=True):
     secret_key: str
 
     portfolio: Portfolio = Relationship(back_populates="exchanges")
+
+
+class ExchangeSymbol(SQLModel, table=True):
+    __tablename__ = "exchange_symbol"
+
+    exchange_id: int = Field(foreign_key="exchange.id", primary_key=True)
+    symbol: str = Field(primary_key=True)
+
+
+class ImportCheckpoint(SQLModel, table=True):
+    __tablename__ = "import_checkpoint"
+
+    exchange_id: int = Field(foreign_key="exchange.id", primary_key=True)
+    endpoint: str = Field(primary_key=True)
+    # latest record time (ms since epoch) and record id imported
+    last_time: int = Field(default=None, sa_column=Column(BigInteger))
+    last_id: int = Field(default=None, sa_column=Column(BigInteger))
+
+
+class ImportJob(SQLModel, table=True):
+    __tablename__ = "import_job"
+
+    exchange_id: int = Field(foreign_key="exchange.id", primary_key=True)
+    priority: int = 0
+    interval: int  # seconds between successful imports
+    next_run_at: datetime = Field(index=True)
+    last_run_at: datetime = None
+    last_success_at: datetime = None
+    failures: int = 0
+    last_error: str = None
+    # worker running the job and until when, unless it renews the lease
+    leased_by: str = None
+    leased_until: datetime = None
+
+
+class Holding(SQLModel, table=True):
+    portfolio_id: int = Field(foreign_key="portfolio.id", primary_key=True)
+    asset: str = Field(primary_key=True)
+    quantity: Decimal = 0
+
+    portfolio: Portfolio = Relationship(back_populates="holdings")
+
+
+class PortfolioSnapshot(SQLModel, table=True):
+    __tablename__ = "portfolio_snapshot"
+
+    portfolio_id: int = Field(foreign_key="portfolio.id", primary_key=True)
+    snapshot_date: date = Field(primary_key=True)
+    value: float
+    holdings: dict = Field(default_factory=dict, sa_column=Column(JSON))
+
+
+class PriceHistory(SQLModel, table=True):
+    __tablename__ = "price_history"
+
+    symbol: str = Field(primary_key=True)
+    interval: KlineInterval = Field(primary_key=True)
+    open_time: datetime = Field(primary_key=True)
+
+    open: Decimal
+    high: Decimal
+    low: Decimal
+    close: Decimal
+    volume: Decimal
@@ -0,0 +1,105 @@
+import base64
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Query, Response, status
+from sqlalchemy import or_, tuple_
+from sqlmodel import Session
+from sqlmodel.sql.expression import SelectOfScalar
+
+from .constants import TransactionType
+from .models import Transaction
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(transaction: Transaction) -> str:
+    value = f"{transaction.transaction_date.isoformat()}|{transaction.id}"
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        value = base64.urlsafe_b64decode(cursor.encode()).decode()
+        transaction_date, transaction_id = value.split("|")
+        return datetime.fromisoformat(transaction_date), int(transaction_id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor.",
+        )
+
+
+class TransactionPage:
+    """Filters and keyset pagination over (transaction_date, id), newest first.
+
+    The cursor of the next page is returned in the X-Next-Cursor header.
+    """
+
+    def __init__(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = Query(100, ge=1, le=1000),
+        asset: Optional[str] = None,
+        transaction_type: Optional[TransactionType] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+    ):
+        self.cursor = decode_cursor(cursor) if cursor else None
+        self.limit = limit
+        self.asset = asset
+        self.transaction_type = transaction_type
+        self.date_from = date_from
+        self.date_to = date_to
+
+    def filter(self, statement: SelectOfScalar) -> SelectOfScalar:
+        if self.asset:
+            statement = statement.where(
+                or_(
+                    Transaction.buy_asset == self.asset,
+                    Transaction.sell_asset == self.asset,
+                    Transaction.fee_asset == self.asset,
+                )
+            )
+        if self.transaction_type:
+            statement = statement.where(
+                Transaction.transaction_type == self.transaction_type
+            )
+        if self.date_from:
+            statement = statement.where(
+                Transaction.transaction_date >= self.date_from
+            )
+        if self.date_to:
+            statement = statement.where(
+                Transaction.transaction_date < self.date_to
+            )
+
+        return statement
+
+    def paginate(
+        self,
+        session: Session,
+        statement: SelectOfScalar,
+        response: Response,
+    ) -> list[Transaction]:
+        statement = self.filter(statement)
+
+        if self.cursor:
+            statement = statement.where(
+                tuple_(Transaction.transaction_date, Transaction.id)
+                < tuple_(*self.cursor)
+            )
+
+        statement = statement.order_by(
+            Transaction.transaction_date.desc(), Transaction.id.desc()
+        ).limit(self.limit + 1)
+
+        transactions = session.exec(statement).all()
+
+        if len(transactions) > self.limit:
+            transactions = transactions[: self.limit]
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+                transactions[-1]
+            )
+
+        return transactions
@@ -0,0 +1,278 @@
+"""Cost basis and realized/unrealized PnL over a portfolio's transactions.
+
+Every transaction is split into legs: +buy_amount of buy_asset,
+-sell_amount of sell_asset and -fee_amount of fee_asset. A leg is valued in
+the quote asset when the other side of the trade is the quote asset:
+acquisitions paid in quote carry their cost, disposals for quote carry their
+proceeds. Acquisitions of unknown value (deposits, crypto-to-crypto trades)
+enter with zero cost, disposals of unknown value realize nothing. Fees paid
+in the quote asset are reported separately.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, Union
+
+import numpy as np
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from .cache import TTLCache
+from .config import settings
+from .constants import CostBasisMethod
+from .models import Portfolio, Transaction
+
+pnl_cache = TTLCache(settings.pnl_cache_size, settings.pnl_cache_ttl)
+
+
+@dataclass
+class TransactionArrays:
+    dates: np.ndarray
+    buy_asset: np.ndarray
+    buy_amount: np.ndarray
+    sell_asset: np.ndarray
+    sell_amount: np.ndarray
+    fee_asset: np.ndarray
+    fee_amount: np.ndarray
+
+
+def load_transactions(
+    session: Session,
+    portfolio_id: int,
+    date_from: datetime = None,
+    date_to: datetime = None,
+) -> TransactionArrays:
+    statement = (
+        select(
+            Transaction.transaction_date,
+            func.coalesce(Transaction.buy_asset, ""),
+            func.coalesce(Transaction.buy_amount, 0),
+            func.coalesce(Transaction.sell_asset, ""),
+            func.coalesce(Transaction.sell_amount, 0),
+            func.coalesce(Transaction.fee_asset, ""),
+            func.coalesce(Transaction.fee_amount, 0),
+        )
+        .where(Transaction.portfolio_id == portfolio_id)
+        .order_by(Transaction.transaction_date, Transaction.id)
+    )
+    if date_from:
+        statement = statement.where(Transaction.transaction_date >= date_from)
+    if date_to:
+        statement = statement.where(Transaction.transaction_date < date_to)
+
+    columns = list(zip(*session.execute(statement).all())) or [()] * 7
+
+    return TransactionArrays(
+        dates=np.array(columns[0], dtype="datetime64[us]"),
+        buy_asset=np.array(columns[1], dtype=str),
+        buy_amount=np.array(columns[2], dtype=float),
+        sell_asset=np.array(columns[3], dtype=str),
+        sell_amount=np.array(columns[4], dtype=float),
+        fee_asset=np.array(columns[5], dtype=str),
+        fee_amount=np.array(columns[6], dtype=float),
+    )
+
+
+def _match_fifo(quantity: np.ndarray, value: np.ndarray):
+    # the cost of the first N units disposed is the cumulative cost curve of
+    # acquisitions evaluated at N, so all disposals are matched at once;
+    # the position is floored at zero so that disposing of more than is
+    # held does not eat into later acquisitions
+    acquired = quantity > 0
+    position = np.cumsum(quantity)
+    position -= np.minimum.accumulate(np.minimum(position, 0.0))
+    acquired_total = np.cumsum(np.where(acquired, quantity, 0.0))
+
+    acquired_quantity = np.concatenate([[0.0], acquired_total[acquired]])
+    acquired_cost = np.concatenate(
+        [[0.0], np.cumsum(np.nan_to_num(value[acquired]))]
+    )
+    disposed_quantity = (acquired_total - position)[~acquired]
+
+    disposed_cost = np.interp(
+        disposed_quantity, acquired_quantity, acquired_cost
+    )
+    relieved = np.diff(disposed_cost, prepend=0.0)
+    remaining = acquired_cost[-1] - (
+        disposed_cost[-1] if len(disposed_cost) else 0.0
+    )
+
+    return relieved, remaining
+
+
+def _match_lifo(quantity: np.ndarray, value: np.ndarray):
+    # lots are consumed newest first, which is sequential by nature
+    lots = []
+    relieved = []
+    for leg_quantity, leg_value in zip(quantity.tolist(), value.tolist()):
+        if leg_quantity > 0:
+            cost = 0.0 if leg_value != leg_value else leg_value
+            lots.append([leg_quantity, cost / leg_quantity])
+            continue
+
+        left, cost = -leg_quantity, 0.0
+        while left > 0 and lots:
+            lot = lots[-1]
+            take = min(lot[0], left)
+            cost += take * lot[1]
+            lot[0] -= take
+            left -= take
+            if lot[0] <= 0:
+                lots.pop()
+        relieved.append(cost)
+
+    remaining = sum(lot_quantity * unit for lot_quantity, unit in lots)
+
+    return np.array(relieved), remaining
+
+
+def _match_average(quantity: np.ndarray, value: np.ndarray):
+    held, cost_basis = 0.0, 0.0
+    relieved = []
+    for leg_quantity, leg_value in zip(quantity.tolist(), value.tolist()):
+        if leg_quantity > 0:
+            held += leg_quantity
+            cost_basis += 0.0 if leg_value != leg_value else leg_value
+            continue
+
+        take = min(-leg_quantity, held)
+        cost = cost_basis * take / held if held > 0 else 0.0
+        held -= take
+        cost_basis -= cost
+        relieved.append(cost)
+
+    return np.array(relieved), cost_basis
+
+
+MATCHERS = {
+    CostBasisMethod.FIFO: _match_fifo,
+    CostBasisMethod.LIFO: _match_lifo,
+    CostBasisMethod.AVERAGE: _match_average,
+}
+
+
+def compute_pnl(
+    transactions: TransactionArrays,
+    method: CostBasisMethod,
+    quote: str,
+    prices: Optional[dict[str, Union[float, Decimal]]] = None,
+) -> dict:
+    t = transactions
+    nan = np.full(len(t.dates), np.nan)
+
+    # legs of all transactions, laid out as [buy legs, sell legs, fee legs]
+    leg_asset = np.concatenate([t.buy_asset, t.sell_asset, t.fee_asset])
+    leg_quantity = np.concatenate(
+        [t.buy_amount, -t.sell_amount, -t.fee_amount]
+    )
+    leg_value = np.concatenate(
+        [
+            np.where(t.sell_asset == quote, t.sell_amount, nan),
+            np.where(t.buy_asset == quote, t.buy_amount, nan),
+            np.zeros(len(t.dates)),
+        ]
+    )
+    leg_order = np.concatenate(
+        [np.arange(len(t.dates)) * 3 + leg for leg in range(3)]
+    )
+
+    keep = (leg_asset != "") & (leg_asset != quote) & (leg_quantity != 0)
+    assets, codes = np.unique(leg_asset[keep], return_inverse=True)
+    order = np.lexsort((leg_order[keep], codes))
+    codes = codes[order]
+    quantity = leg_quantity[keep][order]
+    value = leg_value[keep][order]
+
+    boundaries = np.flatnonzero(np.diff(codes)) + 1
+    result_assets = []
+    for asset, asset_quantity, asset_value in zip(
+        assets,
+        np.split(quantity, boundaries),
+        np.split(value, boundaries),
+    ):
+        relieved, cost_basis = MATCHERS[method](asset_quantity, asset_value)
+
+        proceeds = asset_value[asset_quantity < 0]
+        known = ~np.isnan(proceeds)
+
+        result_assets.append(
+            {
+                "asset": str(asset),
+                "quantity": float(asset_quantity.sum()),
+                "cost_basis": float(cost_basis),
+                "realized_pnl": float(
+                    (proceeds[known] - relieved[known]).sum()
+                ),
+                "unrealized_pnl": None,
+            }
+        )
+
+    pnl = {
+        "method": method,
+        "quote": quote,
+        "fees": float(t.fee_amount[t.fee_asset == quote].sum()),
+        "realized_pnl": sum(a["realized_pnl"] for a in result_assets),
+        "unrealized_pnl": None,
+        "assets": result_assets,
+    }
+
+    return value_pnl(pnl, prices) if prices else pnl
+
+
+def value_pnl(pnl: dict, prices: dict[str, Union[float, Decimal]]) -> dict:
+    """Return a copy of `pnl` with unrealized PnL at the given prices.
+
+    The total is only reported when every asset has a price.
+    """
+    assets = [
+        {
+            **asset,
+            "unrealized_pnl": (
+                asset["quantity"] * float(prices[asset["asset"]])
+                - asset["cost_basis"]
+                if asset["asset"] in prices
+                else None
+            ),
+        }
+        for asset in pnl["assets"]
+    ]
+    unrealized = [asset["unrealized_pnl"] for asset in assets]
+
+    return {
+        **pnl,
+        "unrealized_pnl": None if None in unrealized else sum(unrealized),
+        "assets": assets,
+    }
+
+
+def get_portfolio_pnl(
+    session: Session,
+    portfolio_id: int,
+    method: CostBasisMethod,
+    quote: str,
+) -> dict:
+    # read before the transactions, so that a write committed in between
+    # leaves the entry behind the next version rather than ahead of it
+    version = session.exec(
+        select(Portfolio.ledger_version).where(Portfolio.id == portfolio_id)
+    ).one()
+    cached_version, cached = pnl_cache.get(portfolio_id) or (None, {})
+
+    if cached_version != version:
+        # written through another process since the entry was cached
+        cached = {}
+
+    if (method, quote) not in cached:
+        transactions = load_transactions(session, portfolio_id)
+        cached = {
+            **cached,
+            (method, quote): compute_pnl(transactions, method, quote),
+        }
+        pnl_cache.set(portfolio_id, (version, cached))
+
+    return cached[(method, quote)]
+
+
+def invalidate_pnl(portfolio_ids: list[int]):
+    for portfolio_id in portfolio_ids:
+        pnl_cache.pop(portfolio_id)
@@ -0,0 +1,414 @@
+"""Local store of exchange candlesticks for valuing portfolios in the past.
+
+Klines are downloaded once per (symbol, interval) and shared by every
+portfolio. Filling only requests the ranges that are missing from the
+table, and lookups resolve many timestamps at once with an as-of search
+over the stored open times. Newly stored daily klines drop the portfolio
+snapshots that were valued without them.
+"""
+import argparse
+from datetime import datetime, timedelta
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+from sqlalchemy import delete, func, or_, union_all
+from sqlmodel import Session, select
+
+from .bulk import DIALECT_INSERTS, chunked
+from .config import settings
+from .constants import KlineInterval
+from .exchanges.binance_api import (
+    BinanceAPI,
+    from_milliseconds,
+    to_milliseconds,
+)
+from .models import PortfolioSnapshot, PriceHistory, Transaction
+from .prices import BRIDGE_ASSETS
+
+KLINES_LIMIT = 1000
+
+INTERVAL_DURATIONS = {
+    KlineInterval.MINUTE: timedelta(minutes=1),
+    KlineInterval.HOUR: timedelta(hours=1),
+    KlineInterval.DAY: timedelta(days=1),
+    KlineInterval.WEEK: timedelta(weeks=1),
+}
+
+
+def stored_open_times(
+    session: Session,
+    symbol: str,
+    interval: KlineInterval,
+    start: datetime,
+    end: datetime,
+) -> np.ndarray:
+    open_times = session.exec(
+        select(PriceHistory.open_time)
+        .where(
+            PriceHistory.symbol == symbol,
+            PriceHistory.interval == interval,
+            PriceHistory.open_time >= start,
+            PriceHistory.open_time <= end,
+        )
+        .order_by(PriceHistory.open_time)
+    ).all()
+
+    return np.array(open_times, dtype="datetime64[ms]").astype(np.int64)
+
+
+def missing_ranges(
+    open_times: np.ndarray, start: int, end: int, step: int
+) -> list[tuple[int, int]]:
+    """Ranges of [start, end] (ms) not covered by the sorted `open_times`."""
+    if not len(open_times):
+        return [(start, end)]
+
+    ranges = []
+    if open_times[0] - start >= step:
+        ranges.append((start, int(open_times[0]) - 1))
+
+    gaps = np.flatnonzero(np.diff(open_times) > step)
+    ranges += [
+        (int(open_times[i]) + step, int(open_times[i + 1]) - 1) for i in gaps
+    ]
+
+    if open_times[-1] + step <= end:
+        ranges.append((int(open_times[-1]) + step, end))
+
+    return ranges
+
+
+def download_klines(
+    api: BinanceAPI,
+    symbol: str,
+    interval: KlineInterval,
+    start: int,
+    end: int,
+) -> Iterator[list]:
+    """Closed klines of [start, end] (ms), fetched in pages."""
+    now = to_milliseconds(datetime.utcnow())
+
+    while start <= end:
+        klines = api.klines(
+            symbol, interval.value, start, end, limit=KLINES_LIMIT
+        )
+        # the last kline may still be open, its prices are not final yet
+        yield from (kline for kline in klines if kline[6] < now)
+
+        if len(klines) < KLINES_LIMIT:
+            break
+        start = klines[-1][0] + 1
+
+
+def fill_price_history(
+    session: Session,
+    api: BinanceAPI,
+    symbol: str,
+    interval: KlineInterval,
+    start: datetime,
+    end: datetime = None,
+) -> int:
+    """Download klines missing between `start` and `end` and return how
+    many were stored. Nothing is committed.
+    """
+    end = end or datetime.utcnow()
+    step = int(INTERVAL_DURATIONS[interval].total_seconds() * 1000)
+    start_ms = to_milliseconds(start) // step * step
+    end_ms = to_milliseconds(end)
+
+    open_times = stored_open_times(
+        session, symbol, interval, from_milliseconds(start_ms), end
+    )
+    rows = (
+        {
+            "symbol": symbol,
+            "interval": interval,
+            "open_time": from_milliseconds(kline[0]),
+            "open": kline[1],
+            "high": kline[2],
+            "low": kline[3],
+            "close": kline[4],
+            "volume": kline[5],
+        }
+        for range_start, range_end in missing_ranges(
+            open_times, start_ms, end_ms, step
+        )
+        for kline in download_klines(
+            api, symbol, interval, range_start, range_end
+        )
+    )
+
+    dialect_insert = DIALECT_INSERTS[session.get_bind().dialect.name]
+    statement = dialect_insert(PriceHistory.__table__).on_conflict_do_nothing()
+
+    stored, earliest = 0, None
+    for batch in chunked(rows, settings.bulk_insert_batch_size):
+        session.execute(statement, batch)
+        stored += len(batch)
+        # ranges and their klines come in ascending order
+        earliest = earliest or batch[0]["open_time"]
+
+    if earliest and interval == KlineInterval.DAY:
+        invalidate_asset_snapshots(session, symbol, earliest)
+
+    return stored
+
+
+def priced_assets(symbol: str, quote: str) -> set[str]:
+    """Assets valued in `quote` through the market `symbol`, directly, the
+    other way round or through a bridge asset."""
+    assets = set()
+    for other in {quote, *BRIDGE_ASSETS}:
+        if symbol.endswith(other):
+            assets.add(symbol[: -len(other)])
+        if symbol.startswith(other):
+            assets.add(symbol[len(other):])
+    return assets - {quote, ""}
+
+
+def invalidate_asset_snapshots(session: Session, symbol: str, since: datetime):
+    """Drop snapshots from `since` on of the portfolios trading assets priced
+    through `symbol`, which may have been valued without its prices."""
+    assets = priced_assets(symbol, settings.snapshot_quote_asset)
+    if not assets:
+        return
+
+    portfolio_ids = select(Transaction.portfolio_id).where(
+        or_(
+            Transaction.buy_asset.in_(assets),
+            Transaction.sell_asset.in_(assets),
+            Transaction.fee_asset.in_(assets),
+        )
+    )
+    session.execute(
+        delete(PortfolioSnapshot)
+        .where(
+            PortfolioSnapshot.portfolio_id.in_(portfolio_ids),
+            PortfolioSnapshot.snapshot_date >= since.date(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def prices_at(
+    session: Session,
+    symbol: str,
+    interval: KlineInterval,
+    timestamps: Iterable[datetime],
+) -> np.ndarray:
+    """Price of `symbol` at each of `timestamps`, NaN where unknown.
+
+    The price at a moment is the open price of the kline containing it,
+    which is the latest price known at that moment.
+    """
+    timestamps = np.asarray(timestamps, dtype="datetime64[ms]")
+    prices = np.full(len(timestamps), np.nan)
+    if not len(timestamps):
+        return prices
+
+    step = INTERVAL_DURATIONS[interval]
+    rows = session.exec(
+        select(PriceHistory.open_time, PriceHistory.open)
+        .where(
+            PriceHistory.symbol == symbol,
+            PriceHistory.interval == interval,
+            PriceHistory.open_time > timestamps.min().item() - step,
+            PriceHistory.open_time <= timestamps.max().item(),
+        )
+        .order_by(PriceHistory.open_time)
+    ).all()
+    if not rows:
+        return prices
+
+    open_times, opens = zip(*rows)
+    open_times = np.array(open_times, dtype="datetime64[ms]")
+    opens = np.array(opens, dtype=float)
+
+    index = np.searchsorted(open_times, timestamps, side="right") - 1
+    found = index >= 0
+    found[found] = (
+        timestamps[found] - open_times[index[found]]
+    ) < np.timedelta64(step)
+    prices[found] = opens[index[found]]
+
+    return prices
+
+
+def closes_of(
+    session: Session,
+    symbol: str,
+    interval: KlineInterval,
+    open_times: Iterable[datetime],
+) -> np.ndarray:
+    """Close price of the klines of `symbol` opened at each of
+    `open_times`, NaN where not stored (e.g. while the kline is open).
+    """
+    open_times = np.asarray(open_times, dtype="datetime64[ms]")
+    closes = np.full(len(open_times), np.nan)
+    if not len(open_times):
+        return closes
+
+    rows = session.exec(
+        select(PriceHistory.open_time, PriceHistory.close)
+        .where(
+            PriceHistory.symbol == symbol,
+            PriceHistory.interval == interval,
+            PriceHistory.open_time >= open_times.min().item(),
+            PriceHistory.open_time <= open_times.max().item(),
+        )
+        .order_by(PriceHistory.open_time)
+    ).all()
+    if not rows:
+        return closes
+
+    stored_times, stored_closes = zip(*rows)
+    stored_times = np.array(stored_times, dtype="datetime64[ms]")
+    stored_closes = np.array(stored_closes, dtype=float)
+
+    index = np.searchsorted(stored_times, open_times)
+    index[index == len(stored_times)] = 0
+    found = stored_times[index] == open_times
+    closes[found] = stored_closes[index[found]]
+
+    return closes
+
+
+def _market_closes(
+    session: Session, asset: str, quote: str, open_times: np.ndarray
+) -> np.ndarray:
+    if asset == quote:
+        return np.ones(len(open_times))
+
+    closes = closes_of(
+        session, f"{asset}{quote}", KlineInterval.DAY, open_times
+    )
+    missing = np.isnan(closes)
+    if missing.any():
+        closes[missing] = 1 / closes_of(
+            session, f"{quote}{asset}", KlineInterval.DAY, open_times[missing]
+        )
+    return closes
+
+
+def asset_closes(
+    session: Session, asset: str, quote: str, days: Iterable[datetime]
+) -> np.ndarray:
+    """Daily close of `asset` in `quote` on each of `days`, NaN where
+    unknown. Like `PriceCache.price`, markets the other way round and
+    through a bridge asset stand in for a missing direct market.
+    """
+    days = np.asarray(days, dtype="datetime64[ms]")
+    closes = _market_closes(session, asset, quote, days)
+
+    for bridge in BRIDGE_ASSETS:
+        missing = np.isnan(closes)
+        if not missing.any():
+            break
+        if bridge in (asset, quote):
+            continue
+        closes[missing] = _market_closes(
+            session, asset, bridge, days[missing]
+        ) * _market_closes(session, bridge, quote, days[missing])
+
+    return closes
+
+
+def traded_assets(session: Session) -> dict[str, datetime]:
+    """Time of the first transaction of every traded asset."""
+    legs = union_all(
+        *[
+            select(
+                asset.label("asset"),
+                Transaction.transaction_date.label("transaction_date"),
+            ).where(asset.is_not(None), asset != "")
+            for asset in [
+                Transaction.buy_asset,
+                Transaction.sell_asset,
+                Transaction.fee_asset,
+            ]
+        ]
+    ).subquery()
+
+    return dict(
+        session.execute(
+            select(legs.c.asset, func.min(legs.c.transaction_date))
+            .group_by(legs.c.asset)
+        ).all()
+    )
+
+
+def price_symbols(asset: str, quote: str, symbols: set[str]) -> list[str]:
+    """Markets among `symbols` to value `asset` in `quote` with, tried in
+    the order of `asset_closes`."""
+
+    def market(base: str, other: str) -> Optional[str]:
+        for symbol in [f"{base}{other}", f"{other}{base}"]:
+            if symbol in symbols:
+                return symbol
+        return None
+
+    if asset == quote:
+        return []
+    if symbol := market(asset, quote):
+        return [symbol]
+
+    for bridge in BRIDGE_ASSETS:
+        if bridge in (asset, quote):
+            continue
+        asset_symbol = market(asset, bridge)
+        bridge_symbol = market(bridge, quote)
+        if asset_symbol and bridge_symbol:
+            return [asset_symbol, bridge_symbol]
+
+    return []
+
+
+def fill_traded_prices(
+    session: Session, api: BinanceAPI, quote: str = None
+) -> int:
+    """Download missing daily klines valuing every traded asset in `quote`
+    since its first transaction, and return how many were stored. Commits
+    after each asset.
+    """
+    quote = quote or settings.snapshot_quote_asset
+    symbols = {symbol["symbol"] for symbol in api.exchange_info()["symbols"]}
+
+    stored = 0
+    for asset, first in traded_assets(session).items():
+        for symbol in price_symbols(asset, quote, symbols):
+            stored += fill_price_history(
+                session, api, symbol, KlineInterval.DAY, first
+            )
+        session.commit()
+
+    return stored
+
+
+def main():
+    from .database import engine
+
+    parser = argparse.ArgumentParser(description="Download price history")
+    parser.add_argument("symbols", nargs="+")
+    parser.add_argument(
+        "--interval",
+        type=KlineInterval,
+        choices=list(KlineInterval),
+        default=KlineInterval.DAY,
+    )
+    parser.add_argument(
+        "--start", type=datetime.fromisoformat, required=True
+    )
+    args = parser.parse_args()
+
+    api = BinanceAPI()
+    with Session(engine) as session:
+        for symbol in args.symbols:
+            stored = fill_price_history(
+                session, api, symbol, args.interval, args.start
+            )
+            session.commit()
+            print(f"{symbol} {args.interval.value}: {stored} klines stored")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Process-wide cache of exchange prices.
+
+Prices of all symbols are refreshed together, with one /api/v3/ticker/price
+call at most every `ttl` seconds, and shared by every request. Only one
+thread refreshes at a time: while it does, other threads keep serving the
+previous prices, and they only wait when there are no prices yet.
+"""
+import threading
+import time
+from decimal import Decimal
+from typing import Iterable, Optional
+
+import httpx
+
+from .config import settings
+from .exchanges.binance_api import BinanceAPI
+
+# assets through which prices without a direct market are converted
+BRIDGE_ASSETS = ("USDT", "BTC")
+
+
+class PriceUnavailable(Exception):
+    pass
+
+
+class PriceCache:
+    def __init__(self, api: BinanceAPI, ttl: float):
+        self.api = api
+        self.ttl = ttl
+        self._tickers: Optional[dict[str, Decimal]] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _fetch(self) -> dict[str, Decimal]:
+        return {
+            ticker["symbol"]: Decimal(ticker["price"])
+            for ticker in self.api.ticker_price()
+        }
+
+    def tickers(self) -> dict[str, Decimal]:
+        """Return last prices of all symbols, refreshing them if stale."""
+        if self._expires_at > time.monotonic():
+            return self._tickers
+
+        if not self._lock.acquire(blocking=self._tickers is None):
+            # somebody else is refreshing, stale prices will do meanwhile
+            return self._tickers
+
+        try:
+            if self._expires_at <= time.monotonic():
+                try:
+                    self._tickers = self._fetch()
+                except httpx.HTTPError as exc:
+                    if self._tickers is None:
+                        raise PriceUnavailable(str(exc)) from exc
+                # failed refreshes wait a full ttl too, not to hammer the
+                # exchange while it is down
+                self._expires_at = time.monotonic() + self.ttl
+        finally:
+            self._lock.release()
+
+        return self._tickers
+
+    @staticmethod
+    def _market_price(
+        tickers: dict[str, Decimal], asset: str, quote: str
+    ) -> Optional[Decimal]:
+        if asset == quote:
+            return Decimal(1)
+        if price := tickers.get(f"{asset}{quote}"):
+            return price
+        if price := tickers.get(f"{quote}{asset}"):
+            return 1 / price
+        return None
+
+    def price(self, asset: str, quote: str) -> Optional[Decimal]:
+        """Price of one `asset` in `quote`, None if there is no market."""
+        tickers = self.tickers()
+        if price := self._market_price(tickers, asset, quote):
+            return price
+
+        for bridge in BRIDGE_ASSETS:
+            asset_price = self._market_price(tickers, asset, bridge)
+            bridge_price = self._market_price(tickers, bridge, quote)
+            if asset_price and bridge_price:
+                return asset_price * bridge_price
+
+        return None
+
+    def prices(
+        self, assets: Iterable[str], quote: str
+    ) -> dict[str, Decimal]:
+        """Prices of `assets` in `quote`, leaving out those without one."""
+        prices = {asset: self.price(asset, quote) for asset in assets}
+        return {
+            asset: price
+            for asset, price in prices.items()
+            if price is not None
+        }
+
+
+price_cache = PriceCache(BinanceAPI(), settings.price_cache_ttl)
@@ -1,8 +1,16 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import select, Session
 
-from ..security import create_access_token, verify_password, get_password_hash
+from ..security import (
+    create_access_token,
+    get_password_hash_async,
+    verify_password_async,
+)
 from ..dependencies import get_db_session
 from ..schemas.auth import Token, UserCreate, UserRead
 from ..models import User
@@ -10,18 +18,45 @@ from ..models import User
 router = APIRouter(tags=["auth"])
 
 
+def get_user_by_username(session: Session, username: str) -> Optional[User]:
+    result = session.exec(
+        select(User).where(User.username == username).limit(1)
+    )
+    return result.first()
+
+
+def save_user(session: Session, user: User) -> Optional[User]:
+    """Insert the user, or return None when the username got taken by a
+    concurrent sign-up since it was checked."""
+    session.add(user)
+    try:
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        return None
+    session.refresh(user)
+
+    return user
+
+
+def username_taken() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="The username is already taken.",
+    )
+
+
 @router.post("/sign-in", response_model=Token)
 async def sign_in(
     session: Session = Depends(get_db_session),
     form_data: OAuth2PasswordRequestForm = Depends(),
 ):
-    result = session.exec(
-        select(User).filter(User.username == form_data.username).limit(1)
+    user = await run_in_threadpool(
+        get_user_by_username, session, form_data.username
     )
 
-    user: User
-    if user := result.first():
-        if verify_password(form_data.password, user.password):
+    if user:
+        if await verify_password_async(form_data.password, user.password):
             access_token = create_access_token({"sub": user.username})
             return {"access_token": access_token, "token_type": "bearer"}
 
@@ -41,20 +76,14 @@ async def sign_up(
     data: UserCreate,
     session: Session = Depends(get_db_session),
 ):
-    result = session.exec(
-        select(User).where(User.username == data.username).limit(1)
-    )
-    if result.first():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"The username is already taken.",
-        )
+    if await run_in_threadpool(get_user_by_username, session, data.username):
+        raise username_taken()
 
     user = User.from_orm(data)
-    user.password = get_password_hash(data.password)
+    user.password = await get_password_hash_async(data.password)
 
-    session.add(user)
-    session.commit()
-    session.refresh(user)
+    saved = await run_in_threadpool(save_user, session, user)
+    if saved is None:
+        raise username_taken()
 
-    return user
+    return saved
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Depends
+
+from ..database import get_pool_stats
+from ..dependencies import get_authenticated_user
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get(
+    "/metrics/db-pool", dependencies=[Depends(get_authenticated_user)]
+)
+def get_db_pool_metrics():
+    return get_pool_stats()
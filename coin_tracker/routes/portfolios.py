@@ -1,10 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session
+from datetime import date
+from typing import Optional
 
-from ..dependencies import get_db_session, get_current_user
-from ..models import User, Portfolio
-from ..schemas.portfolios import PortfolioCreate, PortfolioRead
-from ..schemas.transactions import TransactionRead
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    Response,
+    UploadFile,
+    status,
+)
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, select
+
+from ..config import settings
+from ..constants import CostBasisMethod, ExportFormat, HistoryInterval
+from ..dependencies import get_db_session, get_current_user, get_price_cache
+from ..exports import MEDIA_TYPES, export_transactions
+from ..importer.csv_file import CSVImporter, CSVImportError
+from ..models import User, Portfolio, Transaction, Holding
+from ..pagination import TransactionPage
+from ..pnl import get_portfolio_pnl, value_pnl
+from ..prices import PriceCache, PriceUnavailable
+from ..snapshots import get_history, update_snapshots
+from ..schemas.portfolios import (
+    HoldingRead,
+    PnLRead,
+    PortfolioCreate,
+    PortfolioRead,
+    SnapshotRead,
+)
+from ..schemas.transactions import TransactionImportResult, TransactionRead
 
 router = APIRouter(tags=["portfolio"])
 
@@ -100,8 +127,87 @@ def delete_portfolio(
 )
 def list_portfolio_transactions(
     portfolio_id: int,
+    response: Response,
+    page: TransactionPage = Depends(),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_db_session),
+):
+    portfolio = session.get(Portfolio, portfolio_id)
+
+    if not portfolio:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+
+    if portfolio.user != current_user:
+        raise HTTPException(status.HTTP_403_FORBIDDEN)
+
+    return page.paginate(
+        session,
+        select(Transaction).where(Transaction.portfolio_id == portfolio_id),
+        response,
+    )
+
+
+@router.get("/portfolio/{portfolio_id}/transactions/export")
+def export_portfolio_transactions(
+    portfolio_id: int,
+    export_format: ExportFormat = Query(ExportFormat.CSV, alias="format"),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_db_session),
+):
+    portfolio = session.get(Portfolio, portfolio_id)
+
+    if not portfolio:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+
+    if portfolio.user != current_user:
+        raise HTTPException(status.HTTP_403_FORBIDDEN)
+
+    filename = f"portfolio_{portfolio_id}_transactions.{export_format.value}"
+
+    return StreamingResponse(
+        export_transactions(session, portfolio_id, export_format),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+@router.post(
+    "/portfolio/{portfolio_id}/import/csv",
+    response_model=TransactionImportResult,
+)
+def import_portfolio_transactions_csv(
+    portfolio_id: int,
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_db_session),
+):
+    portfolio = session.get(Portfolio, portfolio_id)
+
+    if not portfolio:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+
+    if portfolio.user != current_user:
+        raise HTTPException(status.HTTP_403_FORBIDDEN)
+
+    try:
+        return CSVImporter(session, portfolio_id).run(file.file)
+    except CSVImportError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc),
+        )
+
+
+@router.get(
+    "/portfolio/{portfolio_id}/holdings",
+    response_model=list[HoldingRead],
+)
+def list_portfolio_holdings(
+    portfolio_id: int,
+    quote: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_db_session),
+    price_cache: PriceCache = Depends(get_price_cache),
 ):
     portfolio = session.get(Portfolio, portfolio_id)
 
@@ -111,4 +217,86 @@ def list_portfolio_transactions(
     if portfolio.user != current_user:
         raise HTTPException(status.HTTP_403_FORBIDDEN)
 
-    return portfolio.transactions
+    holdings = session.exec(
+        select(Holding)
+        .where(Holding.portfolio_id == portfolio_id, Holding.quantity != 0)
+        .order_by(Holding.asset)
+    ).all()
+
+    if not quote:
+        return holdings
+
+    try:
+        prices = price_cache.prices([h.asset for h in holdings], quote)
+    except PriceUnavailable as exc:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(exc),
+        )
+
+    return [
+        HoldingRead(
+            asset=holding.asset,
+            quantity=holding.quantity,
+            value=(
+                holding.quantity * prices[holding.asset]
+                if holding.asset in prices
+                else None
+            ),
+        )
+        for holding in holdings
+    ]
+
+
+@router.get("/portfolio/{portfolio_id}/pnl", response_model=PnLRead)
+def get_portfolio_pnl_report(
+    portfolio_id: int,
+    method: CostBasisMethod = CostBasisMethod.FIFO,
+    quote: str = settings.pnl_quote_asset,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_db_session),
+    price_cache: PriceCache = Depends(get_price_cache),
+):
+    portfolio = session.get(Portfolio, portfolio_id)
+
+    if not portfolio:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+
+    if portfolio.user != current_user:
+        raise HTTPException(status.HTTP_403_FORBIDDEN)
+
+    pnl = get_portfolio_pnl(session, portfolio_id, method, quote)
+
+    try:
+        prices = price_cache.prices([a["asset"] for a in pnl["assets"]], quote)
+    except PriceUnavailable:
+        # unrealized PnL is left out rather than failing the whole report
+        return pnl
+
+    return value_pnl(pnl, prices)
+
+
+@router.get(
+    "/portfolio/{portfolio_id}/history",
+    response_model=list[SnapshotRead],
+)
+def get_portfolio_history(
+    portfolio_id: int,
+    interval: HistoryInterval = HistoryInterval.DAY,
+    date_from: date = None,
+    date_to: date = None,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_db_session),
+):
+    portfolio = session.get(Portfolio, portfolio_id)
+
+    if not portfolio:
+        raise HTTPException(status.HTTP_404_NOT_FOUND)
+
+    if portfolio.user != current_user:
+        raise HTTPException(status.HTTP_403_FORBIDDEN)
+
+    if update_snapshots(session, portfolio_id):
+        session.commit()
+
+    return get_history(session, portfolio_id, interval, date_from, date_to)
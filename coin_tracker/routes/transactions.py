@@ -1,18 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Query, status
-from sqlmodel import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlmodel import Session, select
 
+from ..bulk import insert_transactions
+from ..config import settings
 from ..dependencies import get_db_session, get_current_user
+from ..ledger import apply_transactions
 from ..models import User, Portfolio, Transaction
-from ..schemas.transactions import TransactionCreate, TransactionRead
+from ..pagination import TransactionPage
+from ..schemas.transactions import (
+    TransactionBulkRead,
+    TransactionCreate,
+    TransactionRead,
+)
 
 router = APIRouter(tags=["portfolio"])
 
 
 @router.get("/transactions", response_model=list[TransactionRead])
 def list_transactions(
+    response: Response,
+    page: TransactionPage = Depends(),
     current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_db_session),
 ):
-    return [t for p in current_user.portfolios for t in p.transactions]
+    statement = (
+        select(Transaction)
+        .join(Portfolio)
+        .where(Portfolio.user_id == current_user.id)
+    )
+
+    return page.paginate(session, statement, response)
 
 
 @router.post(
@@ -39,12 +56,56 @@ def create_transaction(
     transaction = Transaction.from_orm(data)
 
     session.add(transaction)
+    session.flush()
+    apply_transactions(session, [transaction.id])
     session.commit()
     session.refresh(transaction)
 
     return transaction
 
 
+@router.post(
+    "/transactions/bulk",
+    response_model=TransactionBulkRead,
+    status_code=status.HTTP_201_CREATED,
+)
+def create_transactions_bulk(
+    data: list[TransactionCreate],
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_db_session),
+):
+    if len(data) > settings.bulk_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.bulk_max_items} transactions allowed.",
+        )
+
+    portfolio_ids = {item.portfolio_id for item in data}
+    owners = dict(
+        session.exec(
+            select(Portfolio.id, Portfolio.user_id).where(
+                Portfolio.id.in_(portfolio_ids)
+            )
+        ).all()
+    )
+
+    for portfolio_id in sorted(portfolio_ids):
+        if portfolio_id not in owners:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Portfolio with id={portfolio_id} not found",
+            )
+
+        if owners[portfolio_id] != current_user.id:
+            raise HTTPException(status.HTTP_403_FORBIDDEN)
+
+    ids = insert_transactions(session, (item.dict() for item in data))
+    apply_transactions(session, ids)
+    session.commit()
+
+    return {"count": len(ids), "ids": ids}
+
+
 @router.get("/transactions/{transaction_id}", response_model=TransactionRead)
 def get_single_transaction(
     transaction_id: int,
@@ -76,6 +137,7 @@ def delete_transaction(
     if transaction.portfolio.user != current_user:
         raise HTTPException(status.HTTP_403_FORBIDDEN)
 
+    apply_transactions(session, [transaction.id], sign=-1)
     session.delete(transaction)
     session.commit()
 
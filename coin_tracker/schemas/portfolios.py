@@ -1,5 +1,11 @@
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+
 from sqlmodel import SQLModel
 
+from ..constants import CostBasisMethod
+
 
 class PortfolioCreate(SQLModel):
     name: str
@@ -9,3 +15,32 @@ class PortfolioRead(SQLModel):
     id: int
     user_id: int
     name: str
+
+
+class HoldingRead(SQLModel):
+    asset: str
+    quantity: Decimal
+    value: Optional[Decimal] = None
+
+
+class AssetPnLRead(SQLModel):
+    asset: str
+    quantity: float
+    cost_basis: float
+    realized_pnl: float
+    unrealized_pnl: Optional[float]
+
+
+class PnLRead(SQLModel):
+    method: CostBasisMethod
+    quote: str
+    fees: float
+    realized_pnl: float
+    unrealized_pnl: Optional[float]
+    assets: list[AssetPnLRead]
+
+
+class SnapshotRead(SQLModel):
+    snapshot_date: date
+    value: float
+    holdings: dict[str, float]
@@ -34,3 +34,20 @@ class TransactionRead(SQLModel):
     fee_amount: Decimal
 
     note: str = None
+
+
+class TransactionBulkRead(SQLModel):
+    count: int
+    ids: list[int]
+
+
+class TransactionImportError(SQLModel):
+    row: int
+    error: str
+
+
+class TransactionImportResult(SQLModel):
+    imported: int
+    duplicates: int
+    failed: int
+    errors: list[TransactionImportError]
@@ -1,12 +1,24 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
 from cryptography.fernet import Fernet
 from jose import jwt
 from passlib.context import CryptContext
 
 from coin_tracker.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"])
+pwd_context = CryptContext(
+    schemes=["bcrypt"], bcrypt__rounds=settings.bcrypt_rounds
+)
 fernet = Fernet(settings.fernet_key)
 
+# bcrypt releases the GIL, so a small thread pool keeps hashing off the
+# event loop while capping how many CPU-bound hashes run at once
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers,
+    thread_name_prefix="password-hash",
+)
+
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
@@ -16,6 +28,20 @@ def verify_password(password: str, hashed_password: str) -> bool:
     return pwd_context.verify(password, hashed_password)
 
 
+async def get_password_hash_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_executor, get_password_hash, password
+    )
+
+
+async def verify_password_async(password: str, hashed_password: str) -> bool:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_executor, verify_password, password, hashed_password
+    )
+
+
 def create_access_token(data: dict) -> str:
     return jwt.encode(data, settings.secret_key)
 
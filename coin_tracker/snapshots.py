@@ -0,0 +1,209 @@
+"""Daily snapshots of portfolio holdings and their value.
+
+Snapshots are appended incrementally: only the days after the latest
+snapshot are computed, starting from that snapshot's holdings. Writing or
+deleting a transaction drops the snapshots from its date on (see
+`invalidate_snapshots`), so the next update recomputes just those days.
+
+Holdings are valued in `settings.snapshot_quote_asset` at the close of each
+day's kline, taken from the local price history (see `asset_closes`).
+Assets without a stored close for a day do not count towards that day's
+value; storing their klines later drops the snapshots valued without them.
+"""
+import argparse
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import delete, func
+from sqlmodel import Session, select
+
+from .bulk import DIALECT_INSERTS, chunked
+from .config import settings
+from .constants import HistoryInterval
+from .models import PortfolioSnapshot, Transaction
+from .pnl import load_transactions
+from .price_history import asset_closes
+
+
+def invalidate_snapshots(session: Session, transaction_ids: list[int]):
+    """Drop snapshots made stale by the given transactions and return ids of
+    the affected portfolios."""
+    changes = session.exec(
+        select(
+            Transaction.portfolio_id,
+            func.min(Transaction.transaction_date),
+        )
+        .where(Transaction.id.in_(transaction_ids))
+        .group_by(Transaction.portfolio_id)
+    ).all()
+
+    for portfolio_id, earliest in changes:
+        session.execute(
+            delete(PortfolioSnapshot).where(
+                PortfolioSnapshot.portfolio_id == portfolio_id,
+                PortfolioSnapshot.snapshot_date >= earliest.date(),
+            )
+        )
+
+    return [portfolio_id for portfolio_id, _ in changes]
+
+
+def latest_snapshot(
+    session: Session, portfolio_id: int
+) -> Optional[PortfolioSnapshot]:
+    return session.exec(
+        select(PortfolioSnapshot)
+        .where(PortfolioSnapshot.portfolio_id == portfolio_id)
+        .order_by(PortfolioSnapshot.snapshot_date.desc())
+        .limit(1)
+    ).first()
+
+
+def update_snapshots(
+    session: Session, portfolio_id: int, until: date = None
+) -> int:
+    """Compute missing daily snapshots up to `until` (yesterday by default)
+    and return how many were added. Nothing is committed.
+    """
+    until = until or datetime.utcnow().date() - timedelta(days=1)
+
+    latest = latest_snapshot(session, portfolio_id)
+    if latest:
+        start = latest.snapshot_date + timedelta(days=1)
+        base = latest.holdings
+    else:
+        first = session.exec(
+            select(func.min(Transaction.transaction_date)).where(
+                Transaction.portfolio_id == portfolio_id
+            )
+        ).one()
+        if first is None:
+            return 0
+        start = first.date()
+        base = {}
+
+    if start > until:
+        return 0
+
+    days = np.arange(start, until + timedelta(days=1), dtype="datetime64[D]")
+    t = load_transactions(
+        session,
+        portfolio_id,
+        datetime.combine(start, time()),
+        datetime.combine(until + timedelta(days=1), time()),
+    )
+
+    leg_day = np.tile(t.dates.astype("datetime64[D]"), 3)
+    leg_asset = np.concatenate([t.buy_asset, t.sell_asset, t.fee_asset])
+    leg_quantity = np.concatenate(
+        [t.buy_amount, -t.sell_amount, -t.fee_amount]
+    )
+    keep = leg_asset != ""
+
+    assets, codes = np.unique(
+        np.concatenate([np.array(list(base), dtype=str), leg_asset[keep]]),
+        return_inverse=True,
+    )
+    base_codes, leg_codes = np.split(codes, [len(base)])
+
+    # holdings at the end of each day: start from the latest snapshot and
+    # accumulate the per day changes
+    quantities = np.zeros((len(days), len(assets)))
+    quantities[0, base_codes] = list(base.values())
+    np.add.at(
+        quantities,
+        ((leg_day[keep] - days[0]).astype(int), leg_codes),
+        leg_quantity[keep],
+    )
+    quantities = np.cumsum(quantities, axis=0)
+
+    quote = settings.snapshot_quote_asset
+    prices = np.ones((len(days), len(assets)))
+    for column, asset in enumerate(assets):
+        prices[:, column] = asset_closes(session, str(asset), quote, days)
+    values = np.nansum(quantities * prices, axis=1)
+
+    rows = (
+        {
+            "portfolio_id": portfolio_id,
+            "snapshot_date": day.item(),
+            "value": float(value),
+            "holdings": {
+                str(asset): float(quantity)
+                for asset, quantity in zip(assets, day_quantities)
+                if abs(quantity) > 1e-12
+            },
+        }
+        for day, value, day_quantities in zip(days, values, quantities)
+    )
+    # concurrent updates of the same portfolio compute identical rows
+    dialect_insert = DIALECT_INSERTS[session.get_bind().dialect.name]
+    statement = dialect_insert(
+        PortfolioSnapshot.__table__
+    ).on_conflict_do_nothing()
+    for batch in chunked(rows, settings.bulk_insert_batch_size):
+        session.execute(statement, batch)
+
+    return len(days)
+
+
+def period_of(day: date, interval: HistoryInterval) -> tuple:
+    if interval == HistoryInterval.WEEK:
+        return day.isocalendar()[:2]
+    if interval == HistoryInterval.MONTH:
+        return day.year, day.month
+    return (day,)
+
+
+def get_history(
+    session: Session,
+    portfolio_id: int,
+    interval: HistoryInterval = HistoryInterval.DAY,
+    date_from: date = None,
+    date_to: date = None,
+) -> list[PortfolioSnapshot]:
+    """Daily snapshots between the dates, or the last snapshot of each week
+    or month for the coarser intervals."""
+    statement = (
+        select(PortfolioSnapshot)
+        .where(PortfolioSnapshot.portfolio_id == portfolio_id)
+        .order_by(PortfolioSnapshot.snapshot_date)
+    )
+    if date_from:
+        statement = statement.where(
+            PortfolioSnapshot.snapshot_date >= date_from
+        )
+    if date_to:
+        statement = statement.where(PortfolioSnapshot.snapshot_date < date_to)
+
+    periods = {}
+    for snapshot in session.exec(statement):
+        periods[period_of(snapshot.snapshot_date, interval)] = snapshot
+
+    return list(periods.values())
+
+
+def main():
+    from .database import engine
+
+    parser = argparse.ArgumentParser(description="Update portfolio snapshots")
+    parser.add_argument("--portfolio-id", type=int)
+    args = parser.parse_args()
+
+    with Session(engine) as session:
+        if args.portfolio_id is None:
+            portfolio_ids = session.exec(
+                select(Transaction.portfolio_id).distinct()
+            ).all()
+        else:
+            portfolio_ids = [args.portfolio_id]
+
+        for portfolio_id in portfolio_ids:
+            added = update_snapshots(session, portfolio_id)
+            session.commit()
+            print(f"portfolio {portfolio_id}: {added} snapshots added")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""lookup indexes
+
+Revision ID: 75adf436b15c
+Revises: ef9297c5afd2
+Create Date: 2026-10-18 10:12:43.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '75adf436b15c'
+down_revision = 'ef9297c5afd2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # usernames belong to separate accounts and cannot be merged here, so
+    # refuse to start rather than fail half way through the concurrent
+    # index builds below
+    duplicates = op.get_bind().execute(
+        sa.text(
+            'SELECT username FROM "user" '
+            'GROUP BY username HAVING count(*) > 1'
+        )
+    ).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            'duplicate usernames must be renamed before creating '
+            'ix_user_username: ' + ', '.join(sorted(duplicates))
+        )
+
+    # duplicates may exist from concurrent imports before the unique
+    # constraint, keep the oldest row of each (portfolio_id, external_id)
+    op.execute(
+        """
+        DELETE FROM transaction a
+        USING transaction b
+        WHERE a.portfolio_id = b.portfolio_id
+          AND a.external_id = b.external_id
+          AND a.id > b.id
+        """
+    )
+
+    # build the transaction indexes without blocking writes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_transaction_portfolio_id_transaction_date_id',
+            'transaction',
+            ['portfolio_id', 'transaction_date', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'uq_transaction_portfolio_id_external_id',
+            'transaction',
+            ['portfolio_id', 'external_id'],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+
+    op.execute(
+        'ALTER TABLE transaction '
+        'ADD CONSTRAINT uq_transaction_portfolio_id_external_id '
+        'UNIQUE USING INDEX uq_transaction_portfolio_id_external_id'
+    )
+    op.create_index(op.f('ix_portfolio_user_id'), 'portfolio', ['user_id'], unique=False)
+    op.create_index(op.f('ix_user_username'), 'user', ['username'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_user_username'), table_name='user')
+    op.drop_index(op.f('ix_portfolio_user_id'), table_name='portfolio')
+    op.drop_constraint('uq_transaction_portfolio_id_external_id', 'transaction', type_='unique')
+    op.drop_index('ix_transaction_portfolio_id_transaction_date_id', table_name='transaction')
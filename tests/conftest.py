@@ -1,17 +1,32 @@
 from datetime import datetime
+import os
 import random
 
 import faker
+import httpx
 import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import create_engine, Session
 
+# the lowest bcrypt cost keeps password hashing out of the test runtime
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
 from coin_tracker.security import get_password_hash, create_access_token
 from coin_tracker.config import settings
 from coin_tracker.constants import TransactionType
 from coin_tracker.main import app
-from coin_tracker.dependencies import get_db_session
+from coin_tracker.dependencies import (
+    get_db_session,
+    get_price_cache,
+    user_cache,
+)
+from coin_tracker.exchanges import binance_api
+from coin_tracker.exchanges.binance_api import BinanceAPI
+from coin_tracker.exchanges.http_cache import http_cache
+from coin_tracker.exchanges.rate_limit import RateLimiter
+from coin_tracker.ledger import rebuild_holdings
 from coin_tracker.models import SQLModel, User, Portfolio, Transaction
+from coin_tracker.prices import PriceCache
 
 test_engine = create_engine(
     settings.database_url, connect_args={"check_same_thread": False}
@@ -35,13 +50,61 @@ def get_db_session_override():
         yield session
 
 
+class FakeTickerAPI:
+    def __init__(self, tickers: dict = None):
+        self.tickers = tickers or {
+            "BTCUSDT": "50000",
+            "ETHBTC": "0.07",
+            "EURUSDT": "1.25",
+        }
+        self.calls = 0
+
+    def ticker_price(self):
+        self.calls += 1
+        return [
+            {"symbol": symbol, "price": price}
+            for symbol, price in self.tickers.items()
+        ]
+
+
+test_price_cache = PriceCache(FakeTickerAPI(), ttl=60)
+
+
+def make_api(transport) -> BinanceAPI:
+    """BinanceAPI answering every request with `transport(request)`."""
+    api = BinanceAPI("api_key", "secret_key")
+    api.session = httpx.Client(
+        base_url="https://api.binance.com",
+        transport=httpx.MockTransport(transport),
+    )
+    return api
+
 app.dependency_overrides[get_db_session] = get_db_session_override
+app.dependency_overrides[get_price_cache] = lambda: test_price_cache
+
+
+@pytest.fixture(autouse=True)
+def limiters(monkeypatch) -> dict:
+    # generous enough that paging through fake histories never waits
+    limiters = {
+        "api": RateLimiter(10 ** 6, 60),
+        "sapi": RateLimiter(10 ** 6, 60),
+    }
+    monkeypatch.setattr(binance_api, "rate_limiters", limiters)
+    return limiters
+
+
+@pytest.fixture(autouse=True)
+def empty_http_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_cache, "directory", str(tmp_path / "http"))
+    http_cache.clear()
 
 
 @pytest.fixture
 def db_session() -> Session:
     SQLModel.metadata.drop_all(test_engine)
     SQLModel.metadata.create_all(test_engine)
+    user_cache.clear()
     yield from get_db_session_override()
 
 
@@ -78,6 +141,8 @@ def db_users(db_session) -> list[User]:
         users.append(user)
         db_session.add(user)
 
+    db_session.flush()
+    rebuild_holdings(db_session)
     db_session.commit()
 
     for user in users:
@@ -3,6 +3,10 @@ import random
 from faker import Faker
 from fastapi import status
 
+from coin_tracker.config import settings
+from coin_tracker.routes import auth
+from coin_tracker.security import get_password_hash
+
 fake = Faker()
 
 
@@ -28,6 +32,22 @@ def test_sign_up_duplicate_username(test_client, db_users):
     assert response.json()["detail"] == "The username is already taken."
 
 
+def test_sign_up_concurrent_duplicate_username(
+    test_client, db_users, monkeypatch
+):
+    # another sign-up inserts the username between the check and the insert
+    monkeypatch.setattr(auth, "get_user_by_username", lambda *args: None)
+    user = random.choice(db_users)
+    data = {
+        "username": user.username,
+        "password": user.username,
+    }
+
+    response = test_client.post("/sign-up", json=data)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == "The username is already taken."
+
+
 def test_sign_in(test_client, db_users):
     user = random.choice(db_users)
     data = {
@@ -58,3 +78,8 @@ def test_sign_in_invalid_password(test_client, db_users):
     response = test_client.post("/sign-in", data=data)
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
     assert response.json()["detail"] == "Incorrect username or password"
+
+
+def test_password_hash_uses_configured_rounds():
+    hashed_password = get_password_hash(fake.password())
+    assert hashed_password.startswith(f"$2b${settings.bcrypt_rounds:02d}$")
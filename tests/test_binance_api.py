@@ -0,0 +1,230 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+
+from coin_tracker.exchanges.binance_api import (
+    DRIBBLETS_START,
+    AsyncBinanceAPI,
+    time_windows,
+    to_milliseconds,
+)
+
+from .conftest import make_api
+
+DAY = 24 * 3600 * 1000
+
+
+class FakeServer:
+    """Serves history endpoints from in-memory records, recording the
+    params of every request."""
+
+    def __init__(
+        self,
+        trades=(),
+        deposits=(),
+        dividends=(),
+        converts=(),
+        fiat_orders=(),
+    ):
+        self.trades = list(trades)
+        self.deposits = list(deposits)
+        self.dividends = list(dividends)
+        self.converts = list(converts)
+        self.fiat_orders = list(fiat_orders)
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        params = {
+            key: int(value)
+            for key, value in request.url.params.items()
+            if key not in ["symbol", "signature"]
+        }
+        self.requests.append((request.url.path, params))
+        limit = params.get("limit")
+
+        if request.url.path == "/api/v3/myTrades":
+            trades = [t for t in self.trades if t["id"] >= params["fromId"]]
+            return httpx.Response(200, json=trades[:limit])
+
+        if request.url.path == "/sapi/v1/capital/deposit/hisrec":
+            deposits = [
+                d
+                for d in self.deposits
+                if params["startTime"] <= d["insertTime"] <= params["endTime"]
+            ]
+            offset = params.get("offset", 0)
+            return httpx.Response(200, json=deposits[offset:offset + limit])
+
+        if request.url.path == "/sapi/v1/asset/assetDividend":
+            # latest first, like the exchange
+            dividends = sorted(
+                (
+                    d
+                    for d in self.dividends
+                    if params["startTime"] <= d["divTime"] <= params["endTime"]
+                ),
+                key=lambda d: -d["divTime"],
+            )
+            return httpx.Response(200, json={"rows": dividends[:limit]})
+
+        if request.url.path == "/sapi/v1/convert/tradeFlow":
+            converts = [
+                c
+                for c in self.converts
+                if params["startTime"] <= c["createTime"] <= params["endTime"]
+            ]
+            return httpx.Response(200, json={"list": converts[:limit]})
+
+        if request.url.path == "/sapi/v1/asset/dribblet":
+            return httpx.Response(
+                200, json={"total": 0, "userAssetDribblets": []}
+            )
+
+        if request.url.path == "/sapi/v1/fiat/orders":
+            orders = [
+                o
+                for o in self.fiat_orders
+                if params["beginTime"] <= o["createTime"] <= params["endTime"]
+            ]
+            first = (params["page"] - 1) * params["rows"]
+            return httpx.Response(
+                200, json={"data": orders[first:first + params["rows"]]}
+            )
+
+        return httpx.Response(404)
+
+
+def test_time_windows():
+    windows = time_windows(0, 25 * DAY, timedelta(days=10))
+
+    assert windows == [
+        {"startTime": 0, "endTime": 10 * DAY},
+        {"startTime": 10 * DAY + 1, "endTime": 20 * DAY + 1},
+        {"startTime": 20 * DAY + 2, "endTime": 25 * DAY},
+    ]
+
+
+def test_my_trades_pages_by_from_id():
+    server = FakeServer(trades=[{"id": i} for i in range(2500)])
+
+    trades = list(make_api(server).my_trades("BTCUSDT"))
+
+    assert [trade["id"] for trade in trades] == list(range(2500))
+    assert [params["fromId"] for _, params in server.requests] == [
+        0,
+        1000,
+        2000,
+    ]
+
+
+def test_pages_are_fetched_lazily():
+    server = FakeServer(trades=[{"id": i} for i in range(2500)])
+
+    trades = make_api(server).my_trades("BTCUSDT", from_id=10)
+    assert server.requests == []
+
+    assert next(trades) == {"id": 10}
+    assert len(server.requests) == 1
+
+
+def test_deposit_history_walks_windows_and_offsets():
+    start = to_milliseconds(datetime(2022, 1, 1))
+    deposits = [{"insertTime": start + i * 60_000} for i in range(1500)]
+    deposits += [{"insertTime": start + 150 * DAY}]
+    server = FakeServer(deposits=deposits)
+
+    items = list(
+        make_api(server).deposit_history(start, start + 200 * DAY)
+    )
+
+    assert items == deposits
+    assert [
+        (params["startTime"] - start, params.get("offset", 0))
+        for _, params in server.requests
+    ] == [(0, 0), (0, 1000), (90 * DAY + 1, 0), (180 * DAY + 2, 0)]
+
+
+def test_asset_dribblets_walk_windows_from_first_record():
+    server = FakeServer()
+    start = to_milliseconds(DRIBBLETS_START)
+
+    list(
+        make_api(server).asset_dribblets(
+            to_milliseconds(datetime(2019, 1, 1)), start + 30 * DAY
+        )
+    )
+
+    assert [params["startTime"] for _, params in server.requests] == [
+        start,
+        start + 25 * DAY + 1,
+    ]
+
+
+def test_fiat_orders_walk_windows_and_pages():
+    start = to_milliseconds(datetime(2022, 1, 1))
+    orders = [{"createTime": start + i * 60_000} for i in range(600)]
+    orders += [{"createTime": start + 100 * DAY}]
+    server = FakeServer(fiat_orders=orders)
+
+    items = list(make_api(server).fiat_orders(0, start, start + 120 * DAY))
+
+    assert items == orders
+    assert [
+        (params["beginTime"] - start, params["page"])
+        for _, params in server.requests
+    ] == [(0, 1), (0, 2), (90 * DAY + 1, 1)]
+
+
+def test_asset_dividends_page_backwards():
+    start = to_milliseconds(datetime(2022, 1, 1))
+    dividends = [{"divTime": start + i * 1000} for i in range(1200)]
+    server = FakeServer(dividends=dividends)
+
+    items = list(make_api(server).asset_dividends(start, start + DAY))
+
+    assert sorted(item["divTime"] for item in items) == [
+        dividend["divTime"] for dividend in dividends
+    ]
+    assert [params["endTime"] for _, params in server.requests] == [
+        start + DAY,
+        start + 700 * 1000 - 1,
+        start + 200 * 1000 - 1,
+    ]
+
+
+def test_async_paginate():
+    server = FakeServer(trades=[{"id": i} for i in range(1500)])
+
+    async def my_trades():
+        api = AsyncBinanceAPI("api_key", "secret_key")
+        api.session = httpx.AsyncClient(
+            base_url="https://api.binance.com",
+            transport=httpx.MockTransport(server),
+        )
+        try:
+            return [trade async for trade in api.my_trades("BTCUSDT")]
+        finally:
+            await api.session.aclose()
+
+    assert len(asyncio.run(my_trades())) == 1500
+    assert len(server.requests) == 2
+
+
+def test_convert_trade_flow_splits_full_windows():
+    start = datetime(2022, 1, 1)
+    start_ms = to_milliseconds(start)
+    converts = [{"createTime": start_ms + i * 1000} for i in range(2500)]
+    converts += [{"createTime": start_ms + 100 * DAY}]
+    server = FakeServer(converts=converts)
+
+    items = list(
+        make_api(server).convert_trade_flow(
+            start, start + timedelta(days=3 * 365)
+        )
+    )
+
+    assert items == converts
+    # 37 windows of 30 days, plus the halving of the busy first window,
+    # instead of a request for each of the 1095 days
+    assert 37 < len(server.requests) < 100
@@ -0,0 +1,49 @@
+import time
+
+from coin_tracker.cache import TTLCache
+from coin_tracker.dependencies import user_cache
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=10, ttl=0.01)
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+
+    time.sleep(0.02)
+    assert cache.get("key") is None
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_current_user_is_cached(user_client):
+    response = user_client.get("/portfolio")
+    assert response.status_code == 200
+    assert user_cache.get(user_client.user.username) == {
+        "id": user_client.user.id,
+        "username": user_client.user.username,
+    }
+
+    response = user_client.get("/portfolio")
+    assert len(response.json()) == len(user_client.user.portfolios)
+
+
+def test_cached_user_invalidated_on_update(user_client, db_session):
+    user_client.get("/portfolio")
+    user = user_client.user
+    old_username = user.username
+
+    user.username = f"{old_username}_renamed"
+    db_session.add(user)
+    db_session.commit()
+
+    assert user_cache.get(old_username) is None
@@ -0,0 +1,96 @@
+import time
+
+import httpx
+
+from coin_tracker.exchanges.http_cache import HTTPCache, http_cache
+from coin_tracker.importer.binance import (
+    EXCHANGE_SYMBOLS_KEY,
+    cache_exchange_symbols,
+)
+
+from .conftest import make_api
+
+EXCHANGE_INFO = {
+    "symbols": [
+        {
+            "symbol": "BTCUSDT",
+            "baseAsset": "BTC",
+            "quoteAsset": "USDT",
+            "filters": [{"filterType": "PRICE_FILTER"}],
+        }
+    ]
+}
+
+
+class FakeServer:
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        if request.url.path == "/api/v3/account":
+            return httpx.Response(200, json={"balances": []})
+        return httpx.Response(
+            200, json=EXCHANGE_INFO, headers={"ETag": '"v1"'}
+        )
+
+
+def test_unsigned_responses_are_cached():
+    server = FakeServer()
+
+    assert make_api(server).exchange_info() == EXCHANGE_INFO
+    assert make_api(server).exchange_info() == EXCHANGE_INFO
+
+    assert len(server.requests) == 1
+
+
+def test_signed_responses_are_not_cached():
+    server = FakeServer()
+    api = make_api(server)
+
+    api.account()
+    api.account()
+
+    assert len(server.requests) == 2
+
+
+def test_disk_tier_is_shared():
+    server = FakeServer()
+    make_api(server).exchange_info()
+
+    # another process starts with an empty memory tier
+    other = HTTPCache(http_cache.directory, memory_size=8)
+    key = make_api(server).cache_key(
+        "GET", "/api/v3/exchangeInfo", {}, False
+    )
+
+    assert other.get(key).data == EXCHANGE_INFO
+    assert other.get(key).etag == '"v1"'
+
+
+def test_stale_entries_are_revalidated(monkeypatch):
+    server = FakeServer()
+    api = make_api(server)
+    api.exchange_info()
+    key = api.cache_key("GET", "/api/v3/exchangeInfo", {}, False)
+    # stale in memory, and not to be refreshed from disk
+    http_cache.get(key).expires_at = time.time() - 1
+    monkeypatch.setattr(http_cache, "directory", None)
+
+    assert api.exchange_info() == EXCHANGE_INFO
+
+    assert server.requests[-1].headers["If-None-Match"] == '"v1"'
+    assert http_cache.get(key).fresh
+    api.exchange_info()
+    assert len(server.requests) == 2
+
+
+def test_exchange_symbols_are_cached_trimmed():
+    symbols = cache_exchange_symbols(EXCHANGE_INFO)
+
+    assert symbols == [
+        {"symbol": "BTCUSDT", "baseAsset": "BTC", "quoteAsset": "USDT"}
+    ]
+    assert http_cache.get_fresh(EXCHANGE_SYMBOLS_KEY) == symbols
@@ -0,0 +1,331 @@
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlmodel import select
+
+from coin_tracker.config import settings
+from coin_tracker.importer.binance import BinanceImporter, TransactionMapper
+from coin_tracker.constants import ExchangeType
+from coin_tracker.exchanges.binance_api import to_milliseconds
+from coin_tracker.models import (
+    Exchange,
+    ExchangeSymbol,
+    Holding,
+    ImportCheckpoint,
+    Transaction,
+)
+
+START_DATE = datetime(2022, 1, 1)
+
+
+class FakeBinanceAPI:
+    def __init__(self):
+        self.session = self
+        self.calls = []
+
+    def close(self):
+        pass
+
+    def account(self):
+        return {
+            "balances": [
+                {"asset": "USDT", "free": "60", "locked": "0"},
+                {"asset": "DOGE", "free": "0", "locked": "0"},
+            ]
+        }
+
+    def exchange_info(self):
+        return {
+            "symbols": [
+                {
+                    "symbol": "BTCUSDT",
+                    "baseAsset": "BTC",
+                    "quoteAsset": "USDT",
+                },
+                {
+                    "symbol": "ETHBTC",
+                    "baseAsset": "ETH",
+                    "quoteAsset": "BTC",
+                },
+                {
+                    "symbol": "DOGEBNB",
+                    "baseAsset": "DOGE",
+                    "quoteAsset": "BNB",
+                },
+            ]
+        }
+
+    def deposit_history(self, start_time: int = None):
+        self.calls.append(("deposit_history", start_time))
+        return [
+            {
+                "id": "d1",
+                "coin": "USDT",
+                "amount": "1000",
+                "insertTime": 1641000000000,
+            }
+        ]
+
+    def withdraw_history(self, start_time: int = None):
+        self.calls.append(("withdraw_history", start_time))
+        return [
+            {
+                "id": "w1",
+                "coin": "BTC",
+                "amount": "0.01",
+                "transactionFee": "0.0005",
+                "applyTime": "2022-01-03 10:00:00",
+            }
+        ]
+
+    def asset_dividends(self, start_time: int = None):
+        self.calls.append(("asset_dividends", start_time))
+        return []
+
+    def asset_dribblets(self, start_time: int = None):
+        self.calls.append(("asset_dribblets", start_time))
+        return []
+
+    def fiat_orders(self, transaction_type: int, begin_time: int = None):
+        self.calls.append((f"fiat_orders__{transaction_type}", begin_time))
+        return []
+
+    def fiat_payments(self, transaction_type: int, begin_time: int = None):
+        self.calls.append((f"fiat_payments__{transaction_type}", begin_time))
+        return []
+
+    def convert_trade_flow(self, start_dt: datetime, end_dt: datetime):
+        self.calls.append(("convert_trade_flow", start_dt))
+        return []
+
+    def my_trades(self, symbol: str, from_id: int = None):
+        self.calls.append(("my_trades", symbol, from_id))
+        if symbol != "BTCUSDT":
+            return []
+
+        if from_id and from_id > 1:
+            return []
+
+        return [
+            {
+                "id": 1,
+                "time": 1641100000000,
+                "isBuyer": True,
+                "qty": "0.02",
+                "quoteQty": "940",
+                "commission": "0.00002",
+                "commissionAsset": "BTC",
+            }
+        ]
+
+
+def run_importer(
+    session, portfolio_id: int, api=None, exchange_id: int = None
+) -> BinanceImporter:
+    importer = BinanceImporter(
+        session=session,
+        portfolio_id=portfolio_id,
+        api_key="api_key",
+        secret_key="secret_key",
+        start_date=START_DATE,
+        end_date=START_DATE + timedelta(days=2),
+        exchange_id=exchange_id,
+    )
+    importer.api = api or FakeBinanceAPI()
+    importer.run()
+    return importer
+
+
+def get_external_ids(session, portfolio_id: int) -> list[str]:
+    return session.exec(
+        select(Transaction.external_id).where(
+            Transaction.portfolio_id == portfolio_id,
+            Transaction.external_id.is_not(None),
+        )
+    ).all()
+
+
+def get_holdings(session, portfolio_id: int) -> dict:
+    return dict(
+        session.exec(
+            select(Holding.asset, Holding.quantity).where(
+                Holding.portfolio_id == portfolio_id
+            )
+        ).all()
+    )
+
+
+def test_binance_import(db_session, db_portfolios):
+    portfolio_id = random.choice(db_portfolios).id
+
+    run_importer(db_session, portfolio_id)
+
+    assert sorted(get_external_ids(db_session, portfolio_id)) == [
+        "deposit_history__d1",
+        "my_trades__1",
+        "withdraw_history__w1",
+    ]
+    assert get_holdings(db_session, portfolio_id)["USDT"] == 60
+
+
+def test_binance_import_is_idempotent(db_session, db_portfolios):
+    portfolio_id = random.choice(db_portfolios).id
+
+    run_importer(db_session, portfolio_id)
+    holdings = get_holdings(db_session, portfolio_id)
+    run_importer(db_session, portfolio_id)
+
+    assert len(get_external_ids(db_session, portfolio_id)) == 3
+    assert get_holdings(db_session, portfolio_id) == holdings
+
+
+def add_exchange(session, portfolio_id: int) -> int:
+    exchange = Exchange(
+        portfolio_id=portfolio_id,
+        exchange_type=ExchangeType.BINANCE,
+        api_key="api_key",
+        secret_key="secret_key",
+    )
+    session.add(exchange)
+    session.commit()
+    return exchange.id
+
+
+def test_binance_import_checkpoints(db_session, db_portfolios):
+    portfolio_id = random.choice(db_portfolios).id
+    exchange_id = add_exchange(db_session, portfolio_id)
+
+    run_importer(db_session, portfolio_id, exchange_id=exchange_id)
+    checkpoints = {
+        c.endpoint: (c.last_time, c.last_id)
+        for c in db_session.exec(select(ImportCheckpoint))
+    }
+    withdraw_time = to_milliseconds(datetime(2022, 1, 3, 10))
+    assert checkpoints["withdraw_history"] == (withdraw_time, None)
+    assert checkpoints["my_trades__BTCUSDT"] == (None, 1)
+    assert sorted(db_session.exec(select(ExchangeSymbol.symbol))) == [
+        "BTCUSDT",
+        "ETHBTC",
+    ]
+
+    api = FakeBinanceAPI()
+    run_importer(db_session, portfolio_id, api, exchange_id=exchange_id)
+
+    assert ("withdraw_history", withdraw_time) in api.calls
+    assert ("my_trades", "BTCUSDT", 2) in api.calls
+    # the checkpoint covers all of the trade flow range already
+    assert "convert_trade_flow" not in [call[0] for call in api.calls]
+    assert len(get_external_ids(db_session, portfolio_id)) == 3
+
+
+def test_binance_import_commits_batches(
+    db_session, db_portfolios, monkeypatch
+):
+    monkeypatch.setattr(settings, "bulk_insert_batch_size", 1)
+    portfolio_id = random.choice(db_portfolios).id
+    exchange_id = add_exchange(db_session, portfolio_id)
+    api = FakeBinanceAPI()
+
+    def my_trades(symbol: str, from_id: int = None):
+        raise RuntimeError("down")
+
+    api.my_trades = my_trades
+
+    with pytest.raises(RuntimeError):
+        run_importer(db_session, portfolio_id, api, exchange_id=exchange_id)
+
+    # batches written before the failure are kept with their checkpoints
+    assert sorted(get_external_ids(db_session, portfolio_id)) == [
+        "deposit_history__d1",
+        "withdraw_history__w1",
+    ]
+    assert db_session.get(
+        ImportCheckpoint, (exchange_id, "withdraw_history")
+    ).last_time == to_milliseconds(datetime(2022, 1, 3, 10))
+
+
+def test_binance_import_starts_at_start_date(db_session, db_portfolios):
+    portfolio_id = random.choice(db_portfolios).id
+    api = FakeBinanceAPI()
+
+    # START_DATE lies further back than a single history window, the whole
+    # history since then must be requested rather than the latest window
+    run_importer(db_session, portfolio_id, api)
+
+    start_time = to_milliseconds(START_DATE)
+    for endpoint in [
+        "deposit_history",
+        "withdraw_history",
+        "asset_dividends",
+        "asset_dribblets",
+        "fiat_orders__0",
+        "fiat_orders__1",
+        "fiat_payments__0",
+        "fiat_payments__1",
+    ]:
+        assert (endpoint, start_time) in api.calls
+
+
+def test_binance_import_discovers_symbols(db_session, db_portfolios):
+    portfolio_id = random.choice(db_portfolios).id
+    api = FakeBinanceAPI()
+
+    run_importer(db_session, portfolio_id, api)
+
+    # DOGE is in the account with a zero balance and BNB was never held
+    assert {call[1] for call in api.calls if call[0] == "my_trades"} == {
+        "BTCUSDT",
+        "ETHBTC",
+    }
+
+
+def test_binance_import_trade_flow_range(db_session, db_portfolios):
+    importer = BinanceImporter(
+        session=db_session,
+        portfolio_id=random.choice(db_portfolios).id,
+        api_key="api_key",
+        secret_key="secret_key",
+        start_date=START_DATE,
+        end_date=START_DATE + timedelta(days=10),
+    )
+    importer.api.session.close()
+    assert importer.trade_flow_range() == (
+        START_DATE,
+        START_DATE + timedelta(days=10),
+    )
+
+    checkpoint_dt = START_DATE + timedelta(days=3, hours=5)
+    importer.checkpoint("trade_flow").last_time = to_milliseconds(
+        checkpoint_dt
+    )
+
+    assert importer.trade_flow_range() == (
+        checkpoint_dt + timedelta(milliseconds=1),
+        START_DATE + timedelta(days=10),
+    )
+
+
+def test_transaction_mapper_rows():
+    symbol = {"symbol": "BTCUSDT", "baseAsset": "BTC", "quoteAsset": "USDT"}
+    row = TransactionMapper(1).from_my_trades(
+        symbol,
+        {
+            "id": 7,
+            "time": 1640995200123,
+            "isBuyer": False,
+            "qty": "0.00000001",
+            "quoteQty": "0.00046123",
+            "commission": "0.1",
+            "commissionAsset": "USDT",
+        },
+    )
+
+    assert row["transaction_date"] == datetime(2022, 1, 1, 0, 0, 0, 123000)
+    assert row["buy_asset"] == "USDT"
+    assert row["buy_amount"] == Decimal("0.00046123")
+    assert row["sell_amount"] == Decimal("0.00000001")
+    assert row["fee_amount"] == Decimal("0.1")
+    # rows hold what model validation would make of them
+    assert Transaction(**row).dict(exclude={"id"}) == row
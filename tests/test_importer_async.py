@@ -0,0 +1,101 @@
+import asyncio
+import random
+from datetime import timedelta
+
+import httpx
+
+from coin_tracker.exchanges.binance_api import (
+    AsyncBinanceAPI,
+    to_milliseconds,
+)
+from coin_tracker.importer.binance_async import AsyncBinanceImporter
+
+from .test_importer import (
+    START_DATE,
+    FakeBinanceAPI,
+    get_external_ids,
+    get_holdings,
+)
+
+
+class AsyncFakeBinanceAPI:
+    """FakeBinanceAPI with coroutines and async generators for methods,
+    which yield to the loop before answering, so that concurrent requests
+    interleave."""
+
+    SINGLE_RESPONSE = {"account", "exchange_info"}
+
+    def __init__(self, *args):
+        self.api = FakeBinanceAPI()
+        self.session = self
+
+    async def aclose(self):
+        pass
+
+    def __getattr__(self, name):
+        method = getattr(self.api, name)
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            return method(*args, **kwargs)
+
+        async def paginate(*args, **kwargs):
+            await asyncio.sleep(0)
+            for item in method(*args, **kwargs):
+                yield item
+
+        return call if name in self.SINGLE_RESPONSE else paginate
+
+
+def run_importer(
+    session, portfolio_id: int, api=None
+) -> AsyncBinanceImporter:
+    importer = AsyncBinanceImporter(
+        session=session,
+        portfolio_id=portfolio_id,
+        api_key="api_key",
+        secret_key="secret_key",
+        start_date=START_DATE,
+        end_date=START_DATE + timedelta(days=2),
+    )
+    asyncio.run(importer.api.session.aclose())
+    importer.api = api or AsyncFakeBinanceAPI()
+    asyncio.run(importer.run())
+    return importer
+
+
+def test_async_binance_import(db_session, db_portfolios):
+    portfolio_id = random.choice(db_portfolios).id
+    api = AsyncFakeBinanceAPI()
+
+    run_importer(db_session, portfolio_id, api)
+
+    assert sorted(get_external_ids(db_session, portfolio_id)) == [
+        "deposit_history__d1",
+        "my_trades__1",
+        "withdraw_history__w1",
+    ]
+    assert get_holdings(db_session, portfolio_id)["USDT"] == 60
+    assert {c[1] for c in api.api.calls if c[0] == "my_trades"} == {
+        "BTCUSDT",
+        "ETHBTC",
+    }
+    assert ("deposit_history", to_milliseconds(START_DATE)) in api.api.calls
+
+
+def test_async_api_request():
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"symbols": []})
+
+    async def exchange_info():
+        api = AsyncBinanceAPI()
+        api.session = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler),
+            base_url=api.session.base_url,
+        )
+        try:
+            return await api.exchange_info()
+        finally:
+            await api.session.aclose()
+
+    assert asyncio.run(exchange_info()) == {"symbols": []}
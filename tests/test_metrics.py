@@ -0,0 +1,18 @@
+from fastapi import status
+
+
+def test_get_db_pool_metrics(user_client):
+    response = user_client.get("/metrics/db-pool")
+    assert response.status_code == status.HTTP_200_OK
+    assert {"status", "checkouts", "wait_time_max"} <= response.json().keys()
+
+
+def test_get_db_pool_metrics_requires_login(test_client):
+    response = test_client.get("/metrics/db-pool")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_get_db_pool_metrics_invalid_token(test_client):
+    headers = {"Authorization": "Bearer invalid"}
+    response = test_client.get("/metrics/db-pool", headers=headers)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
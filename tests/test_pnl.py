@@ -0,0 +1,158 @@
+import random
+
+import numpy as np
+import pytest
+from fastapi import status
+from sqlmodel import Session
+
+from coin_tracker.constants import CostBasisMethod, TransactionType
+from coin_tracker.ledger import apply_transactions
+from coin_tracker.models import Transaction
+from coin_tracker.pnl import TransactionArrays, compute_pnl, pnl_cache
+
+from .conftest import test_engine
+
+TRANSACTIONS = [
+    # buy 2 BTC at 10000 and 1 BTC at 40000, sell 1.5 BTC at 30000,
+    # deposit ETH and withdraw 0.5 BTC
+    ("2022-01-01", "BTC", 2, "USD", 20000, "USD", 10),
+    ("2022-01-02", "BTC", 1, "USD", 40000, "", 0),
+    ("2022-01-03", "USD", 45000, "BTC", 1.5, "", 0),
+    ("2022-01-04", "ETH", 1, "", 0, "", 0),
+    ("2022-01-05", "", 0, "BTC", 0.5, "", 0),
+]
+
+
+def make_arrays(transactions: list[tuple]) -> TransactionArrays:
+    columns = list(zip(*transactions)) or [()] * 7
+    return TransactionArrays(
+        dates=np.array(columns[0], dtype="datetime64[us]"),
+        buy_asset=np.array(columns[1], dtype=str),
+        buy_amount=np.array(columns[2], dtype=float),
+        sell_asset=np.array(columns[3], dtype=str),
+        sell_amount=np.array(columns[4], dtype=float),
+        fee_asset=np.array(columns[5], dtype=str),
+        fee_amount=np.array(columns[6], dtype=float),
+    )
+
+
+@pytest.mark.parametrize(
+    "method,realized_pnl,cost_basis",
+    [
+        (CostBasisMethod.FIFO, 30000, 40000),
+        (CostBasisMethod.LIFO, 0, 10000),
+        (CostBasisMethod.AVERAGE, 15000, 20000),
+    ],
+)
+def test_compute_pnl(method, realized_pnl, cost_basis):
+    pnl = compute_pnl(make_arrays(TRANSACTIONS), method, "USD")
+    assets = {asset["asset"]: asset for asset in pnl["assets"]}
+
+    assert pnl["fees"] == 10
+    assert pnl["realized_pnl"] == pytest.approx(realized_pnl)
+    assert pnl["unrealized_pnl"] is None
+    assert assets["BTC"]["quantity"] == pytest.approx(1)
+    assert assets["BTC"]["cost_basis"] == pytest.approx(cost_basis)
+    assert assets["ETH"] == {
+        "asset": "ETH",
+        "quantity": 1,
+        "cost_basis": 0,
+        "realized_pnl": 0,
+        "unrealized_pnl": None,
+    }
+
+
+def test_compute_pnl_unrealized():
+    pnl = compute_pnl(
+        make_arrays(TRANSACTIONS),
+        CostBasisMethod.FIFO,
+        "USD",
+        prices={"BTC": 50000, "ETH": 3000},
+    )
+
+    assert pnl["unrealized_pnl"] == pytest.approx(50000 - 40000 + 3000)
+
+
+def test_compute_pnl_no_transactions():
+    pnl = compute_pnl(make_arrays([]), CostBasisMethod.FIFO, "USD")
+
+    assert pnl["realized_pnl"] == 0
+    assert pnl["assets"] == []
+
+
+def test_get_portfolio_pnl(user_client):
+    portfolio = random.choice(user_client.user.portfolios)
+    url = f"/portfolio/{portfolio.id}/pnl"
+
+    response = user_client.get(url, params={"quote": "USD"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["fees"] == 8
+    assert response.json()["assets"][0]["cost_basis"] == 80000
+
+    data = {
+        "portfolio_id": portfolio.id,
+        "transaction_type": "trade",
+        "transaction_date": "2030-01-01 00:00:00.000000",
+        "buy_asset": "USD",
+        "buy_amount": "50000",
+        "sell_asset": "BTC",
+        "sell_amount": "1",
+    }
+    user_client.post("/transactions", json=data)
+
+    response = user_client.get(url, params={"quote": "USD"})
+    assert response.json()["realized_pnl"] == 10000
+
+
+def test_get_portfolio_pnl_forbidden(user_client, db_portfolios):
+    portfolio = random.choice(
+        [p for p in db_portfolios if p.user != user_client.user]
+    )
+
+    response = user_client.get(f"/portfolio/{portfolio.id}/pnl")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.parametrize("method", list(CostBasisMethod))
+def test_compute_pnl_oversold(method):
+    # selling more than is held must not consume later acquisitions
+    transactions = [
+        ("2022-01-01", "BTC", 1, "USD", 100, "", 0),
+        ("2022-01-02", "USD", 300, "BTC", 2, "", 0),
+        ("2022-01-03", "BTC", 1, "USD", 200, "", 0),
+        ("2022-01-04", "USD", 250, "BTC", 1, "", 0),
+    ]
+
+    pnl = compute_pnl(make_arrays(transactions), method, "USD")
+
+    assert pnl["realized_pnl"] == pytest.approx(250)
+    assert pnl["assets"][0]["cost_basis"] == pytest.approx(0)
+
+
+def test_get_portfolio_pnl_written_elsewhere(user_client):
+    portfolio = random.choice(user_client.user.portfolios)
+    url = f"/portfolio/{portfolio.id}/pnl"
+
+    response = user_client.get(url, params={"quote": "USD"})
+    assert response.json()["realized_pnl"] == 0
+    stale = pnl_cache.get(portfolio.id)
+
+    # e.g. the import worker, whose invalidation never reaches this process
+    with Session(test_engine) as session:
+        transaction = Transaction(
+            portfolio_id=portfolio.id,
+            transaction_type=TransactionType.TRADE,
+            transaction_date="2030-01-01 00:00:00",
+            buy_asset="USD",
+            buy_amount="50000",
+            sell_asset="BTC",
+            sell_amount="1",
+        )
+        session.add(transaction)
+        session.flush()
+        apply_transactions(session, [transaction.id])
+        session.commit()
+    pnl_cache.set(portfolio.id, stale)
+
+    response = user_client.get(url, params={"quote": "USD"})
+    assert response.json()["realized_pnl"] == 10000
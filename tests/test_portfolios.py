@@ -1,7 +1,15 @@
+import csv
+import io
+import json
 import random
 
+import pytest
 from faker import Faker
 from fastapi import status
+from sqlalchemy import delete
+
+from coin_tracker.ledger import rebuild_holdings
+from coin_tracker.models import Holding
 
 fake = Faker()
 
@@ -25,7 +33,7 @@ def test_get_single_portfolio(user_client):
 
     response = user_client.get(f"/portfolio/{portfolio.id}")
     assert response.status_code == status.HTTP_200_OK
-    assert response.json() == portfolio.dict()
+    assert response.json() == portfolio.dict(exclude={"ledger_version"})
 
 
 def test_get_single_portfolio_not_found(user_client, db_portfolios):
@@ -136,3 +144,252 @@ def test_list_portfolio_transactions_forbidden(user_client, db_portfolios):
 
     response = user_client.get(f"/portfolio/{portfolio.id}/transactions")
     assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_list_portfolio_transactions_paginated(user_client):
+    portfolio = random.choice(user_client.user.portfolios)
+    url = f"/portfolio/{portfolio.id}/transactions"
+
+    transaction_ids = []
+    response = user_client.get(url, params={"limit": 1})
+    while True:
+        assert response.status_code == status.HTTP_200_OK
+        assert len(response.json()) == 1
+        transaction_ids += [t["id"] for t in response.json()]
+
+        if "X-Next-Cursor" not in response.headers:
+            break
+
+        cursor = response.headers["X-Next-Cursor"]
+        response = user_client.get(url, params={"limit": 1, "cursor": cursor})
+
+    expected = sorted(
+        portfolio.transactions,
+        key=lambda t: (t.transaction_date, t.id),
+        reverse=True,
+    )
+    assert transaction_ids == [t.id for t in expected]
+
+
+def test_list_portfolio_transactions_filtered(user_client):
+    portfolio = random.choice(user_client.user.portfolios)
+    url = f"/portfolio/{portfolio.id}/transactions"
+
+    response = user_client.get(url, params={"asset": "BTC"})
+    assert len(response.json()) == len(portfolio.transactions)
+
+    response = user_client.get(url, params={"asset": "ETH"})
+    assert response.json() == []
+
+    response = user_client.get(url, params={"transaction_type": "deposit"})
+    assert response.json() == []
+
+
+def test_list_portfolio_transactions_invalid_cursor(user_client):
+    portfolio = random.choice(user_client.user.portfolios)
+
+    response = user_client.get(
+        f"/portfolio/{portfolio.id}/transactions",
+        params={"cursor": "invalid"},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_export_portfolio_transactions_csv(user_client):
+    portfolio = random.choice(user_client.user.portfolios)
+
+    response = user_client.get(
+        f"/portfolio/{portfolio.id}/transactions/export",
+        params={"format": "csv"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == len(portfolio.transactions)
+    assert {row["buy_asset"] for row in rows} == {"BTC"}
+
+
+def test_export_portfolio_transactions_ndjson(user_client):
+    portfolio = random.choice(user_client.user.portfolios)
+
+    response = user_client.get(
+        f"/portfolio/{portfolio.id}/transactions/export",
+        params={"format": "ndjson"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == sorted(
+        t.id for t in portfolio.transactions
+    )
+
+
+def test_export_portfolio_transactions_forbidden(user_client, db_portfolios):
+    portfolio = random.choice(
+        [
+            db_portfolio
+            for db_portfolio in db_portfolios
+            if db_portfolio.user != user_client.user
+        ]
+    )
+
+    url = f"/portfolio/{portfolio.id}/transactions/export"
+    response = user_client.get(url)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_import_portfolio_transactions_csv(user_client):
+    portfolio = random.choice(user_client.user.portfolios)
+    content = "\n".join(
+        [
+            "transaction_type,transaction_date,buy_asset,buy_amount,note",
+            "deposit,2022-01-01 00:00:00,BTC,1.5,first",
+            "withdraw,not a date,BTC,1,invalid date",
+            "trade,2022-01-02T10:00:00,ETH,10,",
+            "unknown,2022-01-03 00:00:00,ETH,1,invalid type",
+            "deposit,2022-01-04 00:00:00,ETH,abc,invalid amount",
+        ]
+    )
+
+    response = user_client.post(
+        f"/portfolio/{portfolio.id}/import/csv",
+        files={"file": ("transactions.csv", content, "text/csv")},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["imported"] == 2
+    assert response.json()["failed"] == 3
+    assert [e["row"] for e in response.json()["errors"]] == [3, 5, 6]
+
+    response = user_client.get(
+        f"/portfolio/{portfolio.id}/transactions", params={"asset": "ETH"}
+    )
+    assert len(response.json()) == 1
+
+
+def test_import_portfolio_transactions_csv_duplicates(user_client):
+    portfolio = random.choice(user_client.user.portfolios)
+    content = "\n".join(
+        [
+            "transaction_type,transaction_date,buy_asset,external_id",
+            "deposit,2022-01-01 00:00:00,BTC,csv_1",
+            "deposit,2022-01-02 00:00:00,BTC,csv_2",
+        ]
+    )
+    url = f"/portfolio/{portfolio.id}/import/csv"
+    files = {"file": ("transactions.csv", content, "text/csv")}
+
+    response = user_client.post(url, files=files)
+    assert response.json()["imported"] == 2
+
+    response = user_client.post(url, files=files)
+    assert response.json()["imported"] == 0
+    assert response.json()["duplicates"] == 2
+
+
+def test_import_portfolio_transactions_csv_missing_columns(user_client):
+    portfolio = random.choice(user_client.user.portfolios)
+
+    response = user_client.post(
+        f"/portfolio/{portfolio.id}/import/csv",
+        files={"file": ("transactions.csv", "buy_asset\nBTC", "text/csv")},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_import_portfolio_transactions_csv_forbidden(
+    user_client, db_portfolios
+):
+    portfolio = random.choice(
+        [
+            db_portfolio
+            for db_portfolio in db_portfolios
+            if db_portfolio.user != user_client.user
+        ]
+    )
+
+    response = user_client.post(
+        f"/portfolio/{portfolio.id}/import/csv",
+        files={"file": ("transactions.csv", "", "text/csv")},
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def get_holdings(user_client, portfolio_id: int) -> dict:
+    response = user_client.get(f"/portfolio/{portfolio_id}/holdings")
+    assert response.status_code == status.HTTP_200_OK
+    # sqlite sums amounts as floats and may leave rounding residue
+    return {
+        h["asset"]: h["quantity"]
+        for h in response.json()
+        if h["quantity"] != pytest.approx(0)
+    }
+
+
+def test_list_portfolio_holdings(user_client):
+    portfolio = random.choice(user_client.user.portfolios)
+
+    assert get_holdings(user_client, portfolio.id) == {
+        "BTC": 2,
+        "USD": -80008,
+    }
+
+
+def test_portfolio_holdings_follow_transaction_writes(user_client):
+    portfolio = random.choice(user_client.user.portfolios)
+    data = {
+        "portfolio_id": portfolio.id,
+        "transaction_type": "trade",
+        "transaction_date": "2022-01-01 00:00:00.000000",
+        "buy_asset": "ETH",
+        "buy_amount": "10",
+        "sell_asset": "BTC",
+        "sell_amount": "0.5",
+        "fee_asset": "ETH",
+        "fee_amount": "0.01",
+    }
+
+    response = user_client.post("/transactions", json=data)
+    transaction_id = response.json()["id"]
+    assert get_holdings(user_client, portfolio.id) == pytest.approx(
+        {"BTC": 1.5, "ETH": 9.99, "USD": -80008}
+    )
+
+    response = user_client.post("/transactions/bulk", json=[data, data])
+    assert get_holdings(user_client, portfolio.id)["ETH"] == pytest.approx(
+        29.97
+    )
+
+    user_client.delete(f"/transactions/{transaction_id}")
+    for transaction_id in response.json()["ids"]:
+        user_client.delete(f"/transactions/{transaction_id}")
+    assert get_holdings(user_client, portfolio.id) == {
+        "BTC": 2,
+        "USD": -80008,
+    }
+
+
+def test_rebuild_portfolio_holdings(user_client, db_session):
+    portfolio = random.choice(user_client.user.portfolios)
+    expected = get_holdings(user_client, portfolio.id)
+
+    db_session.execute(delete(Holding))
+    db_session.commit()
+    assert get_holdings(user_client, portfolio.id) == {}
+
+    rebuild_holdings(db_session, portfolio.id)
+    db_session.commit()
+    assert get_holdings(user_client, portfolio.id) == expected
+
+
+def test_list_portfolio_holdings_forbidden(user_client, db_portfolios):
+    portfolio = random.choice(
+        [
+            db_portfolio
+            for db_portfolio in db_portfolios
+            if db_portfolio.user != user_client.user
+        ]
+    )
+
+    response = user_client.get(f"/portfolio/{portfolio.id}/holdings")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
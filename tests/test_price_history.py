@@ -0,0 +1,233 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlmodel import func, select
+
+from coin_tracker.constants import KlineInterval, TransactionType
+from coin_tracker.exchanges.binance_api import to_milliseconds
+from coin_tracker.models import PriceHistory, Transaction
+from coin_tracker.price_history import (
+    asset_closes,
+    closes_of,
+    fill_price_history,
+    fill_traded_prices,
+    missing_ranges,
+    price_symbols,
+    priced_assets,
+    prices_at,
+)
+
+DAY = 24 * 60 * 60 * 1000
+START_DATE = datetime(2022, 1, 1)
+
+
+class FakeKlineAPI:
+    """Daily klines of one symbol, priced at the number of days since
+    START_DATE."""
+
+    def __init__(self):
+        self.requests = []
+
+    def klines(self, symbol, interval, start_time, end_time, limit):
+        self.requests.append((start_time, end_time))
+        first = max(to_milliseconds(START_DATE), -(-start_time // DAY) * DAY)
+        open_times = range(first, end_time + 1, DAY)[:limit]
+
+        return [
+            [
+                open_time,
+                str(days := (open_time - to_milliseconds(START_DATE)) // DAY),
+                str(days + 1),
+                str(days),
+                str(days),
+                "1",
+                open_time + DAY - 1,
+            ]
+            for open_time in open_times
+        ]
+
+
+class FakeMarketAPI(FakeKlineAPI):
+    """FakeKlineAPI listing `symbols`, recording which ones were filled."""
+
+    def __init__(self, symbols: list[str]):
+        super().__init__()
+        self.symbols = symbols
+        self.filled = set()
+
+    def exchange_info(self):
+        return {"symbols": [{"symbol": symbol} for symbol in self.symbols]}
+
+    def klines(self, symbol, interval, start_time, end_time, limit):
+        self.filled.add(symbol)
+        return super().klines(symbol, interval, start_time, end_time, limit)
+
+
+def add_close(session, symbol: str, day: int, close: float):
+    session.add(
+        PriceHistory(
+            symbol=symbol,
+            interval=KlineInterval.DAY,
+            open_time=START_DATE + timedelta(days=day),
+            open=close,
+            high=close,
+            low=close,
+            close=close,
+            volume=1,
+        )
+    )
+
+
+def count_klines(session) -> int:
+    return session.exec(select(func.count()).select_from(PriceHistory)).one()
+
+
+def test_missing_ranges():
+    open_times = np.array([2, 3, 4, 7, 8]) * DAY
+
+    assert missing_ranges(open_times, 0, 10 * DAY, DAY) == [
+        (0, 2 * DAY - 1),
+        (5 * DAY, 7 * DAY - 1),
+        (9 * DAY, 10 * DAY),
+    ]
+    assert missing_ranges(open_times[:0], 0, DAY, DAY) == [(0, DAY)]
+
+
+def test_fill_price_history(db_session, monkeypatch):
+    monkeypatch.setattr("coin_tracker.price_history.KLINES_LIMIT", 4)
+    api = FakeKlineAPI()
+    end = START_DATE + timedelta(days=9, hours=12)
+
+    stored = fill_price_history(
+        db_session, api, "BTCUSDT", KlineInterval.DAY, START_DATE, end
+    )
+
+    assert stored == count_klines(db_session) == 10
+    assert len(api.requests) == 3
+
+
+def test_fill_price_history_only_requests_gaps(db_session):
+    api = FakeKlineAPI()
+    end = START_DATE + timedelta(days=9)
+    fill_price_history(
+        db_session, api, "BTCUSDT", KlineInterval.DAY, START_DATE, end
+    )
+    db_session.exec(
+        PriceHistory.__table__.delete().where(
+            PriceHistory.open_time == START_DATE + timedelta(days=5)
+        )
+    )
+
+    api.requests.clear()
+    stored = fill_price_history(
+        db_session, api, "BTCUSDT", KlineInterval.DAY, START_DATE, end
+    )
+
+    assert stored == 1
+    assert api.requests == [
+        (
+            to_milliseconds(START_DATE + timedelta(days=5)),
+            to_milliseconds(START_DATE + timedelta(days=6)) - 1,
+        )
+    ]
+
+
+def test_prices_at(db_session):
+    fill_price_history(
+        db_session,
+        FakeKlineAPI(),
+        "BTCUSDT",
+        KlineInterval.DAY,
+        START_DATE,
+        START_DATE + timedelta(days=9),
+    )
+    timestamps = [
+        START_DATE - timedelta(hours=1),
+        START_DATE,
+        START_DATE + timedelta(days=3, hours=23),
+        START_DATE + timedelta(days=9, hours=1),
+        START_DATE + timedelta(days=30),
+    ]
+
+    prices = prices_at(db_session, "BTCUSDT", KlineInterval.DAY, timestamps)
+
+    np.testing.assert_array_equal(prices, [np.nan, 0, 3, 9, np.nan])
+
+
+def test_closes_of(db_session):
+    fill_price_history(
+        db_session,
+        FakeKlineAPI(),
+        "BTCUSDT",
+        KlineInterval.DAY,
+        START_DATE,
+        START_DATE + timedelta(days=9),
+    )
+    open_times = [
+        START_DATE - timedelta(days=1),
+        START_DATE + timedelta(days=3),
+        START_DATE + timedelta(days=3, hours=1),
+        START_DATE + timedelta(days=10),
+    ]
+
+    closes = closes_of(db_session, "BTCUSDT", KlineInterval.DAY, open_times)
+
+    np.testing.assert_array_equal(closes, [np.nan, 3, np.nan, np.nan])
+
+
+def test_asset_closes(db_session):
+    add_close(db_session, "USDTTRY", 0, 20)
+    add_close(db_session, "ETHBTC", 0, 0.05)
+    add_close(db_session, "BTCUSDT", 0, 40000)
+    add_close(db_session, "ETHBTC", 1, 0.05)
+    db_session.commit()
+    days = [START_DATE, START_DATE + timedelta(days=1)]
+
+    np.testing.assert_array_equal(
+        asset_closes(db_session, "TRY", "USDT", days), [1 / 20, np.nan]
+    )
+    # through BTC, until the bridge market has no close either
+    np.testing.assert_array_equal(
+        asset_closes(db_session, "ETH", "USDT", days), [2000, np.nan]
+    )
+    np.testing.assert_array_equal(
+        asset_closes(db_session, "USDT", "USDT", days), [1, 1]
+    )
+
+
+def test_price_symbols():
+    symbols = {"BTCUSDT", "USDTTRY", "ETHBTC"}
+
+    assert price_symbols("BTC", "USDT", symbols) == ["BTCUSDT"]
+    assert price_symbols("TRY", "USDT", symbols) == ["USDTTRY"]
+    assert price_symbols("ETH", "USDT", symbols) == ["ETHBTC", "BTCUSDT"]
+    assert price_symbols("DUST", "USDT", symbols) == []
+
+
+def test_priced_assets():
+    assert priced_assets("BTCUSDT", "USDT") == {"BTC"}
+    assert priced_assets("USDTTRY", "USDT") == {"TRY"}
+    assert priced_assets("ETHBTC", "USDT") == {"ETH"}
+
+
+def test_fill_traded_prices(db_session, db_portfolios):
+    db_session.add(
+        Transaction(
+            portfolio_id=db_portfolios[0].id,
+            transaction_type=TransactionType.TRADE,
+            transaction_date=START_DATE,
+            buy_asset="ETH",
+            buy_amount=1,
+            sell_asset="BTC",
+            sell_amount="0.05",
+        )
+    )
+    db_session.commit()
+    api = FakeMarketAPI(["ETHBTC", "BTCUSDT"])
+
+    assert fill_traded_prices(db_session, api) > 0
+
+    # USD of the other transactions has no market
+    assert api.filled == {"ETHBTC", "BTCUSDT"}
+    day = START_DATE + timedelta(days=4)
+    assert asset_closes(db_session, "ETH", "USDT", [day]) == [4 * 4]
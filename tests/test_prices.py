@@ -0,0 +1,117 @@
+import random
+import threading
+import time
+from decimal import Decimal
+
+import httpx
+import pytest
+from fastapi import status
+
+from coin_tracker.prices import PriceCache, PriceUnavailable
+
+from .conftest import FakeTickerAPI
+
+
+class SlowTickerAPI(FakeTickerAPI):
+    def ticker_price(self):
+        time.sleep(0.05)
+        return super().ticker_price()
+
+
+class FailingTickerAPI(FakeTickerAPI):
+    def ticker_price(self):
+        raise httpx.ConnectError("exchange is down")
+
+
+def test_price_conversions():
+    cache = PriceCache(FakeTickerAPI(), ttl=60)
+
+    assert cache.price("BTC", "BTC") == 1
+    assert cache.price("BTC", "USDT") == 50000
+    assert cache.price("USDT", "BTC") == Decimal(1) / 50000
+    assert cache.price("ETH", "USDT") == Decimal("3500")
+    assert cache.price("BTC", "EUR") == Decimal("40000")
+    assert cache.price("DOGE", "USDT") is None
+    assert cache.prices(["BTC", "DOGE"], "USDT") == {"BTC": 50000}
+
+
+def test_price_cache_refreshes_once_per_ttl():
+    api = FakeTickerAPI()
+    cache = PriceCache(api, ttl=0.05)
+
+    for _ in range(10):
+        cache.price("BTC", "USDT")
+    assert api.calls == 1
+
+    time.sleep(0.06)
+    cache.price("BTC", "USDT")
+    assert api.calls == 2
+
+
+def test_price_cache_single_flight():
+    api = SlowTickerAPI()
+    cache = PriceCache(api, ttl=60)
+
+    threads = [
+        threading.Thread(target=cache.tickers) for _ in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert api.calls == 1
+
+
+def test_price_cache_serves_stale_prices_while_refreshing():
+    api = SlowTickerAPI()
+    cache = PriceCache(api, ttl=0.01)
+    cache.tickers()
+    time.sleep(0.02)
+
+    api.tickers = {"BTCUSDT": "60000"}
+    refresh = threading.Thread(target=cache.tickers)
+    refresh.start()
+    time.sleep(0.01)
+
+    assert cache.price("BTC", "USDT") == 50000
+    refresh.join()
+    assert cache.price("BTC", "USDT") == 60000
+
+
+def test_price_cache_unavailable():
+    cache = PriceCache(FailingTickerAPI(), ttl=0)
+
+    with pytest.raises(PriceUnavailable):
+        cache.tickers()
+
+    cache._tickers = {"BTCUSDT": Decimal(50000)}
+    assert cache.price("BTC", "USDT") == 50000
+
+
+def test_list_portfolio_holdings_value(user_client):
+    portfolio = random.choice(user_client.user.portfolios)
+
+    response = user_client.get(
+        f"/portfolio/{portfolio.id}/holdings", params={"quote": "USDT"}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert {h["asset"]: h["value"] for h in response.json()} == {
+        "BTC": 100000,
+        "USD": None,
+    }
+
+
+def test_get_portfolio_pnl_unrealized(user_client):
+    portfolio = random.choice(user_client.user.portfolios)
+
+    response = user_client.get(
+        f"/portfolio/{portfolio.id}/pnl", params={"quote": "EUR"}
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assets = {a["asset"]: a for a in response.json()["assets"]}
+    assert assets["BTC"]["unrealized_pnl"] == 80000
+    assert assets["USD"]["unrealized_pnl"] is None
+    assert response.json()["unrealized_pnl"] is None
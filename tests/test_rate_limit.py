@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from coin_tracker.exchanges import binance_api, rate_limit
+from coin_tracker.exchanges.binance_api import AsyncBinanceAPI
+from coin_tracker.exchanges.rate_limit import RateLimiter
+
+from .conftest import make_api
+
+
+class FakeClock:
+    """Time as seen by the limiters, where sleeping passes at once."""
+
+    def __init__(self):
+        self.now = time.monotonic()
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def sleeps(clock) -> list:
+    return clock.sleeps
+
+
+def replay(*responses: httpx.Response):
+    """Transport answering requests with `responses`, in order."""
+    responses = list(responses)
+    return lambda request: responses.pop(0)
+
+
+def test_rate_limiter_spends_budget_then_waits():
+    limiter = RateLimiter(limit=100, period=60, margin=0.5)
+
+    assert limiter.reserve(50) == 0
+    assert limiter.reserve(10) == pytest.approx(10 / (50 / 60), rel=0.01)
+
+
+def test_rate_limiter_follows_used_weight():
+    limiter = RateLimiter(limit=100, period=60)
+
+    limiter.update(used_weight=100)
+
+    assert limiter.reserve(1) > 0
+
+
+def test_rate_limiter_block():
+    limiter = RateLimiter(limit=100, period=60)
+
+    limiter.block(30)
+
+    assert limiter.reserve(1) == pytest.approx(30, rel=0.01)
+
+
+def test_rate_limiter_block_holds_back_queued_requests(clock):
+    limiter = RateLimiter(limit=100, period=60)
+    limiter.reserve(100)
+    start = clock.now
+
+    def sleep(seconds: float):
+        # the exchange bans requests while this one waits its turn
+        if not clock.sleeps:
+            limiter.block(60)
+        FakeClock.sleep(clock, seconds)
+
+    clock.sleep = sleep
+    limiter.acquire(50)
+
+    assert clock.now - start == pytest.approx(60)
+
+
+def test_async_send_request_waits_out_block(limiters):
+    sent = []
+
+    def transport(request: httpx.Request) -> httpx.Response:
+        sent.append(time.monotonic())
+        return httpx.Response(200, json={"symbols": []})
+
+    async def exchange_info():
+        api = AsyncBinanceAPI("api_key", "secret_key")
+        api.session = httpx.AsyncClient(
+            base_url="https://api.binance.com",
+            transport=httpx.MockTransport(transport),
+        )
+        limiters["api"].block(0.01)
+        request = asyncio.ensure_future(api.exchange_info())
+        await asyncio.sleep(0.005)
+        # a 429 of another request arrives while this one is queued
+        limiters["api"].block(0.1)
+        try:
+            return await request
+        finally:
+            await api.session.aclose()
+
+    start = time.monotonic()
+    asyncio.run(exchange_info())
+
+    assert sent[0] - start >= 0.1
+
+
+def test_send_request_retries_after_rate_limit(sleeps):
+    api = make_api(
+        replay(
+            httpx.Response(429, headers={"Retry-After": "7"}, json={}),
+            httpx.Response(200, json={"symbols": []}),
+        )
+    )
+
+    assert api.exchange_info() == {"symbols": []}
+    assert sleeps == [pytest.approx(7, rel=0.01)]
+
+
+def test_send_request_tracks_used_weight(limiters, sleeps):
+    # the exchange counted the whole budget already
+    used_weight = str(int(limiters["sapi"].capacity))
+    api = make_api(
+        replay(
+            httpx.Response(
+                200, headers={"X-MBX-USED-WEIGHT-1M": used_weight}, json={}
+            ),
+            httpx.Response(200, json={}),
+        )
+    )
+
+    api.account()
+    api.account()
+
+    assert len(sleeps) == 1
+    assert limiters["sapi"].reserve(1) == 0
+
+
+def test_send_request_gives_up(sleeps, monkeypatch):
+    monkeypatch.setattr(binance_api.settings, "binance_max_retries", 1)
+    api = make_api(
+        replay(
+            httpx.Response(418, headers={"Retry-After": "1"}, json={}),
+            httpx.Response(418, headers={"Retry-After": "1"}, json={}),
+        )
+    )
+
+    with pytest.raises(httpx.HTTPStatusError):
+        api.account()
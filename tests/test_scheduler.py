@@ -0,0 +1,220 @@
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from sqlmodel import Session, select
+
+from coin_tracker.config import settings
+from coin_tracker.constants import ExchangeType
+from coin_tracker.importer import scheduler
+from coin_tracker.importer.scheduler import (
+    ImportScheduler,
+    backoff,
+    claim_jobs,
+    ensure_jobs,
+    run_job,
+)
+from coin_tracker.models import Exchange, ImportJob
+
+from .conftest import test_engine
+
+
+def add_exchanges(session, portfolios, count: int) -> list[int]:
+    # portfolios are handed out in turn, one job of each runs at a time
+    exchanges = [
+        Exchange(
+            portfolio_id=portfolios[i % len(portfolios)].id,
+            exchange_type=ExchangeType.BINANCE,
+            api_key="api_key",
+            secret_key="secret_key",
+        )
+        for i in range(count)
+    ]
+    session.add_all(exchanges)
+    session.commit()
+    return [exchange.id for exchange in exchanges]
+
+
+def test_ensure_jobs(db_session, db_portfolios):
+    exchange_ids = add_exchanges(db_session, db_portfolios, 3)
+
+    ensure_jobs(db_session)
+    ensure_jobs(db_session)
+
+    jobs = db_session.exec(select(ImportJob)).all()
+    assert sorted(job.exchange_id for job in jobs) == exchange_ids
+    assert all(job.next_run_at <= datetime.utcnow() for job in jobs)
+    assert all(job.interval == settings.import_interval for job in jobs)
+
+
+def test_claim_jobs(db_session, db_portfolios):
+    exchange_ids = add_exchanges(db_session, db_portfolios, 4)
+    ensure_jobs(db_session)
+    now = datetime.utcnow()
+    jobs = {job.exchange_id: job for job in db_session.exec(select(ImportJob))}
+    jobs[exchange_ids[0]].next_run_at = now + timedelta(minutes=1)
+    jobs[exchange_ids[1]].next_run_at = now - timedelta(minutes=2)
+    jobs[exchange_ids[2]].next_run_at = now - timedelta(minutes=1)
+    jobs[exchange_ids[3]].priority = 1
+    db_session.commit()
+
+    assert claim_jobs(db_session, "a", now, limit=2) == [
+        exchange_ids[3],
+        exchange_ids[1],
+    ]
+    # leased jobs are left to their worker
+    assert claim_jobs(db_session, "b", now, limit=10) == [exchange_ids[2]]
+    assert claim_jobs(db_session, "c", now, limit=10) == []
+
+    # until the lease runs out
+    expired = now + timedelta(seconds=settings.import_lease_duration + 1)
+    assert claim_jobs(db_session, "c", expired, limit=1) == [exchange_ids[3]]
+
+
+def test_claim_jobs_one_per_portfolio(db_session, db_portfolios):
+    portfolio = random.choice(db_portfolios)
+    exchange_ids = add_exchanges(db_session, [portfolio], 2)
+    ensure_jobs(db_session)
+    now = datetime.utcnow()
+
+    [claimed] = claim_jobs(db_session, "a", now, limit=10)
+    assert claimed in exchange_ids
+    # the other account waits for the running import of the portfolio
+    assert claim_jobs(db_session, "b", now, limit=10) == []
+
+
+def test_backoff():
+    delays = [backoff(failures) for failures in range(1, 20)]
+
+    assert delays[:3] == [
+        settings.import_backoff_base,
+        settings.import_backoff_base * 2,
+        settings.import_backoff_base * 4,
+    ]
+    assert max(delays) == settings.import_backoff_max
+
+
+def test_run_job(db_session, db_portfolios, monkeypatch):
+    [exchange_id] = add_exchanges(db_session, db_portfolios, 1)
+    ensure_jobs(db_session)
+    outcomes = [RuntimeError("down"), RuntimeError("down"), None, None]
+    start_dates = []
+
+    async def import_exchange(engine, exchange, start_date, end_date):
+        assert exchange.id == exchange_id
+        start_dates.append(start_date)
+        if error := outcomes.pop(0):
+            raise error
+
+    monkeypatch.setattr(scheduler, "import_exchange", import_exchange)
+
+    def run() -> ImportJob:
+        later = datetime.utcnow() + timedelta(days=1)
+        claim_jobs(db_session, "worker", later, limit=1)
+        asyncio.run(run_job(test_engine, exchange_id, "worker"))
+        db_session.expire_all()
+        return db_session.get(ImportJob, exchange_id)
+
+    run()
+    job = run()
+    assert job.failures == 2
+    assert job.last_error == "RuntimeError('down')"
+    assert job.last_success_at is None
+    max_delay = timedelta(
+        seconds=backoff(2) * (1 + settings.import_jitter) + 1
+    )
+    assert job.next_run_at - job.last_run_at <= max_delay
+
+    job = run()
+    assert job.failures == 0
+    assert job.last_error is None
+    assert job.last_success_at == job.last_run_at
+    assert job.next_run_at - job.last_run_at >= timedelta(
+        seconds=job.interval * (1 - settings.import_jitter)
+    )
+    assert job.leased_by is None
+
+    # the history is backfilled until an import succeeds
+    last_success_at = job.last_success_at
+    run()
+    assert start_dates[:3] == [settings.import_backfill_start] * 3
+    assert start_dates[3] == last_success_at
+
+
+def test_run_job_lost_lease(db_session, db_portfolios, monkeypatch):
+    [exchange_id] = add_exchanges(db_session, db_portfolios, 1)
+    ensure_jobs(db_session)
+    claim_jobs(db_session, "a", datetime.utcnow(), limit=1)
+
+    async def import_exchange(engine, exchange, start_date, end_date):
+        # the lease of "a" runs out and "b" takes the job over meanwhile
+        with Session(engine) as session:
+            expired = datetime.utcnow() + timedelta(
+                seconds=settings.import_lease_duration + 1
+            )
+            claim_jobs(session, "b", expired, limit=1)
+
+    monkeypatch.setattr(scheduler, "import_exchange", import_exchange)
+
+    asyncio.run(run_job(test_engine, exchange_id, "a"))
+
+    db_session.expire_all()
+    job = db_session.get(ImportJob, exchange_id)
+    assert job.leased_by == "b"
+    assert job.last_run_at is None
+
+
+def test_scheduler_limits_concurrency(db_session, db_portfolios, monkeypatch):
+    exchange_ids = add_exchanges(db_session, db_portfolios, 5)
+    active, peak = set(), []
+
+    async def import_exchange(engine, exchange, start_date, end_date):
+        active.add(exchange.id)
+        peak.append(len(active))
+        await asyncio.sleep(0.01)
+        active.discard(exchange.id)
+
+    monkeypatch.setattr(scheduler, "import_exchange", import_exchange)
+
+    async def run_all():
+        import_scheduler = ImportScheduler(
+            test_engine, concurrency=2, worker_id="worker"
+        )
+        started = []
+        while len(started) < len(exchange_ids) or import_scheduler.running:
+            started += import_scheduler.poll()
+            await asyncio.sleep(0.005)
+        return started
+
+    started = asyncio.run(run_all())
+
+    assert sorted(started) == exchange_ids
+    assert max(peak) == 2
+    # every job ran once and is not due again before its interval
+    assert claim_jobs(db_session, "other", datetime.utcnow(), 10) == []
+
+
+def test_scheduler_survives_failed_polls(monkeypatch):
+    import_scheduler = ImportScheduler(
+        test_engine, poll_interval=0.001, worker_id="worker"
+    )
+    polls = []
+
+    def poll():
+        polls.append(datetime.utcnow())
+        if len(polls) == 3:
+            raise asyncio.CancelledError
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(import_scheduler, "poll", poll)
+
+    try:
+        asyncio.run(import_scheduler.run())
+    except asyncio.CancelledError:
+        pass
+
+    assert len(polls) == 3
+    assert import_scheduler.poll_delay(1) == 0.002
+    assert import_scheduler.poll_delay(30) == (
+        settings.import_lease_duration / 2
+    )
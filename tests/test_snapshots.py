@@ -0,0 +1,213 @@
+import random
+from datetime import date, datetime, timedelta
+
+from fastapi import status
+from sqlmodel import func, select
+
+from coin_tracker.constants import KlineInterval
+from coin_tracker.models import PortfolioSnapshot, PriceHistory
+from coin_tracker.price_history import fill_price_history
+from coin_tracker.snapshots import update_snapshots
+
+from .test_price_history import FakeKlineAPI
+
+START_DATE = date(2022, 1, 1)
+
+
+def add_prices(session, days: int):
+    # BTC opens at 100 * (number of days since START_DATE + 1) and closes at
+    # the next day's open
+    for day in range(days):
+        price = 100 * (day + 1)
+        session.add(
+            PriceHistory(
+                symbol="BTCUSDT",
+                interval=KlineInterval.DAY,
+                open_time=datetime(2022, 1, 1) + timedelta(days=day),
+                open=price,
+                high=price + 100,
+                low=price,
+                close=price + 100,
+                volume=1,
+            )
+        )
+    session.commit()
+
+
+def post_trade(user_client, portfolio_id: int, day: date, btc: str):
+    response = user_client.post(
+        "/transactions",
+        json={
+            "portfolio_id": portfolio_id,
+            "transaction_type": "trade",
+            "transaction_date": f"{day} 12:00:00.000000",
+            "buy_asset": "BTC",
+            "buy_amount": btc,
+            "sell_asset": "USDT",
+            "sell_amount": "100",
+        },
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+
+def count_snapshots(session, portfolio_id: int) -> int:
+    return session.exec(
+        select(func.count()).where(
+            PortfolioSnapshot.portfolio_id == portfolio_id
+        )
+    ).one()
+
+
+def test_update_snapshots(db_session, user_client):
+    portfolio_id = random.choice(user_client.user.portfolios).id
+    add_prices(db_session, 10)
+    post_trade(user_client, portfolio_id, START_DATE, "1")
+    post_trade(user_client, portfolio_id, START_DATE + timedelta(2), "2")
+
+    until = START_DATE + timedelta(days=4)
+    assert update_snapshots(db_session, portfolio_id, until) == 5
+
+    snapshots = db_session.exec(
+        select(PortfolioSnapshot)
+        .where(PortfolioSnapshot.portfolio_id == portfolio_id)
+        .order_by(PortfolioSnapshot.snapshot_date)
+    ).all()
+    assert [s.holdings["BTC"] for s in snapshots] == [1, 1, 3, 3, 3]
+    assert [s.value for s in snapshots] == [
+        200 - 100,
+        300 - 100,
+        3 * 400 - 200,
+        3 * 500 - 200,
+        3 * 600 - 200,
+    ]
+
+    assert update_snapshots(db_session, portfolio_id, until) == 0
+    until += timedelta(days=2)
+    assert update_snapshots(db_session, portfolio_id, until) == 2
+    assert snapshots[-1].holdings == {"BTC": 3, "USDT": -200}
+
+
+def test_update_snapshots_missing_prices(db_session, user_client):
+    portfolio_id = random.choice(user_client.user.portfolios).id
+    post_trade(user_client, portfolio_id, START_DATE, "1")
+    # dust of a token without any market does not hold snapshots back
+    response = user_client.post(
+        "/transactions",
+        json={
+            "portfolio_id": portfolio_id,
+            "transaction_type": "deposit",
+            "transaction_date": f"{START_DATE} 12:00:00.000000",
+            "buy_asset": "DUST",
+            "buy_amount": "0.001",
+        },
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+
+    # BTC closes at the number of days since START_DATE, the kline of the
+    # last day is still open and not stored yet
+    api = FakeKlineAPI()
+    fill_price_history(
+        db_session,
+        api,
+        "BTCUSDT",
+        KlineInterval.DAY,
+        datetime(2022, 1, 1),
+        datetime(2022, 1, 3),
+    )
+    db_session.commit()
+
+    until = START_DATE + timedelta(days=3)
+    assert update_snapshots(db_session, portfolio_id, until) == 4
+    snapshot = db_session.get(PortfolioSnapshot, (portfolio_id, until))
+    assert snapshot.value == -100
+    db_session.commit()
+
+    fill_price_history(
+        db_session,
+        api,
+        "BTCUSDT",
+        KlineInterval.DAY,
+        datetime(2022, 1, 1),
+        datetime(2022, 1, 4),
+    )
+    db_session.commit()
+
+    assert update_snapshots(db_session, portfolio_id, until) == 1
+    db_session.expire_all()
+    snapshot = db_session.get(PortfolioSnapshot, (portfolio_id, until))
+    assert snapshot.value == 3 - 100
+
+
+def test_filled_prices_invalidate_snapshots(db_session, user_client):
+    portfolio_id = random.choice(user_client.user.portfolios).id
+    post_trade(user_client, portfolio_id, START_DATE, "1")
+    for day in range(5):
+        db_session.add(
+            PortfolioSnapshot(
+                portfolio_id=portfolio_id,
+                snapshot_date=START_DATE + timedelta(days=day),
+                value=0,
+                holdings={"BTC": 1, "USDT": -100},
+            )
+        )
+    db_session.commit()
+
+    fill_price_history(
+        db_session,
+        FakeKlineAPI(),
+        "BTCUSDT",
+        KlineInterval.DAY,
+        datetime(2022, 1, 3),
+        datetime(2022, 1, 10),
+    )
+
+    assert count_snapshots(db_session, portfolio_id) == 2
+
+
+def test_transaction_writes_invalidate_snapshots(db_session, user_client):
+    portfolio_id = random.choice(user_client.user.portfolios).id
+    add_prices(db_session, 10)
+    until = START_DATE + timedelta(days=9)
+    post_trade(user_client, portfolio_id, START_DATE, "1")
+    update_snapshots(db_session, portfolio_id, until)
+    db_session.commit()
+
+    post_trade(user_client, portfolio_id, START_DATE + timedelta(3), "1")
+
+    assert count_snapshots(db_session, portfolio_id) == 3
+    assert update_snapshots(db_session, portfolio_id, until) == 7
+
+
+def test_get_portfolio_history(db_session, user_client):
+    portfolio_id = random.choice(user_client.user.portfolios).id
+    add_prices(db_session, 100)
+    post_trade(user_client, portfolio_id, START_DATE, "1")
+    url = f"/portfolio/{portfolio_id}/history"
+
+    response = user_client.get(
+        url, params={"date_from": "2022-01-30", "date_to": "2022-02-02"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [s["snapshot_date"] for s in response.json()] == [
+        "2022-01-30",
+        "2022-01-31",
+        "2022-02-01",
+    ]
+
+    response = user_client.get(
+        url, params={"interval": "month", "date_to": "2022-04-01"}
+    )
+    assert [s["snapshot_date"] for s in response.json()] == [
+        "2022-01-31",
+        "2022-02-28",
+        "2022-03-31",
+    ]
+
+    response = user_client.get(
+        url, params={"interval": "week", "date_to": "2022-01-17"}
+    )
+    assert [s["snapshot_date"] for s in response.json()] == [
+        "2022-01-02",
+        "2022-01-09",
+        "2022-01-16",
+    ]
@@ -2,6 +2,9 @@ import random
 
 from faker import Faker
 from fastapi import status
+from sqlalchemy import event
+
+from .conftest import test_engine
 
 fake = Faker()
 
@@ -15,6 +18,41 @@ def test_list_transactions(user_client):
     assert len(response.json()) == expected
 
 
+def test_list_transactions_paginated(user_client):
+    expected = len(
+        [t for p in user_client.user.portfolios for t in p.transactions]
+    )
+
+    response = user_client.get("/transactions", params={"limit": 1})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 1
+
+    cursor = response.headers["X-Next-Cursor"]
+    response = user_client.get(
+        "/transactions", params={"limit": expected, "cursor": cursor}
+    )
+    assert len(response.json()) == expected - 1
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_list_transactions_single_query(user_client):
+    user_client.get("/transactions")  # resolve the current user once
+
+    statements = []
+
+    def count_statement(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(test_engine, "before_cursor_execute", count_statement)
+    try:
+        response = user_client.get("/transactions")
+    finally:
+        event.remove(test_engine, "before_cursor_execute", count_statement)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(statements) == 1
+
+
 def test_create_transaction(user_client):
     portfolio = random.choice(user_client.user.portfolios)
 
@@ -126,3 +164,70 @@ def test_delete_transaction_forbidden(user_client, db_transactions):
 
     response = user_client.delete(f"/transactions/{transaction.id}")
     assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_create_transactions_bulk(user_client):
+    data = [
+        {
+            "portfolio_id": portfolio.id,
+            "transaction_type": "trade",
+            "transaction_date": f"2022-01-{day:02d} 00:00:00.000000",
+            "buy_asset": "BTC",
+            "buy_amount": "1",
+            "sell_asset": "USDT",
+            "sell_amount": "40000",
+        }
+        for portfolio in user_client.user.portfolios
+        for day in range(1, 11)
+    ]
+
+    response = user_client.post("/transactions/bulk", json=data)
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["count"] == len(data)
+
+    for transaction_id in response.json()["ids"]:
+        response = user_client.get(f"/transactions/{transaction_id}")
+        assert response.status_code == status.HTTP_200_OK
+
+
+def test_create_transactions_bulk_not_found(user_client, db_portfolios):
+    portfolio_id = max([p.id for p in db_portfolios]) + 1
+    data = [
+        {
+            "portfolio_id": portfolio_id,
+            "transaction_type": "deposit",
+            "transaction_date": "2022-01-01 00:00:00.000000",
+            "buy_asset": "BTC",
+            "buy_amount": "1",
+        }
+    ]
+
+    response = user_client.post("/transactions/bulk", json=data)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_create_transactions_bulk_forbidden(user_client, db_portfolios):
+    portfolios = [
+        random.choice(user_client.user.portfolios),
+        random.choice(
+            [p for p in db_portfolios if p.user != user_client.user]
+        ),
+    ]
+    data = [
+        {
+            "portfolio_id": portfolio.id,
+            "transaction_type": "deposit",
+            "transaction_date": "2022-01-01 00:00:00.000000",
+            "buy_asset": "BTC",
+            "buy_amount": "1",
+        }
+        for portfolio in portfolios
+    ]
+
+    response = user_client.post("/transactions/bulk", json=data)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    response = user_client.get("/transactions", params={"asset": "BTC"})
+    assert len(response.json()) == len(
+        [t for p in user_client.user.portfolios for t in p.transactions]
+    )